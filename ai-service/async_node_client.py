@@ -0,0 +1,456 @@
+"""
+Async Node backend client
+Pooled, non-blocking replacement for node_client.py used by the async route handlers.
+
+One httpx.AsyncClient (keep-alive pool) is kept per event loop, because the
+FastAPI loop and the APScheduler cron loops (asyncio.run in worker threads)
+cannot share connections. A semaphore bounds in-flight requests per loop.
+"""
+
+import asyncio
+import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from config import (
+    NODE_BACKEND_URL, BACKEND_BASE_URL, AI_SECRET,
+    NODE_HTTP_TIMEOUT, NODE_HTTP_CONNECT_TIMEOUT,
+    NODE_HTTP_MAX_CONNECTIONS, NODE_HTTP_MAX_KEEPALIVE, NODE_HTTP_MAX_CONCURRENCY,
+    BULK_WRITE_BATCH_SIZE, BULK_WRITE_MAX_RETRIES, BULK_WRITE_CONCURRENCY, BULK_WRITE_BACKOFF,
+)
+
+HEADERS = {"Content-Type": "application/json"}
+if AI_SECRET:
+    HEADERS["x-ai-secret"] = AI_SECRET
+else:
+    print("⚠️ [async_node_client] AI_INTERNAL_SECRET is not set - x-ai-secret header will be missing")
+
+# loop -> (client, semaphore)
+_pools: Dict[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, asyncio.Semaphore]] = {}
+
+
+class NodeBackendError(Exception):
+    """Raised when the Node backend returns an error response"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _get_pool() -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    """Get (or lazily create) the pooled client for the running loop"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None or pool[0].is_closed:
+        client = httpx.AsyncClient(
+            base_url=NODE_BACKEND_URL,
+            headers=HEADERS,
+            timeout=httpx.Timeout(NODE_HTTP_TIMEOUT, connect=NODE_HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=NODE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=NODE_HTTP_MAX_KEEPALIVE,
+            ),
+        )
+        pool = (client, asyncio.Semaphore(NODE_HTTP_MAX_CONCURRENCY))
+        _pools[loop] = pool
+    return pool
+
+
+async def aclose_node_client() -> None:
+    """Close the pooled client of the running loop (call on shutdown / end of cron run)"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.pop(loop, None)
+    if pool and not pool[0].is_closed:
+        await pool[0].aclose()
+
+
+async def node_request(
+    method: str,
+    path: str,
+    json: Optional[Dict[str, Any]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> httpx.Response:
+    """
+    Send a request to the Node backend through the shared pool.
+
+    Args:
+        method: HTTP method
+        path: Absolute URL or path relative to NODE_BACKEND_URL
+        json: JSON body
+        params: Query params
+        headers: Extra headers merged over the defaults
+        timeout: Per-call timeout in seconds (defaults to NODE_HTTP_TIMEOUT)
+    """
+    client, semaphore = _get_pool()
+    request_timeout = httpx.Timeout(timeout, connect=NODE_HTTP_CONNECT_TIMEOUT) if timeout else httpx.USE_CLIENT_DEFAULT
+    async with semaphore:
+        return await client.request(
+            method, path, json=json, params=params, headers=headers, timeout=request_timeout
+        )
+
+
+def _error_message(response: httpx.Response) -> str:
+    """Extract a readable error message from a failed backend response"""
+    try:
+        return response.json().get("message") or f"Backend returned {response.status_code}"
+    except Exception:
+        return response.text or f"Backend returned {response.status_code}"
+
+
+def _parse_json(response: httpx.Response, action: str) -> Dict[str, Any]:
+    """Validate and decode a backend response, raising NodeBackendError on failure"""
+    if response.status_code >= 400:
+        raise NodeBackendError(f"Failed to {action}: {_error_message(response)}", response.status_code)
+    if not response.text or response.text.strip() == "":
+        raise NodeBackendError("Empty response from backend", response.status_code)
+    try:
+        return response.json()
+    except ValueError:
+        raise NodeBackendError(f"Invalid JSON response from backend: {response.text}", response.status_code)
+
+
+def _require_secret() -> None:
+    if not AI_SECRET:
+        raise ValueError("AI_INTERNAL_SECRET environment variable is not set")
+
+
+# =========================
+# TOOL SURFACE (mirrors node_client.py)
+# =========================
+
+async def add_transaction_tool(user_id, tx_type, category, amount, note, timeout: Optional[float] = None):
+    """Add a transaction for the user"""
+    _require_secret()
+    response = await node_request(
+        "POST",
+        "/api/ai/add-transaction",
+        json={
+            "userId": user_id,
+            "type": tx_type,
+            "category": category,
+            "amount": amount,
+            "note": note
+        },
+        timeout=timeout,
+    )
+    result = _parse_json(response, "add transaction")
+    print(f"🔧 [async_node_client] add_transaction_tool -> {response.status_code}")
+    return result
+
+
+async def update_transaction_tool(user_id, transaction_id, fields, timeout: Optional[float] = None):
+    """Update fields of an existing transaction"""
+    response = await node_request(
+        "PUT",
+        f"/api/ai/update-transaction/{transaction_id}",
+        json={"userId": user_id, "fields": fields},
+        timeout=timeout,
+    )
+    return response.json()
+
+
+async def delete_transaction_tool(user_id, transaction_id, timeout: Optional[float] = None):
+    """Delete a transaction"""
+    response = await node_request(
+        "DELETE",
+        f"/api/ai/delete-transaction/{transaction_id}",
+        json={"userId": user_id},
+        timeout=timeout,
+    )
+    return response.json()
+
+
+async def get_transactions_tool(user_id, filters, timeout: Optional[float] = None):
+    """Fetch transactions matching filters"""
+    response = await node_request(
+        "POST",
+        "/api/ai/get-transactions",
+        json={"userId": user_id, "filters": filters},
+        timeout=timeout,
+    )
+    return response.json()
+
+
+async def get_user_stats_tool(user_id, timeout: Optional[float] = None):
+    """Fetch fresh user stats from backend"""
+    try:
+        response = await node_request(
+            "POST",
+            "/api/ai/get-stats",
+            json={"userId": user_id},
+            timeout=timeout,
+        )
+        return response.json().get("stats")
+    except Exception as e:
+        print(f"❌ [async_node_client] Error fetching stats: {e}")
+        return None
+
+
+async def create_goal_tool(user_id, name, target_amount, deadline=None, priority="good_to_have", timeout: Optional[float] = None):
+    """Create a new financial goal"""
+    _require_secret()
+    payload = {
+        "userId": user_id,
+        "name": name,
+        "targetAmount": target_amount,
+    }
+    if deadline:
+        payload["deadline"] = deadline
+    if priority:
+        payload["priority"] = priority
+
+    response = await node_request("POST", "/api/ai/create-goal", json=payload, timeout=timeout)
+    result = _parse_json(response, "create goal")
+    print(f"🎯 [async_node_client] create_goal_tool -> {response.status_code}")
+    return result
+
+
+async def fetch_recent_transactions(user_id, page=None, limit=20, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Fetch recent transactions for AI context
+
+    Args:
+        user_id: User ID
+        page: Optional page filter (income/expense/savings/investment/goals/dashboard)
+        limit: Number of transactions to fetch (default 20, max 50)
+
+    Returns:
+        List of transaction dicts (empty on any failure)
+    """
+    if not AI_SECRET:
+        print("❌ [async_node_client] Cannot fetch transactions without AI_SECRET")
+        return []
+
+    filters = {"limit": min(limit, 50)}
+    page_types = {
+        "income": "income",
+        "expense": "expense",
+        "savings": "saving",
+        "investment": "investment",
+    }
+    if page in page_types:
+        filters["type"] = page_types[page]
+
+    try:
+        response = await node_request(
+            "POST",
+            "/api/ai-internal/get-recent-transactions",
+            json={"userId": user_id, "filters": filters},
+            timeout=timeout,
+        )
+        if response.status_code == 200:
+            transactions = response.json().get("transactions", [])
+            print(f"📊 [async_node_client] Fetched {len(transactions)} transactions")
+            return transactions
+        print(f"⚠️ [async_node_client] Failed to fetch transactions: {response.status_code}")
+        return []
+    except Exception as e:
+        print(f"❌ [async_node_client] ERROR in fetch_recent_transactions: {e}")
+        return []
+
+
+async def get_latest_data(user_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Fetch the consolidated latest-data snapshot (stats, goals, alerts, behavior, transactions)"""
+    try:
+        response = await node_request(
+            "GET",
+            "/api/latest-data/latest",
+            params={"userId": user_id},
+            headers={"x-internal-access": "true"},
+            timeout=timeout,
+        )
+        if response.status_code == 200:
+            return response.json().get("data", {})
+        print(f"⚠️ Latest data endpoint returned {response.status_code}")
+        return {}
+    except Exception as e:
+        print(f"⚠️ Error fetching latest financial data: {e}")
+        return {}
+
+
+async def get_ai_alerts_tool(user_id: str, limit: int = 5, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Fetch the user's active alerts (from the latest-data snapshot)"""
+    latest = await get_latest_data(user_id, timeout=timeout)
+    return (latest.get("alerts") or [])[:limit]
+
+
+async def backend_api_request(
+    method: str,
+    path: str,
+    payload: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Generic JSON call against BACKEND_BASE_URL.
+    Never raises - returns {"success": False, "error": ...} on failure.
+    """
+    try:
+        response = await node_request(method, f"{BACKEND_BASE_URL}{path}", json=payload, timeout=timeout)
+        if response.status_code >= 400:
+            return {"success": False, "status": response.status_code, "error": _error_message(response)}
+        return response.json() if response.text.strip() else {"success": True}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+# =========================
+# BULK WRITES
+# =========================
+
+BULK_TRANSACTIONS_PATH = "/transactions/bulk"
+# Per-item statuses; created and duplicate both mean the backend has the transaction
+STATUS_CREATED = "created"
+STATUS_DUPLICATE = "duplicate"
+STATUS_FAILED = "failed"
+
+
+class BulkUnsupportedError(Exception):
+    """The backend has no bulk endpoint (404 / 405)"""
+
+
+async def _send_bulk(user_id: str, source: str, batch: List[Tuple[str, Dict[str, Any]]],
+                     timeout: Optional[float]) -> Dict[str, Tuple[str, Optional[str]]]:
+    """
+    One POST /transactions/bulk.
+
+    Contract: {"userId", "source", "items": [{"dedupKey", "transaction"}]} ->
+    {"results": [{"dedupKey", "status": created|duplicate|error, "error"?}]}.
+    Returns {dedupKey: (status, error)}; items missing from the response are not in it.
+    """
+    response = await node_request(
+        "POST",
+        f"{BACKEND_BASE_URL}{BULK_TRANSACTIONS_PATH}",
+        json={
+            "userId": user_id,
+            "source": source,
+            "items": [{"dedupKey": key, "transaction": tx} for key, tx in batch],
+        },
+        timeout=timeout,
+    )
+    if response.status_code in (404, 405):
+        raise BulkUnsupportedError(f"{BULK_TRANSACTIONS_PATH} returned {response.status_code}")
+    data = _parse_json(response, "bulk write transactions")
+
+    outcome: Dict[str, Tuple[str, Optional[str]]] = {}
+    for item in data.get("results") or []:
+        key = item.get("dedupKey") if isinstance(item, dict) else None
+        if key is None:
+            continue
+        status = item.get("status")
+        if status in (STATUS_CREATED, STATUS_DUPLICATE):
+            outcome[key] = (status, None)
+        else:
+            outcome[key] = (STATUS_FAILED, item.get("error") or f"status {status!r}")
+    return outcome
+
+
+async def _send_legacy(user_id: str, legacy_path: str, batch: List[Tuple[str, Dict[str, Any]]],
+                       timeout: Optional[float]) -> Dict[str, Tuple[str, Optional[str]]]:
+    """Per-item fallback against the old single-transaction endpoint"""
+    results = await asyncio.gather(*(
+        backend_api_request("POST", legacy_path, {"userId": user_id, "transaction": tx}, timeout=timeout)
+        for _, tx in batch
+    ))
+    return {
+        key: (STATUS_CREATED, None) if result.get("success") else (STATUS_FAILED, result.get("error") or "not stored")
+        for (key, _), result in zip(batch, results)
+    }
+
+
+async def backend_bulk_write(
+    user_id: str,
+    source: str,
+    items: Sequence[Tuple[str, Dict[str, Any]]],
+    legacy_path: Optional[str] = None,
+    batch_size: int = BULK_WRITE_BATCH_SIZE,
+    max_retries: int = BULK_WRITE_MAX_RETRIES,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Store many transactions with few round-trips.
+
+    Items are (dedupKey, transaction) pairs; the key (row hash + occurrence for
+    statements, the Gmail message id for emails) travels with the item so the
+    backend can drop what it already has. Items are sent batch_size at a time,
+    BULK_WRITE_CONCURRENCY batches in flight. After each round only the items
+    that failed (or whose batch failed as a whole) are re-sent, with jittered
+    exponential backoff, up to max_retries times. If the backend has no bulk
+    endpoint and legacy_path is given, the same loop runs per item against it.
+    Repeated keys in the input are sent once. Never raises.
+
+    Returns:
+        dict: success (nothing failed), results [{dedupKey, status, error?, attempts}]
+              in input order, created / duplicates / failed counts, requests made
+    """
+    transactions: Dict[str, Dict[str, Any]] = {}
+    for key, tx in items:
+        transactions.setdefault(key, tx)
+
+    status: Dict[str, Tuple[str, Optional[str]]] = {}
+    attempts: Dict[str, int] = {key: 0 for key in transactions}
+    semaphore = asyncio.Semaphore(max(1, BULK_WRITE_CONCURRENCY))
+    use_legacy = False
+    requests = 0
+    pending = list(transactions)
+
+    async def send(batch: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Tuple[str, Optional[str]]]:
+        nonlocal use_legacy, requests
+        async with semaphore:
+            if not use_legacy:
+                try:
+                    requests += 1
+                    return await _send_bulk(user_id, source, batch, timeout)
+                except BulkUnsupportedError:
+                    if not legacy_path:
+                        raise
+                    if not use_legacy:
+                        print(f"⚠️ [async_node_client] No bulk endpoint, falling back to {legacy_path}")
+                    use_legacy = True
+            requests += len(batch)
+            return await _send_legacy(user_id, legacy_path, batch, timeout)
+
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        if attempt:
+            await asyncio.sleep(BULK_WRITE_BACKOFF * (2 ** (attempt - 1)) * (0.5 + random.random()))
+        size = max(1, batch_size)
+        batches = [[(key, transactions[key]) for key in pending[i:i + size]] for i in range(0, len(pending), size)]
+        outcomes = await asyncio.gather(*(send(batch) for batch in batches), return_exceptions=True)
+
+        for batch, outcome in zip(batches, outcomes):
+            for key, _ in batch:
+                attempts[key] += 1
+                if isinstance(outcome, Exception):
+                    status[key] = (STATUS_FAILED, str(outcome) or type(outcome).__name__)
+                else:
+                    status[key] = outcome.get(key, (STATUS_FAILED, "missing from bulk response"))
+        if any(isinstance(outcome, BulkUnsupportedError) for outcome in outcomes):
+            break  # retrying cannot help without an endpoint to write to
+        pending = [key for key in pending if status[key][0] == STATUS_FAILED]
+
+    results = []
+    seen = set()
+    for key, _ in items:
+        state, error = status.get(key, (STATUS_FAILED, "not sent"))
+        if key in seen and state != STATUS_FAILED:
+            state = STATUS_DUPLICATE  # repeated in this request
+        seen.add(key)
+        result = {"dedupKey": key, "status": state, "attempts": attempts.get(key, 0)}
+        if error:
+            result["error"] = error
+        results.append(result)
+
+    counts = {state: sum(1 for r in results if r["status"] == state)
+              for state in (STATUS_CREATED, STATUS_DUPLICATE, STATUS_FAILED)}
+    return {
+        "success": counts[STATUS_FAILED] == 0,
+        "results": results,
+        "created": counts[STATUS_CREATED],
+        "duplicates": counts[STATUS_DUPLICATE],
+        "failed": counts[STATUS_FAILED],
+        "requests": requests,
+    }
@@ -0,0 +1,170 @@
+"""
+Benchmark + local stand-in for the bulk ingestion write path
+
+The stand-in is a tiny threaded HTTP server implementing the backend
+contracts the ingestion routes write to:
+    POST /api/transactions/bulk             (async_node_client.backend_bulk_write)
+    POST /api/transactions/from-statement   (legacy, one transaction per call)
+    POST /api/transactions/from-email       (legacy, one transaction per call)
+It stores transactions in memory, reports duplicates by dedupKey, adds a
+fixed per-request latency and can fail a share of bulk items so the retry
+path gets exercised.
+
+Run from ai-service/:
+    python -m benchmarks.bulk_write_bench [--items 400] [--latency-ms 20] [--fail-rate 0.1]
+    python -m benchmarks.bulk_write_bench --serve [--port 8787]   # stand-in only
+Point BACKEND_BASE_URL at http://127.0.0.1:<port>/api to use the stand-in from the service.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+
+class StandInBackend(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, latency: float = 0.0, fail_rate: float = 0.0, bulk: bool = True):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.bulk = bulk
+        self.rng = random.Random(7)
+        self.lock = threading.Lock()
+        self.stored: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.requests = 0
+
+    def store(self, user_id: str, key: str, transaction: Dict[str, Any]) -> str:
+        with self.lock:
+            if (user_id, key) in self.stored:
+                return "duplicate"
+            self.stored[(user_id, key)] = transaction
+            return "created"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StandInBackend
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        time.sleep(server.latency)
+
+        if self.path == "/api/transactions/bulk" and server.bulk:
+            results = []
+            for item in body.get("items", []):
+                key = item.get("dedupKey")
+                with server.lock:
+                    failed = server.rng.random() < server.fail_rate
+                if failed:
+                    results.append({"dedupKey": key, "status": "error", "error": "simulated write failure"})
+                else:
+                    results.append({"dedupKey": key, "status": server.store(body.get("userId"), key, item["transaction"])})
+            return self._reply(200, {"success": True, "results": results})
+
+        if self.path in ("/api/transactions/from-statement", "/api/transactions/from-email"):
+            tx = body.get("transaction", {})
+            key = tx.get("hash") or tx.get("emailId") or json.dumps(tx, sort_keys=True)
+            server.store(body.get("userId"), key, tx)
+            return self._reply(200, {"success": True})
+
+        self._reply(404, {"message": f"No route for {self.path}"})
+
+
+def build_transactions(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    from parser import hash_row
+
+    rng = random.Random(seed)
+    transactions = []
+    for i in range(count):
+        date = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        description = f"UPI/MERCHANT{rng.randint(1, 80)}/{rng.randint(10 ** 9, 10 ** 10)}"
+        amount = round(rng.uniform(10, 5000), 2)
+        transactions.append({
+            "date": date, "type": "expense", "amount": amount, "category": "Other",
+            "description": description, "hash": hash_row(date, description, amount),
+        })
+    return transactions
+
+
+async def _per_item(client, transactions: List[Dict[str, Any]]) -> int:
+    """The previous write path: one awaited request per transaction"""
+    stored = 0
+    for tx in transactions:
+        result = await client.backend_api_request(
+            "POST", "/transactions/from-statement", {"userId": "bench", "transaction": tx}
+        )
+        stored += bool(result.get("success"))
+    return stored
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--serve", action="store_true", help="only run the stand-in backend")
+    args = parser.parse_args()
+
+    server = StandInBackend(args.port, args.latency_ms / 1000, args.fail_rate)
+    if args.serve:
+        print(f"🧪 Stand-in backend on http://127.0.0.1:{args.port}/api")
+        server.serve_forever()
+        return
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # The client reads its base URL from config at import time
+    os.environ["BACKEND_BASE_URL"] = f"http://127.0.0.1:{args.port}/api"
+    import async_node_client as client
+
+    transactions = build_transactions(args.items)
+    print(f"📦 {len(transactions)} transactions, {args.latency_ms:.0f} ms per backend request")
+
+    async def run() -> None:
+        started = time.perf_counter()
+        stored = await _per_item(client, transactions)
+        per_item = time.perf_counter() - started
+        print(f"per-item: {per_item * 1000:8.1f} ms  {server.requests} requests, {stored} stored")
+
+        server.stored.clear()
+        server.requests = 0
+        started = time.perf_counter()
+        write = await client.backend_bulk_write(
+            "bench", "pdf_statement", [(tx["hash"], tx) for tx in transactions] + [(transactions[0]["hash"], transactions[0])]
+        )
+        bulk = time.perf_counter() - started
+        retried = sum(1 for r in write["results"] if r["attempts"] > 1)
+        print(f"bulk:     {bulk * 1000:8.1f} ms  {server.requests} requests, created {write['created']}, "
+              f"duplicates {write['duplicates']}, failed {write['failed']}, {retried} items retried")
+        print(f"speedup:  {per_item / bulk:.1f}x")
+        if len(server.stored) + write["failed"] != len(transactions):
+            raise SystemExit("❌ stand-in store does not match the reported results")
+        print("✅ Every item was stored exactly once or reported as failed")
+        await client.aclose_node_client()
+
+    asyncio.run(run())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
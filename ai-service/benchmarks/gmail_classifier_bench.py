@@ -0,0 +1,136 @@
+"""
+Benchmark: GmailTransactionClassifier single-pass matcher vs the naive scans
+
+Generates a synthetic corpus of bank / UPI / promo emails, checks that the
+compiled matcher returns exactly what the original per-pattern re.search and
+`k in text` loops return, then times both.
+
+Run from ai-service/:
+    python -m benchmarks.gmail_classifier_bench [--emails 5000] [--repeat 3]
+"""
+
+import argparse
+import random
+import re
+import time
+from typing import Dict, List, Optional
+
+from connect_mail import AMOUNT_PATTERNS, GmailTransactionClassifier
+
+MERCHANTS = ["SWIGGY", "Zomato Ltd", "AMAZON PAY", "Uber India", "BigBasket", "IRCTC", "Rahul Kumar",
+             "Jio Recharge", "Netflix", "Chai Point", "DMart", "Apollo Pharmacy"]
+BANK_TEMPLATES = [
+    "Dear Customer, Rs.{amt} has been debited from account **{acct} to VPA {vpa} {merchant} on {date}. "
+    "Your UPI transaction reference number is {ref}. If you did not authorize this transaction, call 18002586161.",
+    "Dear Customer, Rs. {amt} is successfully credited to your account **{acct} by VPA {vpa} {merchant} on {date}.",
+    "Your ICICI Bank Account XX{acct} has been debited with INR {amt} on {date}. Info: UPI/{ref}/{merchant}. "
+    "The Available Balance is INR {bal}. Call 18002662 for dispute or SMS BLOCK 646 to 9215676766",
+    "ICICI Bank Credit Card XX{acct} has been used for a transaction of INR {amt} on {date} at {merchant}. "
+    "Avl Limit: INR {bal}.",
+    "You paid ₹{amt} to {merchant}. UPI Ref No. {ref}. Paid via Paytm Payments Bank.",
+    "Received ₹{amt} from {merchant} on PhonePe. Transaction ID {ref}.",
+    "{merchant} paid you ₹{amt}. The money is in your bank account.",
+    "Refund of Rs {amt} for your order from {merchant} has been initiated and will be credited in 5-7 days.",
+    "Salary credited: INR {amt} deposited to your account XX{acct} on {date}. NEFT ref {ref}.",
+    "Your payment of ₹{amt} to {merchant} failed. Any amount debited will be reversed within 3 days.",
+]
+NOISE_TEMPLATES = [
+    "Hi there, your weekly newsletter is here. Read about {merchant} and 10 ways to save more this month.",
+    "Flat 50% off on {merchant}! Use code SAVE{ref} at checkout. T&C apply. Offer valid till {date}.",
+    "Your OTP for login is {ref}. Do not share it with anyone.",
+    "Meeting notes: discussed the Q3 roadmap, hiring for 4 positions and the offsite in {date}.",
+]
+# Full bodies (what fetch_and_classify classifies) carry long legal footers
+FOOTER = (
+    " This is a system-generated e-mail. Please do not reply to this e-mail. Never share your card number, "
+    "CVV, PIN, OTP or internet banking credentials with anyone, including bank staff. Beware of fraudulent "
+    "calls, messages and links asking you to update KYC details. The information contained in this e-mail is "
+    "confidential and may be legally privileged. It is intended solely for the addressee. Access to this "
+    "e-mail by anyone else is unauthorised. If you are not the intended recipient, any disclosure, copying, "
+    "distribution or any action taken or omitted to be taken in reliance on it, is prohibited and may be "
+    "unlawful. To unsubscribe from promotional mails, update your communication preferences in net banking."
+)
+SUBJECTS = ["Transaction alert", "You have done a UPI txn", "Payment successful", "Account update",
+            "Money received", "Refund initiated", "Weekly digest", "Your OTP", "Credit card alert"]
+
+
+def build_corpus(size: int, seed: int = 7, footers: int = 0) -> List[str]:
+    """Synthetic subject + body texts, roughly 80% transactional, each followed by `footers` legal footers"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        template = rng.choice(BANK_TEMPLATES if rng.random() < 0.8 else NOISE_TEMPLATES)
+        body = template.format(
+            amt=f"{rng.randint(1, 99999):,}.{rng.randint(0, 99):02d}",
+            bal=f"{rng.randint(1000, 999999):,}.00",
+            acct=rng.randint(1000, 9999),
+            vpa=f"user{rng.randint(1, 999)}@ok{rng.choice(['axis', 'icici', 'hdfcbank'])}",
+            merchant=rng.choice(MERCHANTS),
+            date=f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-24",
+            ref=rng.randint(10 ** 9, 10 ** 10),
+        )
+        corpus.append(f"{rng.choice(SUBJECTS)} {body}{FOOTER * footers}")
+    return corpus
+
+
+def naive_scan(text: str) -> Dict:
+    """The original classifier logic: 12 re.search calls + 3 keyword list scans"""
+    amount: Optional[float] = None
+    for pattern in AMOUNT_PATTERNS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            try:
+                value = float(match.group(1).replace(',', ''))
+                if value > 0:
+                    amount = value
+                    break
+            except ValueError:
+                continue
+    lowered = text.lower()
+    return {
+        'amount': amount,
+        'transaction': [k for k in GmailTransactionClassifier.TRANSACTION_KEYWORDS if k in lowered],
+        'expense': [k for k in GmailTransactionClassifier.EXPENSE_KEYWORDS if k in lowered],
+        'income': [k for k in GmailTransactionClassifier.INCOME_KEYWORDS if k in lowered],
+    }
+
+
+def _time(fn, corpus: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--emails", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not GmailTransactionClassifier.MATCHER.accelerated:
+        print("⚠️ pyahocorasick not installed: the matcher is running its naive fallback")
+    for label, footers in (("snippets", 0), ("full bodies", 3)):
+        corpus = build_corpus(args.emails, footers=footers)
+        print(f"\n📨 {label}: {len(corpus)} emails, avg {sum(map(len, corpus)) // len(corpus)} chars")
+        _compare(corpus, args.repeat)
+
+
+def _compare(corpus: List[str], repeat: int) -> None:
+    mismatches = [t for t in corpus if naive_scan(t) != GmailTransactionClassifier.scan(t)]
+    if mismatches:
+        raise SystemExit(f"❌ {len(mismatches)} mismatches, e.g.: {mismatches[0][:120]}")
+    print(f"✅ Matcher agrees with the naive scans on {len(corpus)} emails")
+
+    naive = _time(naive_scan, corpus, repeat)
+    compiled = _time(GmailTransactionClassifier.scan, corpus, repeat)
+    print(f"naive:    {naive * 1000:8.1f} ms  ({naive / len(corpus) * 1e6:6.1f} µs/email)")
+    print(f"matcher:  {compiled * 1000:8.1f} ms  ({compiled / len(corpus) * 1e6:6.1f} µs/email)")
+    print(f"speedup:  {naive / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,108 @@
 import json
-import os
-from groq import AsyncGroq
-from prompts.system_prompt import classifier_prompt
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from prompts.system_prompt import classifier_prompt, batch_classifier_prompt
+from services.classification_cache import get_classification_cache, description_fingerprint
+from services.knn_categorizer import categorize_locally, learn_classifications, learn_in_background
+from services.llm_gateway import get_llm_gateway, LANE_INTERACTIVE, LANE_BACKGROUND
+from config import CLASSIFY_BATCH_SIZE, CLASSIFY_BATCH_MAX_RETRIES, CLASSIFY_BATCH_CONCURRENCY
 from dotenv import load_dotenv
 
 load_dotenv()
 
-client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
+client = get_llm_gateway()
 GROQ_MODEL = "llama-3.3-70b-versatile"
 
-async def classify_text(text):
+VALID_TYPES = {"income", "expense", "saving", "investment"}
+VALID_SUBTYPES = {"fixed", "variable", "one-time", "debit", "allocation", "lumpsum"}
+
+
+def _strip_code_fence(response: str) -> str:
+    """Clean up potential markdown formatting"""
+    response = response.strip()
+    if response.startswith("```json"):
+        response = response[7:]
+    if response.endswith("```"):
+        response = response[:-3]
+    return response.strip()
+
+
+def _normalize(data: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Ensure required keys exist and are within expected enums"""
+    type_ = data.get("type", "expense")
+    subtype = data.get("subtype", "one-time")
+    category = data.get("category", "Other")
+    note = data.get("note", text)
+
+    # Normalize some common values / typos
+    if type_ not in VALID_TYPES:
+        type_ = "expense"
+    if subtype not in VALID_SUBTYPES:
+        subtype = "one-time"
+
+    return {
+        "type": type_,
+        "subtype": subtype,
+        "category": category,
+        "note": note,
+    }
+
+
+def _fallback(text: str) -> Dict[str, Any]:
+    return {
+        "type": "expense",
+        "subtype": "variable",
+        "category": "Other",
+        "note": text,
+        "source": "fallback"
+    }
+
+
+def _from_knn(match: Dict[str, Any], text: str) -> Dict[str, Any]:
+    classification = _normalize(match, text)
+    classification["source"] = "knn"
+    return classification
+
+
+def _from_cache(cache, text: str, user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The user's own label for this merchant, else the shared cache entry, else None"""
+    cached = cache.get_user_label(user_id, text)
+    source = "feedback"
+    if cached is None:
+        cached = cache.get(text)
+        source = "cache"
+    if cached is None:
+        return None
+    return {**cached, "note": text, "source": source}
+
+
+async def record_feedback(text: str, classification: Dict[str, Any], user_id: str) -> Dict[str, int]:
+    """
+    A user-confirmed (or corrected) classification: stored as the user's label
+    for this merchant (checked before the shared cache) and added to the
+    user's kNN index so similar descriptions follow it.
+    """
+    labelled = get_classification_cache().set_user_label(user_id, text, classification)
+    learned = await learn_classifications([(text, classification)], user_id, source="user")
+    return {"labelled": int(labelled), "learned": learned}
+
+
+async def classify_text(text, user_id: Optional[str] = None):
+    # The user's own label, then repeat merchants from the persistent fingerprint cache
+    cache = get_classification_cache()
+    cached = _from_cache(cache, text, user_id)
+    if cached is not None:
+        return cached
+
+    # Similar descriptions already classified (globally or by this user) are voted on locally
+    match = (await categorize_locally([text], user_id))[0]
+    if match is not None:
+        return _from_knn(match, text)
+
     try:
         result = await client.chat.completions.create(
             model=GROQ_MODEL,
+            lane=LANE_INTERACTIVE,
             temperature=0.2,
             messages=[
                 {"role": "system", "content": classifier_prompt},
@@ -20,45 +110,161 @@ async def classify_text(text):
             ]
         )
 
-        response = result.choices[0].message.content.strip()
-
-        # Clean up potential markdown formatting
-        if response.startswith("```json"):
-            response = response[7:]
-        if response.endswith("```"):
-            response = response[:-3]
-        
-        response = response.strip()
-        data = json.loads(response)
-
-        # Ensure required keys exist and are within expected enums
-        type_ = data.get("type", "expense")
-        subtype = data.get("subtype", "one-time")
-        category = data.get("category", "Other")
-        note = data.get("note", text)
-
-        # Normalize some common values / typos
-        valid_types = {"income", "expense", "saving", "investment"}
-        if type_ not in valid_types:
-            type_ = "expense"
-
-        valid_subtypes = {"fixed", "variable", "one-time", "debit", "allocation", "lumpsum"}
-        if subtype not in valid_subtypes:
-            subtype = "one-time"
-
-
-        return {
-            "type": type_,
-            "subtype": subtype,
-            "category": category,
-            "note": note,
-        }
+        data = json.loads(_strip_code_fence(result.choices[0].message.content))
+        classification = _normalize(data, text)
+        classification["source"] = "llm"
+        # Only successful LLM answers are cached / indexed; the fallback below never is
+        cache.set(text, classification)
+        learn_in_background([(text, classification)])
+        return classification
     except Exception as e:
         # Fallback for any error (JSON or API)
         print(f"Classification error: {e}")
-        return {
-            "type": "expense",
-            "subtype": "variable",
-            "category": "Other",
-            "note": text
-        }
+        return _fallback(text)
+
+
+# =========================
+# BATCH CLASSIFICATION
+# =========================
+
+def _is_valid(item: Any) -> bool:
+    """Strict check for one batch result; anything failing is re-run"""
+    return (
+        isinstance(item, dict)
+        and item.get("type") in VALID_TYPES
+        and isinstance(item.get("category"), str)
+        and bool(item["category"].strip())
+    )
+
+
+async def _classify_chunk(chunk: List[Tuple[int, str]]) -> Dict[int, Dict[str, Any]]:
+    """
+    One LLM call for a chunk of (index, text) pairs.
+    Returns only the results that passed validation, keyed by index.
+    """
+    payload = json.dumps({"items": [{"index": index, "text": text} for index, text in chunk]}, ensure_ascii=False)
+    try:
+        result = await client.chat.completions.create(
+            model=GROQ_MODEL,
+            lane=LANE_BACKGROUND,
+            temperature=0.2,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": batch_classifier_prompt},
+                {"role": "user", "content": payload}
+            ]
+        )
+        data = json.loads(_strip_code_fence(result.choices[0].message.content))
+    except Exception as e:
+        print(f"Batch classification error ({len(chunk)} items): {e}")
+        return {}
+
+    texts = dict(chunk)
+    valid: Dict[int, Dict[str, Any]] = {}
+    for item in data.get("results", []) if isinstance(data, dict) else []:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index")
+        # Only indices we asked about, first answer wins
+        if index in texts and index not in valid and _is_valid(item):
+            valid[index] = {**_normalize(item, texts[index]), "source": "llm"}
+    return valid
+
+
+async def classify_batch(
+    texts: List[str],
+    batch_size: int = CLASSIFY_BATCH_SIZE,
+    max_retries: int = CLASSIFY_BATCH_MAX_RETRIES,
+    concurrency: int = CLASSIFY_BATCH_CONCURRENCY,
+    user_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Classify many descriptions with few LLM calls.
+
+    The user's own labels (via /classify/feedback) come first, then cached
+    fingerprints are answered locally, identical fingerprints are sent
+    once, confident kNN matches never reach the LLM, the rest are packed `batch_size` per prompt and mapped back by index.
+    Items whose result is missing or fails validation are re-run (only those),
+    up to `max_retries` times; whatever is still unresolved gets the same
+    fallback as classify_text.
+
+    Returns:
+        dict: results (same order as texts), plus feedback / cached / knn / llmCalls / retried counts
+    """
+    cache = get_classification_cache()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+
+    # Cache hits first, then one representative text per remaining fingerprint
+    representatives: Dict[str, int] = {}
+    followers: Dict[int, List[int]] = {}
+    feedback_count = 0
+    cached_count = 0
+    for index, text in enumerate(texts):
+        cached = _from_cache(cache, text, user_id)
+        if cached is not None:
+            results[index] = cached
+            if cached["source"] == "feedback":
+                feedback_count += 1
+            else:
+                cached_count += 1
+            continue
+        key = description_fingerprint(text) or f"#{index}"
+        if key in representatives:
+            followers[representatives[key]].append(index)
+        else:
+            representatives[key] = index
+            followers[index] = []
+
+    pending = list(followers)
+    knn_count = 0
+    if pending:
+        matches = await categorize_locally([texts[i] for i in pending], user_id)
+        for index, match in zip(pending, matches):
+            if match is not None:
+                results[index] = _from_knn(match, texts[index])
+                knn_count += 1 + len(followers[index])
+        pending = [i for i in pending if results[i] is None]
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    llm_calls = 0
+    retried = 0
+    learned: List[Tuple[str, Dict[str, Any]]] = []
+
+    async def run(chunk: List[Tuple[int, str]]) -> Dict[int, Dict[str, Any]]:
+        async with semaphore:
+            return await _classify_chunk(chunk)
+
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        if attempt:
+            retried += len(pending)
+        size = max(1, batch_size)
+        chunks = [[(i, texts[i]) for i in pending[start:start + size]] for start in range(0, len(pending), size)]
+        llm_calls += len(chunks)
+        outcomes = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        for valid in outcomes:
+            for index, classification in valid.items():
+                results[index] = classification
+                cache.set(texts[index], classification)
+                learned.append((texts[index], classification))
+        pending = [i for i in pending if results[i] is None]
+
+    for index in pending:
+        results[index] = _fallback(texts[index])
+    learn_in_background(learned)
+
+    # Duplicates share their representative's classification, with their own note
+    for index, duplicates in followers.items():
+        for duplicate in duplicates:
+            results[duplicate] = {**results[index], "note": texts[duplicate]}
+
+    return {
+        "results": results,
+        "feedback": feedback_count,
+        "cached": cached_count,
+        "knn": knn_count,
+        "llmCalls": llm_calls,
+        "retried": retried,
+        "unresolved": len(pending),
+    }
@@ -22,6 +22,21 @@ SERVICE_JWT = os.getenv("SERVICE_JWT")
 # =========================
 NODE_BACKEND_URL = os.getenv("NODE_BACKEND_URL", "http://localhost:3000")
 AI_SERVICE_URL = os.getenv("AI_SERVICE_URL", "http://localhost:8001")
+BACKEND_BASE_URL = os.getenv("BACKEND_BASE_URL", f"{NODE_BACKEND_URL}/api")
+
+# =========================
+# NODE CLIENT (HTTP POOL)
+# =========================
+NODE_HTTP_TIMEOUT = float(os.getenv("NODE_HTTP_TIMEOUT", "10"))
+NODE_HTTP_CONNECT_TIMEOUT = float(os.getenv("NODE_HTTP_CONNECT_TIMEOUT", "3"))
+NODE_HTTP_MAX_CONNECTIONS = int(os.getenv("NODE_HTTP_MAX_CONNECTIONS", "50"))
+NODE_HTTP_MAX_KEEPALIVE = int(os.getenv("NODE_HTTP_MAX_KEEPALIVE", "20"))
+NODE_HTTP_MAX_CONCURRENCY = int(os.getenv("NODE_HTTP_MAX_CONCURRENCY", "32"))
+# Bulk ingestion writes (async_node_client.backend_bulk_write -> POST /transactions/bulk)
+BULK_WRITE_BATCH_SIZE = int(os.getenv("BULK_WRITE_BATCH_SIZE", "100"))
+BULK_WRITE_MAX_RETRIES = int(os.getenv("BULK_WRITE_MAX_RETRIES", "2"))
+BULK_WRITE_CONCURRENCY = int(os.getenv("BULK_WRITE_CONCURRENCY", "4"))
+BULK_WRITE_BACKOFF = float(os.getenv("BULK_WRITE_BACKOFF", "0.5"))
 
 # =========================
 # EMAIL CONFIGURATION
@@ -36,12 +51,118 @@ MENTOR_EMAIL_PASSWORD = os.getenv("MENTOR_EMAIL_PASSWORD")
 # =========================
 GROQ_MODEL = "llama-3.3-70b-versatile"
 
+# Central LLM gateway (services/llm_gateway.py): account quota and retry policy
+LLM_RPM = float(os.getenv("LLM_RPM", "30"))
+LLM_TPM = float(os.getenv("LLM_TPM", "12000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+# Completion allowance reserved for calls that don't set max_tokens
+LLM_DEFAULT_COMPLETION_TOKENS = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", "600"))
+# Share of each bucket the standard lane leaves free (background leaves twice that)
+LLM_LANE_RESERVE = float(os.getenv("LLM_LANE_RESERVE", "0.15"))
+# LLM call telemetry (services/llm_telemetry.py): rolling JSONL call log and USD per 1M tokens
+LLM_TELEMETRY_LOG_PATH = os.getenv("LLM_TELEMETRY_LOG_PATH", os.path.join(os.getcwd(), "llm_calls.jsonl"))
+LLM_TELEMETRY_LOG_MAX_BYTES = int(os.getenv("LLM_TELEMETRY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LLM_TELEMETRY_LOG_BACKUPS = int(os.getenv("LLM_TELEMETRY_LOG_BACKUPS", "3"))
+LLM_PRICE_INPUT_PER_M = float(os.getenv("LLM_PRICE_INPUT_PER_M", "0.59"))
+LLM_PRICE_OUTPUT_PER_M = float(os.getenv("LLM_PRICE_OUTPUT_PER_M", "0.79"))
+# Token-budgeted prompt assembly (prompts/assembler.py): tiktoken encoding used to count tokens
+# and total budgets (template + data sections) for the largest prompts
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "cl100k_base")  # "" counts with the built-in estimate only
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "4000"))
+INSIGHT_PROMPT_TOKEN_BUDGET = int(os.getenv("INSIGHT_PROMPT_TOKEN_BUDGET", "2500"))
+
 # =========================
 # CHROMA DB CONFIGURATION
 # =========================
 BASE_DIR = os.getcwd()
 CHROMA_PATH = os.path.join(BASE_DIR, "chroma_db")
 
+# Batched memory writes (tools/memory_writer.py)
+MEMORY_WRITE_BATCH_SIZE = int(os.getenv("MEMORY_WRITE_BATCH_SIZE", "32"))
+MEMORY_WRITE_FLUSH_INTERVAL = float(os.getenv("MEMORY_WRITE_FLUSH_INTERVAL", "0.5"))
+# Threads used for query embeddings / Chroma reads issued from async handlers
+EMBEDDING_EXECUTOR_WORKERS = int(os.getenv("EMBEDDING_EXECUTOR_WORKERS", "2"))
+# LRU + TTL cache for query embeddings in query_user_memories
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+
+# =========================
+# MARKET DATA CACHING
+# =========================
+# Shared Tavily market snapshot used by tools/market.market_overview
+MARKET_OVERVIEW_CACHE_TTL = float(os.getenv("MARKET_OVERVIEW_CACHE_TTL", "300"))
+MARKET_OVERVIEW_ERROR_TTL = float(os.getenv("MARKET_OVERVIEW_ERROR_TTL", "30"))
+
+# yfinance caches (services/market_data.py)
+MARKET_QUOTE_TTL = float(os.getenv("MARKET_QUOTE_TTL", "60"))
+MARKET_HISTORY_TTL = float(os.getenv("MARKET_HISTORY_TTL", "3600"))
+MARKET_INFO_TTL = float(os.getenv("MARKET_INFO_TTL", "86400"))
+MARKET_CACHE_MAX_SYMBOLS = int(os.getenv("MARKET_CACHE_MAX_SYMBOLS", "1000"))
+MARKET_BATCH_MAX_SYMBOLS = int(os.getenv("MARKET_BATCH_MAX_SYMBOLS", "100"))
+
+# On-disk daily OHLC store (services/history_store.py)
+MARKET_HISTORY_DIR = os.getenv("MARKET_HISTORY_DIR", os.path.join(BASE_DIR, "market_history"))
+MARKET_HISTORY_REFRESH_INTERVAL = float(os.getenv("MARKET_HISTORY_REFRESH_INTERVAL", "3600"))
+MARKET_HISTORY_BOOTSTRAP_DAYS = int(os.getenv("MARKET_HISTORY_BOOTSTRAP_DAYS", "365"))
+
+# =========================
+# AI INSIGHTS CACHING
+# =========================
+# Persistent (user, input fingerprint) -> generated insights (services/insight_cache.py)
+INSIGHT_CACHE_ENABLED = os.getenv("INSIGHT_CACHE_ENABLED", "true").lower() == "true"
+INSIGHT_CACHE_PATH = os.getenv("INSIGHT_CACHE_PATH", os.path.join(BASE_DIR, "insight_cache.sqlite3"))
+INSIGHT_CACHE_TTL = float(os.getenv("INSIGHT_CACHE_TTL", "21600"))
+INSIGHT_CACHE_MAX_ENTRIES = int(os.getenv("INSIGHT_CACHE_MAX_ENTRIES", "20000"))
+# Numbers within this relative distance (and below the absolute floor) fingerprint alike
+INSIGHT_CACHE_REL_TOLERANCE = float(os.getenv("INSIGHT_CACHE_REL_TOLERANCE", "0.02"))
+INSIGHT_CACHE_ABS_TOLERANCE = float(os.getenv("INSIGHT_CACHE_ABS_TOLERANCE", "1.0"))
+
+# =========================
+# TRANSACTION CLASSIFICATION
+# =========================
+# Persistent fingerprint -> type/subtype/category cache (services/classification_cache.py)
+CLASSIFICATION_CACHE_PATH = os.getenv("CLASSIFICATION_CACHE_PATH", os.path.join(BASE_DIR, "classification_cache.sqlite3"))
+CLASSIFICATION_CACHE_MAX_ENTRIES = int(os.getenv("CLASSIFICATION_CACHE_MAX_ENTRIES", "50000"))
+CLASSIFICATION_CACHE_MEMORY_SIZE = int(os.getenv("CLASSIFICATION_CACHE_MEMORY_SIZE", "5000"))
+
+# Batched LLM classification (classifier.classify_batch, /classify/batch)
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "25"))
+CLASSIFY_BATCH_MAX_RETRIES = int(os.getenv("CLASSIFY_BATCH_MAX_RETRIES", "2"))
+CLASSIFY_BATCH_CONCURRENCY = int(os.getenv("CLASSIFY_BATCH_CONCURRENCY", "4"))
+CLASSIFY_BATCH_MAX_ITEMS = int(os.getenv("CLASSIFY_BATCH_MAX_ITEMS", "500"))
+
+# Local embedding kNN tier ahead of the LLM (services/knn_categorizer.py)
+KNN_CATEGORIZER_ENABLED = os.getenv("KNN_CATEGORIZER_ENABLED", "true").lower() == "true"
+KNN_NEIGHBORS = int(os.getenv("KNN_NEIGHBORS", "7"))
+# Cosine similarity the nearest neighbour must reach before the vote counts at all
+KNN_MIN_SIMILARITY = float(os.getenv("KNN_MIN_SIMILARITY", "0.85"))
+# Share of the similarity-weighted vote the winning label needs
+KNN_MIN_AGREEMENT = float(os.getenv("KNN_MIN_AGREEMENT", "0.75"))
+# Vote multiplier for the requesting user's own confirmations
+KNN_USER_WEIGHT = float(os.getenv("KNN_USER_WEIGHT", "3.0"))
+
+# =========================
+# PDF STATEMENT PARSING
+# =========================
+# parser.parse_pdf: >1 splits page ranges across a process pool
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", "1"))
+# Smaller documents (or ranges) are not worth a worker process
+PDF_PARSE_MIN_PAGES_PER_WORKER = int(os.getenv("PDF_PARSE_MIN_PAGES_PER_WORKER", "25"))
+# /parse sends a page to the LLM only if its deterministic parse confidence is below this
+PDF_PAGE_MIN_CONFIDENCE = float(os.getenv("PDF_PAGE_MIN_CONFIDENCE", "0.9"))
+# LLM statement parsing (routes/pdf.py): prompt chunk size, parallel chunks, retries per chunk
+PDF_LLM_CHUNK_CHARS = int(os.getenv("PDF_LLM_CHUNK_CHARS", "6000"))
+PDF_LLM_CONCURRENCY = int(os.getenv("PDF_LLM_CONCURRENCY", "4"))
+PDF_LLM_CHUNK_RETRIES = int(os.getenv("PDF_LLM_CHUNK_RETRIES", "1"))
+
+# =========================
+# CHAT PIPELINE DEADLINES (seconds)
+# =========================
+CHAT_CONTEXT_DEADLINE = float(os.getenv("CHAT_CONTEXT_DEADLINE", "8"))
+CHAT_MARKET_DEADLINE = float(os.getenv("CHAT_MARKET_DEADLINE", "6"))
+
 # =========================
 # MEMORY TYPE MAPPING
 # =========================
@@ -64,6 +185,25 @@ TYPE_MAPPING = {
     "market_alert": "market_alert",
 }
 
+# =========================
+# GMAIL SYNC
+# =========================
+GMAIL_CRON_USER_CONCURRENCY = int(os.getenv("GMAIL_CRON_USER_CONCURRENCY", "20"))
+GMAIL_MAILBOX_CONCURRENCY = int(os.getenv("GMAIL_MAILBOX_CONCURRENCY", "5"))
+GMAIL_USER_SYNC_TIMEOUT = float(os.getenv("GMAIL_USER_SYNC_TIMEOUT", "120"))
+# Per-user incremental sync checkpoints and cron run log
+GMAIL_SYNC_DIR = os.getenv("GMAIL_SYNC_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gmail_sync"))
+GMAIL_PROCESSED_IDS_LIMIT = int(os.getenv("GMAIL_PROCESSED_IDS_LIMIT", "2000"))
+# Messages per Gmail batch HTTP request (Gmail allows up to 100, recommends <= 50)
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))
+# Messages that failed with a retryable error (429 / 5xx / transport) are re-requested
+GMAIL_BATCH_MAX_RETRIES = int(os.getenv("GMAIL_BATCH_MAX_RETRIES", "2"))
+GMAIL_BATCH_BACKOFF = float(os.getenv("GMAIL_BATCH_BACKOFF", "0.5"))
+# Body characters sent to the LLM for emails the templates / rules cannot resolve
+GMAIL_LLM_BODY_CHARS = int(os.getenv("GMAIL_LLM_BODY_CHARS", "2000"))
+# Override the Gmail API root (e.g. a local stand-in server for testing)
+GMAIL_API_ENDPOINT = os.getenv("GMAIL_API_ENDPOINT") or None
+
 # =========================
 # GIG WORKER DETECTION
 # =========================
@@ -5,14 +5,16 @@ Handles Gmail OAuth, email fetching, and transaction classification
 
 import os
 import json
-import re
 from typing import List, Dict, Optional
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from gmail_sync import GmailSyncState, list_new_message_ids
+from gmail_fetch import build_gmail_service, fetch_two_phase
+from utils.matcher import TextMatcher
+
 # Gmail API scopes
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
@@ -216,13 +218,30 @@ def get_gmail_service(userId: str):
                 print(f"❌ Invalid credentials for user: {userId}")
                 return None
         
-        service = build('gmail', 'v1', credentials=creds)
+        service = build_gmail_service(creds)
         return service
     except Exception as e:
         print(f"❌ Error building Gmail service: {e}")
         return None
 
 
+# Amount patterns for Indian currency, in priority order (group 1 is the number)
+AMOUNT_PATTERNS = [
+    r'₹\s*([\d,]+\.?\d*)',
+    r'rs\.?\s*([\d,]+\.?\d*)',
+    r'inr\s*([\d,]+\.?\d*)',
+    r'amount(?:\s*of)?\s*₹?\s*([\d,]+\.?\d*)',
+    r'by\s*₹?\s*([\d,]+\.?\d*)',
+    r'for\s*₹?\s*([\d,]+\.?\d*)',
+    r'paid\s*₹?\s*([\d,]+\.?\d*)',
+    r'payment\s*of\s*₹?\s*([\d,]+\.?\d*)',
+    r'debited\s*(?:by)?\s*₹?\s*([\d,]+\.?\d*)',
+    r'credited\s*(?:by)?\s*₹?\s*([\d,]+\.?\d*)',
+    r'([\d,]+\.?\d*)\s*₹',
+    r'([\d,]+\.?\d*)\s*rs',
+]
+
+
 class GmailTransactionClassifier:
     """Classifies Gmail messages as transactions"""
     
@@ -248,37 +267,45 @@ class GmailTransactionClassifier:
         "transfer from", "salary", "income"
     ]
     
+    # One compiled scan finds the amount and every keyword hit (see utils.matcher)
+    MATCHER = TextMatcher(AMOUNT_PATTERNS, {
+        "transaction": TRANSACTION_KEYWORDS,
+        "expense": EXPENSE_KEYWORDS,
+        "income": INCOME_KEYWORDS,
+    })
+    
     @staticmethod
     def extract_amount(text: str) -> Optional[float]:
         """Extract amount from text with improved patterns"""
-        # Enhanced patterns for Indian currency
-        patterns = [
-            r'₹\s*([\d,]+\.?\d*)',
-            r'rs\.?\s*([\d,]+\.?\d*)',
-            r'inr\s*([\d,]+\.?\d*)',
-            r'amount(?:\s*of)?\s*₹?\s*([\d,]+\.?\d*)',
-            r'by\s*₹?\s*([\d,]+\.?\d*)',
-            r'for\s*₹?\s*([\d,]+\.?\d*)',
-            r'paid\s*₹?\s*([\d,]+\.?\d*)',
-            r'payment\s*of\s*₹?\s*([\d,]+\.?\d*)',
-            r'debited\s*(?:by)?\s*₹?\s*([\d,]+\.?\d*)',
-            r'credited\s*(?:by)?\s*₹?\s*([\d,]+\.?\d*)',
-            r'([\d,]+\.?\d*)\s*₹',
-            r'([\d,]+\.?\d*)\s*rs',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                amount_str = match.group(1).replace(',', '')
-                try:
-                    amount = float(amount_str)
-                    if amount > 0:  # Reject amounts <= 0
-                        return amount
-                except ValueError:
-                    continue
+        amount, _ = GmailTransactionClassifier.MATCHER.scan(text)
+        return amount
+    
+    @staticmethod
+    def scan(text: str) -> Dict:
+        """
+        Single pass over text
         
-        return None
+        Returns:
+            Dict with keys: amount, transaction, expense, income
+            (the last three are the matched keywords of each list)
+        """
+        matcher = GmailTransactionClassifier.MATCHER
+        amount, found = matcher.scan(text)
+        return {
+            'amount': amount,
+            'transaction': matcher.hits(found, 'transaction'),
+            'expense': matcher.hits(found, 'expense'),
+            'income': matcher.hits(found, 'income'),
+        }
+    
+    @staticmethod
+    def prefilter(subject: str, snippet: str) -> bool:
+        """
+        Cheap metadata check (amount + transaction keyword in subject/snippet)
+        deciding whether a message's full body is worth downloading
+        """
+        result = GmailTransactionClassifier.scan(f"{subject} {snippet}")
+        return result['amount'] is not None and bool(result['transaction'])
     
     @staticmethod
     def classify_transaction(subject: str, body: str, from_addr: str = '') -> Optional[Dict]:
@@ -289,12 +316,13 @@ class GmailTransactionClassifier:
             Dict with keys: amount, text, type
             or None if not a valid transaction
         """
-        combined_text = f"{subject} {body}".lower()
+        combined_text = f"{subject} {body}"
         
         print(f"📨 Email: {subject[:60]}")
         
-        # Extract amount first
-        amount = GmailTransactionClassifier.extract_amount(combined_text)
+        # Amount and keyword hits in one pass
+        scanned = GmailTransactionClassifier.scan(combined_text)
+        amount = scanned['amount']
         
         if amount is None or amount <= 0:
             print(f"📨 Email ignored (no amount or amount <= 0)")
@@ -303,10 +331,7 @@ class GmailTransactionClassifier:
         print(f"💰 Amount detected: {amount}")
         
         # Check for transaction keywords
-        matched_keywords = [
-            k for k in GmailTransactionClassifier.TRANSACTION_KEYWORDS
-            if k in combined_text
-        ]
+        matched_keywords = scanned['transaction']
         
         if not matched_keywords:
             print(f"📨 Email ignored (no payment keywords)")
@@ -315,7 +340,7 @@ class GmailTransactionClassifier:
         print(f"🔍 Keywords matched: {', '.join(matched_keywords[:3])}")
         
         # Determine type
-        if any(k in combined_text for k in GmailTransactionClassifier.INCOME_KEYWORDS):
+        if scanned['income']:
             tx_type = "income"
         else:
             tx_type = "expense"
@@ -361,59 +386,37 @@ def fetch_and_classify(userId: str) -> List[Dict]:
             "OR transaction OR transfer OR deposit OR withdrawal)"
         )
         print(f"🔍 Gmail search query: {query}")
-        results = service.users().messages().list(
-            userId='me',
-            q=query,
-            maxResults=50
-        ).execute()
         
-        messages = results.get('messages', [])
-        print(f"📧 Found {len(messages)} potential transaction emails")
+        # Incremental: skip messages seen by an earlier sync before any body download
+        sync_state = GmailSyncState(userId, "classifier")
+        message_ids = list_new_message_ids(service, sync_state, query, max_results=50)
+        print(f"📧 Found {len(message_ids)} new potential transaction emails")
+        
+        # Phase 1 batches headers + snippets; phase 2 downloads bodies only for
+        # messages whose subject/snippet already look like a transaction
+        fetched = fetch_two_phase(service, message_ids, GmailTransactionClassifier.prefilter)
+        stats = fetched['stats']
+        print(f"📦 Fetched {stats['metadataFetched']} headers, {stats['bodiesFetched']} bodies "
+              f"in {stats['roundTrips']} requests")
         
         transactions = []
+        handled_ids = list(fetched['rejected'])
+        failures = len(fetched['errors'])
+        for message_id, error in fetched['errors'].items():
+            print(f"⚠️ Error fetching message {message_id}: {error}")
         
-        for msg in messages:
+        for message in fetched['messages']:
             try:
-                message = service.users().messages().get(
-                    userId='me',
-                    id=msg['id'],
-                    format='full'
-                ).execute()
-                
-                # Extract subject, from, and body
-                headers = message['payload'].get('headers', [])
-                subject = next(
-                    (h['value'] for h in headers if h['name'] == 'Subject'),
-                    ''
-                )
-                from_addr = next(
-                    (h['value'] for h in headers if h['name'] == 'From'),
-                    ''
-                )
-                
-                # Extract body
-                body = ''
-                if 'parts' in message['payload']:
-                    for part in message['payload']['parts']:
-                        if part['mimeType'] == 'text/plain':
-                            data = part['body'].get('data', '')
-                            if data:
-                                import base64
-                                body = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-                else:
-                    data = message['payload']['body'].get('data', '')
-                    if data:
-                        import base64
-                        body = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
+                subject = message['subject']
                 
                 # Classify with from address
                 classification = GmailTransactionClassifier.classify_transaction(
-                    subject, body, from_addr
+                    subject, message['body'] or message['snippet'], message['from']
                 )
                 
                 if classification:
                     # Ensure all fields are valid
-                    gmail_id = msg.get('id', '')
+                    gmail_id = message['id']
                     amount = classification.get('amount')
                     text = classification.get('text', '').strip()
                     tx_type = classification.get('type', '')
@@ -436,11 +439,19 @@ def fetch_and_classify(userId: str) -> List[Dict]:
                         print("---")
                     else:
                         print(f"⚠️ Skipping invalid transaction: id={gmail_id}, amount={amount}, text={text[:30] if text else 'None'}, type={tx_type}")
+                
+                handled_ids.append(message['id'])
             
             except Exception as e:
-                print(f"⚠️ Error processing message {msg.get('id', 'unknown')}: {e}")
+                failures += 1
+                print(f"⚠️ Error processing message {message.get('id', 'unknown')}: {e}")
                 continue
         
+        sync_state.mark_processed(handled_ids)
+        if failures == 0:
+            sync_state.advance()
+        sync_state.save()
+        
         print(f"✅ Classified {len(transactions)} transactions for user: {userId}")
         return transactions
     
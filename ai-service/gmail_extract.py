@@ -0,0 +1,189 @@
+"""
+Rule-first email transaction extraction
+
+Tier 1 (template): per-bank regexes for the alert senders in the Gmail query
+                   (HDFC, ICICI, Paytm, PhonePe, GPay).
+Tier 2 (rule):     GmailTransactionClassifier amount + keyword rules, accepted
+                   only when the amount is currency-marked and the direction
+                   (debit vs credit) is unambiguous.
+Tier 3 (llm):      everything else, handled by the caller.
+
+Every deterministic result carries a "tier" key so the LLM-bypass rate can be
+measured.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from connect_mail import GmailTransactionClassifier
+
+TIER_TEMPLATE = "template"
+TIER_RULE = "rule"
+TIER_LLM = "llm"
+TIERS = (TIER_TEMPLATE, TIER_RULE, TIER_LLM)
+
+_AMOUNT = r"(?:rs\.?|inr|₹)\s*(?P<amount>[\d,]+(?:\.\d{1,2})?)"
+_DATE = r"(?P<date>\d{1,2}[-/ ](?:\d{1,2}|[a-z]{3})[-/ ]\d{2,4}|[a-z]{3} \d{1,2}, \d{4})"
+_MERCHANT = r"(?P<merchant>(?:[a-z0-9&@_' -]|\.(?=\w)){2,60}?)"
+_END = r"(?=\s+on\b|\s+ref\b|\s+via\b|[.,;]|\s*$)"
+
+DATE_FORMATS = ("%d-%m-%y", "%d-%m-%Y", "%d/%m/%y", "%d/%m/%Y", "%d-%b-%y", "%d-%b-%Y", "%d %b %Y", "%b %d, %Y")
+
+DEBIT_WORDS = {"debited", "paid", "sent", "spent", "withdrawn", "purchase", "used for"}
+CREDIT_WORDS = {"credited", "received", "refund", "refunded", "reversal", "deposited", "paid you"}
+# Money that did not (or not yet) move: failed / reversed payments, OTPs,
+# reminders and collect requests. The rule tier leaves these to the LLM.
+NON_EVENT = re.compile(
+    r"\b(?:fail(?:ed|ure)?|declined|unsuccessful|revers(?:ed|al)|refund (?:is )?(?:pending|initiated)|otp|"
+    r"one time password|will be|due|requested|request(?:ing)? (?:money|payment)|no amount|"
+    r"not (?:been )?(?:debited|credited))\b",
+    re.IGNORECASE,
+)
+
+
+def _compile(*patterns: str) -> List[Pattern]:
+    return [re.compile(p, re.IGNORECASE) for p in patterns]
+
+
+# (name, senders, patterns). A sender is a domain (any address on it or its
+# subdomains) or a full address. Each pattern captures amount and usually
+# direction / merchant / date; direction defaults to the pattern's wording.
+BANK_TEMPLATES: List[Tuple[str, Tuple[str, ...], List[Pattern]]] = [
+    ("hdfc", ("hdfcbank.net", "hdfcbank.com"), _compile(
+        _AMOUNT + r" (?:has been|is successfully|is) (?P<direction>debited|credited) (?:from|to) (?:your )?"
+                  r"(?:account|a/c)\s*\S*\s+(?:to|by) (?:vpa \S+ )?" + _MERCHANT + r" on " + _DATE,
+        _AMOUNT + r" (?:has been )?(?P<direction>debited|credited) (?:from|to) (?:your )?(?:account|a/c)",
+        r"(?P<direction>spent|debited) " + _AMOUNT + r" (?:on|from) (?:your )?hdfc bank (?:credit|debit) card"
+                  r"\s*\S*\s+at " + _MERCHANT + r" on " + _DATE,
+    )),
+    ("icici", ("icicibank.com",), _compile(
+        r"account \S+ (?:has been|is) (?P<direction>debited|credited) (?:with|for) " + _AMOUNT
+                  + r" on " + _DATE + r"(?:[.;,]? ?(?:info:? )?(?:upi/\d+/)?" + _MERCHANT + _END + r")?",
+        r"credit card \S+ has been (?P<direction>used for) a transaction of " + _AMOUNT
+                  + r" on " + _DATE + r" at " + _MERCHANT + _END,
+    )),
+    ("paytm", ("paytm.com",), _compile(
+        r"(?:you )?(?P<direction>paid|sent) " + _AMOUNT + r" to " + _MERCHANT + _END,
+        r"(?P<direction>received) " + _AMOUNT + r" from " + _MERCHANT + _END,
+    )),
+    ("phonepe", ("phonepe.com",), _compile(
+        r"(?P<direction>paid|sent) " + _AMOUNT + r" to " + _MERCHANT + _END,
+        r"(?P<direction>received) " + _AMOUNT + r" from " + _MERCHANT + _END,
+    )),
+    # google.com also sends Play / Workspace receipts: only the Google Pay alert addresses
+    ("gpay", ("gpay.com", "googlepay-noreply@google.com", "noreply-googlepay@google.com"), _compile(
+        r"you (?P<direction>paid|sent) " + _MERCHANT + r" " + _AMOUNT,
+        r"you (?P<direction>paid|sent) " + _AMOUNT + r" to " + _MERCHANT + _END,
+        _MERCHANT + r" (?P<direction>paid you) " + _AMOUNT,
+    )),
+]
+
+
+def _parse_amount(raw: str) -> Optional[float]:
+    try:
+        amount = float(raw.replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+    return amount if amount > 0 else None
+
+
+def _parse_date(raw: Optional[str]) -> Optional[str]:
+    """Normalise an alert date to YYYY-MM-DD (None if unrecognised)"""
+    if not raw:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(raw.strip().title(), fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def _direction_type(direction: str) -> str:
+    return "income" if direction.lower() in CREDIT_WORDS else "expense"
+
+
+def _sender_address(sender: str) -> str:
+    match = re.search(r"[\w.+-]+@[\w.-]+", sender or "")
+    return match.group(0).lower() if match else ""
+
+
+def _sender_matches(address: str, senders: Tuple[str, ...]) -> bool:
+    domain = address.partition("@")[2]
+    return any(
+        address == s if "@" in s else (domain == s or domain.endswith("." + s))
+        for s in senders
+    )
+
+
+def match_template(sender: str, subject: str, snippet: str) -> Optional[Dict[str, Any]]:
+    """Tier 1: parse a known bank/UPI alert format for the sender's domain"""
+    address = _sender_address(sender)
+    if not address:
+        return None
+    text = f"{subject}. {snippet}"
+    for name, senders, patterns in BANK_TEMPLATES:
+        if not _sender_matches(address, senders):
+            continue
+        for pattern in patterns:
+            match = pattern.search(text)
+            if not match:
+                continue
+            groups = match.groupdict()
+            amount = _parse_amount(groups.get("amount"))
+            if amount is None:
+                continue
+            merchant = (groups.get("merchant") or "").strip(" .-") or None
+            return {
+                "type": _direction_type(groups.get("direction") or "debited"),
+                "amount": amount,
+                "category": "Other",
+                "note": merchant or subject.strip()[:100],
+                "merchant": merchant,
+                "date": _parse_date(groups.get("date")),
+                "tier": TIER_TEMPLATE,
+                "template": name,
+            }
+    return None
+
+
+def match_rules(subject: str, snippet: str) -> Optional[Dict[str, Any]]:
+    """
+    Tier 2: generic amount + keyword rules.
+    Only accepted when the amount is currency-marked, exactly one direction
+    (debit or credit) is signalled and nothing says the money did not move
+    (NON_EVENT); anything vaguer goes to the LLM.
+    """
+    text = f"{subject} {snippet}".lower()
+    if NON_EVENT.search(text):
+        return None
+    currency = re.search(_AMOUNT, text, re.IGNORECASE)
+    amount = _parse_amount(currency.group("amount")) if currency else None
+    if amount is None:
+        return None
+    if not GmailTransactionClassifier.scan(text)['transaction']:
+        return None
+
+    is_debit = any(w in text for w in DEBIT_WORDS)
+    is_credit = any(w in text for w in CREDIT_WORDS)
+    if is_debit == is_credit:
+        return None
+
+    note = subject.strip()[:100]
+    if not note:
+        return None
+    return {
+        "type": "income" if is_credit else "expense",
+        "amount": amount,
+        "category": "Other",
+        "note": note,
+        "merchant": None,
+        "date": None,
+        "tier": TIER_RULE,
+    }
+
+
+def extract_deterministic(sender: str, subject: str, snippet: str) -> Optional[Dict[str, Any]]:
+    """Template first, then rules; None means the email needs the LLM"""
+    return match_template(sender, subject, snippet) or match_rules(subject, snippet)
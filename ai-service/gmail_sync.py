@@ -0,0 +1,145 @@
+"""
+Incremental Gmail sync state
+Per-user checkpoints (last historyId + recently processed message ids) stored on disk,
+so cron ticks only look at messages that arrived since the previous sync.
+"""
+
+import os
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from googleapiclient.errors import HttpError
+
+from config import GMAIL_SYNC_DIR, GMAIL_PROCESSED_IDS_LIMIT
+
+
+class GmailSyncState:
+    """Checkpoint for one user and one sync scope (e.g. 'llm' or 'classifier')"""
+
+    def __init__(self, user_id: str, scope: str):
+        self.user_id = user_id
+        self.scope = scope
+        self.path = Path(GMAIL_SYNC_DIR) / f"state_{scope}_{user_id}.json"
+        self.history_id: Optional[str] = None
+        self.pending_history_id: Optional[str] = None
+        self.processed_ids: List[str] = []
+        self._processed_set = set()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+            self.history_id = data.get("historyId")
+            self.processed_ids = list(data.get("processedIds", []))
+            self._processed_set = set(self.processed_ids)
+        except Exception as e:
+            print(f"⚠️ [gmail_sync] Corrupt sync state for {self.user_id}, starting fresh: {e}")
+
+    def is_processed(self, message_id: str) -> bool:
+        return message_id in self._processed_set
+
+    def mark_processed(self, message_ids: Iterable[str]) -> None:
+        for message_id in message_ids:
+            if message_id and message_id not in self._processed_set:
+                self._processed_set.add(message_id)
+                self.processed_ids.append(message_id)
+        # Keep the most recent ids only; older ones fall outside the query window anyway
+        overflow = len(self.processed_ids) - GMAIL_PROCESSED_IDS_LIMIT
+        if overflow > 0:
+            for message_id in self.processed_ids[:overflow]:
+                self._processed_set.discard(message_id)
+            self.processed_ids = self.processed_ids[overflow:]
+
+    def advance(self) -> None:
+        """Move the checkpoint to the historyId seen by the last listing.
+        Only call this when every candidate was handled, so failures are retried."""
+        if self.pending_history_id:
+            self.history_id = self.pending_history_id
+
+    def save(self) -> None:
+        """Atomically persist the checkpoint"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({
+            "userId": self.user_id,
+            "scope": self.scope,
+            "historyId": self.history_id,
+            "processedIds": self.processed_ids,
+            "updatedAt": datetime.utcnow().isoformat() + "Z",
+        }))
+        os.replace(tmp_path, self.path)
+
+
+def _history_added_ids(service, start_history_id: str, http=None) -> Optional[Dict[str, Any]]:
+    """
+    Message ids added since start_history_id, plus the latest historyId.
+    Returns None when the checkpoint is too old (Gmail answers 404) or invalid.
+    """
+    added: List[str] = []
+    latest_history_id = start_history_id
+    page_token = None
+    try:
+        while True:
+            response = service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                pageToken=page_token,
+            ).execute(http=http)
+            for record in response.get('history', []):
+                for added_message in record.get('messagesAdded', []):
+                    added.append(added_message['message']['id'])
+            latest_history_id = response.get('historyId', latest_history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+    except HttpError as e:
+        if getattr(e, 'resp', None) is not None and e.resp.status in (400, 404):
+            print(f"⚠️ [gmail_sync] historyId {start_history_id} expired, falling back to full scan")
+            return None
+        raise
+    return {"ids": added, "historyId": latest_history_id}
+
+
+def list_new_message_ids(service, state: GmailSyncState, query: str, max_results: int = 50, http=None) -> List[str]:
+    """
+    Candidate message ids for this sync, already-processed ids removed.
+
+    With a checkpoint, Gmail's history API tells us which messages arrived since
+    the last sync; if none did, the search is skipped entirely. Otherwise the
+    search query is intersected with the new arrivals. Without a (valid)
+    checkpoint the plain search result is used. The new historyId is staged on
+    `state.pending_history_id`; callers advance() and save() after processing.
+    """
+    new_history_id = None
+    arrived = None
+
+    if state.history_id:
+        history = _history_added_ids(service, state.history_id, http=http)
+        if history is not None:
+            new_history_id = history["historyId"]
+            arrived = set(history["ids"])
+            if not arrived:
+                state.pending_history_id = new_history_id
+                return []
+
+    if new_history_id is None:
+        profile = service.users().getProfile(userId='me').execute(http=http)
+        new_history_id = profile.get('historyId')
+
+    results = service.users().messages().list(
+        userId='me',
+        q=query,
+        maxResults=max_results
+    ).execute(http=http)
+    message_ids = [m['id'] for m in results.get('messages', [])]
+
+    if arrived is not None:
+        message_ids = [m for m in message_ids if m in arrived]
+
+    state.pending_history_id = new_history_id
+    return [m for m in message_ids if not state.is_processed(m)]
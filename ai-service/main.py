@@ -15,11 +15,12 @@ Modules:
 # =========================
 
 from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Any, Dict, List
 import os
 import json
+import asyncio
 import httpx
 import requests
 from datetime import datetime as dt_datetime
@@ -58,39 +59,48 @@ else:
 # =========================
 
 from config import (
-    GROQ_API_KEY, GROQ_MODEL, NODE_BACKEND_URL, AI_SECRET,
+    GROQ_API_KEY, GROQ_MODEL, NODE_BACKEND_URL, AI_SECRET, MARKET_BATCH_MAX_SYMBOLS, CLASSIFY_BATCH_MAX_ITEMS,
     SMTP_HOST, SMTP_PORT, MENTOR_EMAIL, MENTOR_EMAIL_PASSWORD,
     GIG_CATEGORIES, LIVE_DATA_TRIGGER_KEYWORDS, MARKET_INVESTMENT_KEYWORDS
 )
 
 from schemas import (
-    MemoryRequest, QueryRequest, Input, InsightRequest,
+    MemoryRequest, QueryRequest, Input, BatchInput, ClassificationFeedback, InsightRequest,
     ChatMessage, ChatRequest, AgentPlan, ExecuteRequest,
-    MarketDataRequest, DailyMentorRequest
+    MarketDataRequest, MarketBatchRequest, DailyMentorRequest
 )
 
 from tools import (
     tavily_search, get_stock_market_data, get_sip_ideas, get_insurance_ideas,
     market_overview, sip_forecast, crash_risk_detector, investment_signal_engine,
     store_memory_entry, query_user_memories, merge_and_clean_memories,
-    build_behavior_context, get_latest_alert_context
+    build_behavior_context, get_latest_alert_context, close_memory_writer,
+    aquery_user_memories
 )
-from tools.memory import get_collection, get_model
+from tools.memory import get_collection, get_model, get_memory_writer, query_embedding_cache
+from tools.market import market_overview_cache
 
 from prompts import build_chat_system_prompt, build_gig_worker_context
 from utils import get_latest_financial_data, detect_gig_worker, analyze_transactions
 
 # External imports
-from services.market_data import get_market_data
-from node_client import (
+from services.market_data import (
+    get_market_data, get_market_data_batch, quote_cache, history_cache, info_cache
+)
+from async_node_client import (
     add_transaction_tool, update_transaction_tool, delete_transaction_tool,
     get_transactions_tool, get_user_stats_tool, create_goal_tool,
-    fetch_recent_transactions
+    fetch_recent_transactions, aclose_node_client
 )
-from transaction_service import create_transaction
+from transaction_service import create_transaction, create_transactions_batch
+from classifier import record_feedback
+from services.classification_cache import get_classification_cache
+from services.insight_cache import get_insight_cache
+from services.knn_categorizer import get_knn_stats
+from services.llm_gateway import get_llm_gateway
+from services.llm_telemetry import get_llm_telemetry, set_llm_route
 from connect_mail import authenticate_user_gmail, fetch_and_classify, debug_fetch
-from parser import parse_pdf
-from groq import AsyncGroq
+from parser import close_parse_pool
 
 # =========================
 # APP INIT
@@ -111,7 +121,7 @@ app.add_middleware(
 )
 
 # Initialize Groq client
-client = AsyncGroq(api_key=GROQ_API_KEY)
+client = get_llm_gateway()
 
 # Get ChromaDB collection and model
 collection = get_collection()
@@ -127,6 +137,13 @@ async def startup_event():
     print("📬 Gmail reader loaded")
     print("🚀 AI-Service running at http://localhost:8001")
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await aclose_node_client()
+    close_memory_writer()
+    close_parse_pool()
+
 # =========================
 # HEALTH CHECK
 # =========================
@@ -135,6 +152,26 @@ async def startup_event():
 def health():
     return {"status": "✅ Fintastic AI Service Running", "version": "2.0.0"}
 
+# =========================
+# METRICS
+# =========================
+
+@app.get("/metrics")
+def metrics():
+    """In-process cache and pipeline counters"""
+    return {
+        "queryEmbeddingCache": query_embedding_cache.stats(),
+        "marketOverviewCache": market_overview_cache.stats(),
+        "marketQuoteCache": quote_cache.stats(),
+        "marketHistoryCache": history_cache.stats(),
+        "marketInfoCache": info_cache.stats(),
+        "classificationCache": get_classification_cache().stats(),
+        "insightCache": get_insight_cache().stats(),
+        "knnCategorizer": get_knn_stats(),
+        "llmGateway": get_llm_gateway().stats(),
+        "llmTelemetry": get_llm_telemetry().stats(),
+    }
+
 # =========================
 # MEMORY ROUTES
 # =========================
@@ -147,27 +184,26 @@ async def store_memory(data: MemoryRequest):
     if not data.content or len(data.content.strip()) < 10:
         return {"status": "skipped", "reason": "Content too small"}
     
-    vector = model.encode(data.content).tolist()
-    
-    collection.upsert(
-        ids=[data.id],
-        embeddings=[vector],
-        metadatas=[{
+    # Embedding + upsert run on the batched writer thread, off the event loop
+    flushed = get_memory_writer().submit(
+        data.id,
+        data.content,
+        {
             "userId": data.userId,
             "type": data.type,
             "content": data.content,
             **(data.metadata or {})
-        }],
-        documents=[data.content]
+        }
     )
+    await asyncio.wrap_future(flushed)
     
-    return {"status": "stored", "id": data.id, "vector_dim": len(vector)}
+    return {"status": "stored", "id": data.id, "vector_dim": model.get_sentence_embedding_dimension()}
 
 
 @app.post("/search-memory")
-def search_memory(data: QueryRequest):
+async def search_memory(data: QueryRequest):
     """Search memories by query"""
-    matches = query_user_memories(
+    matches = await aquery_user_memories(
         user_id=data.userId,
         query=data.query,
         top_k=data.topK or 5,
@@ -232,10 +268,31 @@ def clear_user_memories(user_id: str):
 @app.post("/classify")
 async def classify(data: Input):
     """Classify a transaction"""
+    set_llm_route("/classify")
     print("📊 Transaction received:", data)
-    result = await create_transaction(data.amount, data.description)
+    result = await create_transaction(data.amount, data.description, data.userId)
     return {"success": True, "data": result}
 
+
+@app.post("/classify/batch")
+async def classify_batch_endpoint(data: BatchInput):
+    """Classify many transactions with batched LLM calls (results in request order)"""
+    set_llm_route("/classify/batch")
+    if len(data.items) > CLASSIFY_BATCH_MAX_ITEMS:
+        return {"success": False, "error": f"At most {CLASSIFY_BATCH_MAX_ITEMS} items per batch"}
+    transactions, stats = await create_transactions_batch(data.items, data.userId)
+    return {"success": True, "count": len(transactions), "data": transactions, "stats": stats}
+
+
+@app.post("/classify/feedback")
+async def classify_feedback(data: ClassificationFeedback):
+    """Record a user-confirmed classification as the user's label and in their kNN index"""
+    classification = {"type": data.type, "subtype": data.subtype, "category": data.category}
+    recorded = await record_feedback(data.description, classification, data.userId)
+    if not recorded["labelled"]:
+        return {"success": False, "error": "Nothing learned (no merchant text in the description)"}
+    return {"success": True, **recorded}
+
 # =========================
 # MARKET DATA ROUTE
 # =========================
@@ -244,7 +301,8 @@ async def classify(data: Input):
 async def get_market_data_endpoint(data: MarketDataRequest):
     """Get market data for a stock symbol"""
     try:
-        result = get_market_data(data.symbol)
+        # yfinance is blocking: run it in the default thread pool
+        result = await asyncio.get_running_loop().run_in_executor(None, get_market_data, data.symbol)
         return result
     except Exception as e:
         print(f"❌ Error in market data endpoint: {str(e)}")
@@ -258,6 +316,19 @@ async def get_market_data_endpoint(data: MarketDataRequest):
             "error": str(e)
         }
 
+
+@app.post("/market-data/batch")
+async def get_market_data_batch_endpoint(data: MarketBatchRequest):
+    """Get market data for many symbols with one vectorized history download"""
+    if len(data.symbols) > MARKET_BATCH_MAX_SYMBOLS:
+        return {"success": False, "error": f"At most {MARKET_BATCH_MAX_SYMBOLS} symbols per batch"}
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(None, get_market_data_batch, data.symbols)
+        return {"success": True, **result}
+    except Exception as e:
+        print(f"❌ Error in batch market data endpoint: {str(e)}")
+        return {"success": False, "error": str(e)}
+
 # =========================
 # AI INSIGHTS ROUTE
 # =========================
@@ -265,9 +336,17 @@ async def get_market_data_endpoint(data: MarketDataRequest):
 @app.post("/ai/insights")
 async def generate_ai_insights(data: InsightRequest):
     """Generate AI financial insights"""
+    set_llm_route("/ai/insights")
     from routes.insights import handle_insights_request
     return await handle_insights_request(data, client, GROQ_MODEL)
 
+
+@app.delete("/ai/insights/cache/{user_id}")
+def invalidate_insight_cache(user_id: str):
+    """Drop a user's cached insights (call after their transactions / goals change)"""
+    removed = get_insight_cache().invalidate_user(user_id)
+    return {"success": True, "userId": user_id, "deleted": removed}
+
 # =========================
 # AI CHAT ROUTE
 # =========================
@@ -275,9 +354,22 @@ async def generate_ai_insights(data: InsightRequest):
 @app.post("/ai/chat")
 async def ai_chat(data: ChatRequest):
     """Main AI chat endpoint"""
+    set_llm_route("/ai/chat")
     from routes.chat import handle_chat_request
     return await handle_chat_request(data, client, GROQ_MODEL)
 
+
+@app.post("/ai/chat/stream")
+async def ai_chat_stream(data: ChatRequest):
+    """Chat endpoint streaming the reply as server-sent events"""
+    set_llm_route("/ai/chat/stream")
+    from routes.chat import handle_chat_stream
+    return StreamingResponse(
+        handle_chat_stream(data, client, GROQ_MODEL),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # =========================
 # AI EXECUTE ROUTE
 # =========================
@@ -285,6 +377,7 @@ async def ai_chat(data: ChatRequest):
 @app.post("/ai/execute")
 async def ai_execute(data: ExecuteRequest):
     """Execute a planned action"""
+    set_llm_route("/ai/execute")
     from routes.execute import handle_execute_request
     return await handle_execute_request(data, client, GROQ_MODEL)
 
@@ -295,6 +388,7 @@ async def ai_execute(data: ExecuteRequest):
 @app.post("/ai/update-report")
 async def update_financial_report(data: MarketDataRequest):
     """Generate financial report"""
+    set_llm_route("/ai/update-report")
     from routes.report import handle_report_request
     return await handle_report_request(data, client, GROQ_MODEL)
 
@@ -302,6 +396,7 @@ async def update_financial_report(data: MarketDataRequest):
 @app.post("/ai/daily-monitor")
 async def daily_monitor(data: dict):
     """Daily financial monitoring"""
+    set_llm_route("/ai/daily-monitor")
     from routes.monitor import handle_daily_monitor
     return await handle_daily_monitor(data, client, GROQ_MODEL)
 
@@ -312,6 +407,7 @@ async def daily_monitor(data: dict):
 @app.post("/ai/daily-mentor")
 async def daily_mentor(data: DailyMentorRequest):
     """Generate daily mentor report"""
+    set_llm_route("/ai/daily-mentor")
     from routes.mentor import handle_daily_mentor
     return await handle_daily_mentor(data, client, GROQ_MODEL)
 
@@ -322,6 +418,7 @@ async def daily_mentor(data: DailyMentorRequest):
 @app.post("/ai/send-email")
 async def send_financial_coach_email(data: dict):
     """Send financial coach email"""
+    set_llm_route("/ai/send-email")
     from routes.email import handle_send_email
     return await handle_send_email(data, client, GROQ_MODEL)
 
@@ -357,6 +454,7 @@ async def gmail_callback(code: str = None, state: str = None, error: str = None)
 @app.post("/gmail/fetch/{userId}")
 async def gmail_fetch(userId: str):
     """Fetch and classify transactions from Gmail"""
+    set_llm_route("/gmail/fetch")
     from routes.gmail import fetch_gmail_transactions
     return await fetch_gmail_transactions(userId, client, GROQ_MODEL)
 
@@ -368,6 +466,13 @@ async def gmail_status(userId: str):
     return check_gmail_connection(userId)
 
 
+@app.get("/gmail/cron/last-run")
+async def gmail_cron_last_run():
+    """Summary of the most recent Gmail cron run"""
+    from routes.gmail import get_last_cron_summary
+    return get_last_cron_summary()
+
+
 @app.get("/gmail/debug/{userId}")
 async def gmail_debug(userId: str):
     """Debug: Print last 5 emails for a user"""
@@ -381,6 +486,7 @@ async def gmail_debug(userId: str):
 @app.post("/parse")
 async def parse_bank_pdf(userId: str = Form(...), file: UploadFile = File(...)):
     """Parse bank PDF statement"""
+    set_llm_route("/parse")
     from routes.pdf import handle_pdf_parse
     file_content = await file.read()
     return await handle_pdf_parse(file_content, file.filename, userId, client, GROQ_MODEL)
@@ -396,6 +502,15 @@ async def get_supported_banks():
 # BACKGROUND JOBS
 # =========================
 
+async def _run_with_node_pool(coro, route: str):
+    """Run a cron coroutine (LLM calls labeled `route`) and close the Node client pool bound to its loop"""
+    set_llm_route(route)
+    try:
+        return await coro
+    finally:
+        await aclose_node_client()
+
+
 def run_gmail_cron():
     """Cron job to fetch Gmail transactions for all users"""
     import asyncio
@@ -409,7 +524,7 @@ def run_gmail_cron():
         user_ids.append(user_id)
     
     if user_ids:
-        asyncio.run(run_gmail_cron_job(user_ids, client, GROQ_MODEL))
+        asyncio.run(_run_with_node_pool(run_gmail_cron_job(user_ids, client, GROQ_MODEL), "gmail_cron"))
 
 
 def run_daily_mentor_for_all_users():
@@ -424,7 +539,7 @@ def run_daily_mentor_for_all_users():
         if response.ok:
             user_ids = response.json().get("userIds", [])
             if user_ids:
-                asyncio.run(run_daily_mentor_cron(user_ids, client, GROQ_MODEL))
+                asyncio.run(_run_with_node_pool(run_daily_mentor_cron(user_ids, client, GROQ_MODEL), "daily_mentor_cron"))
     except Exception as e:
         print(f"⚠️ Daily mentor cron error: {e}")
 
@@ -1,8 +1,15 @@
 import pdfplumber
 import re
 import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from io import BytesIO
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import PDF_PARSE_WORKERS, PDF_PARSE_MIN_PAGES_PER_WORKER
 
 def clean_amount(value):
     if not value:
@@ -81,129 +88,292 @@ def extract_date(text):
     
     return None
 
-def parse_pdf(pdf_bytes):
-    rows = []
-    print("📄 Parsing PDF with pdfplumber...")
+# A page with no dated lines but this many lines carrying amounts is a layout we don't recognize
+_MIN_UNRECOGNIZED_MONEY_LINES = 3
+_MONEY = re.compile(r"\d[\d,]*\.\d{2}\b")
+
+
+def _parse_table(table, stats: Optional[Dict] = None) -> Iterator[Dict]:
+    stats = {} if stats is None else stats
+    # Clean header row to find column indices
+    header = [str(h).lower().strip() if h else "" for h in table[0]]
+
+    # Find column indices dynamically
+    date_idx = -1
+    narration_idx = -1
+    debit_idx = -1
+    credit_idx = -1
+
+    for idx, col in enumerate(header):
+        if 'date' in col:
+            date_idx = idx
+        elif 'narration' in col or 'description' in col or 'particulars' in col:
+            narration_idx = idx
+        elif 'debit' in col:
+            debit_idx = idx
+        elif 'credit' in col:
+            credit_idx = idx
+
+    stats["defaulted"] = date_idx == -1 or debit_idx == -1 or credit_idx == -1
+
+    # If indices not found, use default positions (SBI format)
+    if date_idx == -1:
+        date_idx = 0
+    if narration_idx == -1:
+        narration_idx = 1
+    if debit_idx == -1:
+        debit_idx = 2
+    if credit_idx == -1:
+        credit_idx = 3
+
+    # Parse data rows
+    for row in table[1:]:
+        if not row or len(row) < 2:
+            continue
+
+        # Extract date from first column or search in row
+        date_cell = str(row[date_idx]) if date_idx < len(row) and row[date_idx] else ""
+        date = extract_date(date_cell) if date_cell else extract_date(" ".join(str(x) for x in row if x))
+
+        if not date:
+            continue
+        stats["candidates"] = stats.get("candidates", 0) + 1
+
+        # Extract narration
+        narration = str(row[narration_idx]).strip() if narration_idx < len(row) and row[narration_idx] else ""
+        if not narration or len(narration) < 3:
+            # Try to extract from full row text
+            narration = " ".join(str(x) for x in row[narration_idx:debit_idx] if x and str(x).strip())
+
+        # Extract debit and credit amounts
+        debit = clean_amount(row[debit_idx]) if debit_idx < len(row) and row[debit_idx] else None
+        credit = clean_amount(row[credit_idx]) if credit_idx < len(row) and row[credit_idx] else None
+
+        amount = debit if debit else credit
+        if not amount or amount <= 0:
+            continue
+
+        transaction_type = "expense" if debit else "income"
+        stats["clean"] = stats.get("clean", 0) + 1
 
+        yield {
+            "hash": hash_row(date, narration, amount),
+            "date": date,
+            "amount": amount,
+            "text": narration.strip()[:200] if narration else "",
+            "type": transaction_type
+        }
+
+
+def _parse_text(raw_text: str, stats: Optional[Dict] = None) -> Iterator[Dict]:
+    """Fallback line-by-line extraction for pages without a table"""
+    stats = {} if stats is None else stats
+    for line in raw_text.split("\n"):
+        date = extract_date(line)
+        if not date:
+            continue
+        stats["candidates"] = stats.get("candidates", 0) + 1
+
+        # Amount extraction
+        amount_match = re.findall(r"[₹Rs\. ]?([\d,]+\.\d{1,2}|[\d,]+)", line)
+        amount = None
+        if amount_match:
+            amount = clean_amount(amount_match[-1])
+
+        if not amount:
+            continue
+
+        text_part = re.sub(r"[₹Rs\.,0-9 ]", " ", line).strip()
+        if not text_part:
+            text_part = line.strip()
+
+        # Guess type
+        if re.search(r"(debited|withdrawal|paid|payment|transfer|atm|pos)", line, re.I):
+            transaction_type = "expense"
+        else:
+            transaction_type = "income"
+
+        # With several amounts on the line, the last one may well be the balance
+        if len(_MONEY.findall(line)) == 1:
+            stats["clean"] = stats.get("clean", 0) + 1
+
+        yield {
+            "hash": hash_row(date, text_part, amount),
+            "date": date,
+            "amount": amount,
+            "text": text_part[:200],
+            "type": transaction_type
+        }
+
+
+def analyze_page(page) -> Dict:
+    """
+    Parse one pdfplumber page (its largest table if it has one, else the text
+    fallback) and score how far the result can be trusted.
+
+    confidence is the share of dated, transaction-looking lines that became a
+    clean row: for tables, dated rows that produced a row (halved when the
+    header did not name the date / debit / credit columns and default
+    positions were assumed); for text, dated lines with exactly one amount.
+    A page without dated lines scores 1.0 (nothing to parse) unless several
+    of its lines carry amounts, i.e. a layout the parser doesn't recognize.
+
+    Returns:
+        dict: rows, confidence, method ("table" / "text"), text, tables
+    """
+    tables = []
+    table = None
+
+    # Attempt to extract tables if present (largest one drives the parse, as page.extract_table)
     try:
-        with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-            for page in pdf.pages:
-                table = None
-
-                # Attempt to extract table if present
-                try:
-                    table = page.extract_table()
-                except:
-                    pass
-
-                if table and len(table) > 1:
-                    # Clean header row to find column indices
-                    header = [str(h).lower().strip() if h else "" for h in table[0]]
-                    
-                    # Find column indices dynamically
-                    date_idx = -1
-                    narration_idx = -1
-                    debit_idx = -1
-                    credit_idx = -1
-                    
-                    for idx, col in enumerate(header):
-                        if 'date' in col:
-                            date_idx = idx
-                        elif 'narration' in col or 'description' in col or 'particulars' in col:
-                            narration_idx = idx
-                        elif 'debit' in col:
-                            debit_idx = idx
-                        elif 'credit' in col:
-                            credit_idx = idx
-                    
-                    # If indices not found, use default positions (SBI format)
-                    if date_idx == -1:
-                        date_idx = 0
-                    if narration_idx == -1:
-                        narration_idx = 1
-                    if debit_idx == -1:
-                        debit_idx = 2
-                    if credit_idx == -1:
-                        credit_idx = 3
-                    
-                    # Parse data rows
-                    for row in table[1:]:
-                        if not row or len(row) < 2:
-                            continue
-
-                        # Extract date from first column or search in row
-                        date_cell = str(row[date_idx]) if date_idx < len(row) and row[date_idx] else ""
-                        date = extract_date(date_cell) if date_cell else extract_date(" ".join(str(x) for x in row if x))
-                        
-                        if not date:
-                            continue
-
-                        # Extract narration
-                        narration = str(row[narration_idx]).strip() if narration_idx < len(row) and row[narration_idx] else ""
-                        if not narration or len(narration) < 3:
-                            # Try to extract from full row text
-                            narration = " ".join(str(x) for x in row[narration_idx:debit_idx] if x and str(x).strip())
-                        
-                        # Extract debit and credit amounts
-                        debit = clean_amount(row[debit_idx]) if debit_idx < len(row) and row[debit_idx] else None
-                        credit = clean_amount(row[credit_idx]) if credit_idx < len(row) and row[credit_idx] else None
-
-                        amount = debit if debit else credit
-                        if not amount or amount <= 0:
-                            continue
-
-                        transaction_type = "expense" if debit else "income"
-                        row_hash = hash_row(date, narration, amount)
-
-                        rows.append({
-                            "hash": row_hash,
-                            "date": date,
-                            "amount": amount,
-                            "text": narration.strip()[:200] if narration else "",
-                            "type": transaction_type
-                        })
-                        print(f"✔ Parsed: {date} | {narration[:50] if narration else 'N/A'} | ₹{amount} | {transaction_type}")
-
-                else:
-                    # Fallback text extraction if no table
-                    raw_text = page.extract_text() or ""
-                    lines = raw_text.split("\n")
-
-                    for line in lines:
-                        date = extract_date(line)
-                        if not date:
-                            continue
-
-                        # Amount extraction
-                        amount_match = re.findall(r"[₹Rs\. ]?([\d,]+\.\d{1,2}|[\d,]+)", line)
-                        amount = None
-                        if amount_match:
-                            amount = clean_amount(amount_match[-1])
-
-                        if not amount:
-                            continue
-
-                        text_part = re.sub(r"[₹Rs\.,0-9 ]", " ", line).strip()
-                        if not text_part:
-                            text_part = line.strip()
-
-                        # Guess type
-                        if re.search(r"(debited|withdrawal|paid|payment|transfer|atm|pos)", line, re.I):
-                            transaction_type = "expense"
-                        else:
-                            transaction_type = "income"
-
-                        row_hash = hash_row(date, text_part, amount)
-
-                        rows.append({
-                            "hash": row_hash,
-                            "date": date,
-                            "amount": amount,
-                            "text": text_part[:200],
-                            "type": transaction_type
-                        })
-                        print(f"✔ Parsed (fallback): {date} | {text_part[:50]} | ₹{amount} | {transaction_type}")
+        found = page.find_tables()
+        tables = [t.extract() for t in found]
+        if found:
+            largest = min(range(len(found)), key=lambda i: (-len(found[i].cells), found[i].bbox[1], found[i].bbox[0]))
+            table = tables[largest]
+    except:
+        pass
 
+    text = page.extract_text() or ""
+    stats: Dict = {}
+    if table and len(table) > 1:
+        rows, method = list(_parse_table(table, stats)), "table"
+    else:
+        rows, method = list(_parse_text(text, stats)), "text"
+
+    if stats.get("candidates"):
+        confidence = stats.get("clean", 0) / stats["candidates"]
+        if stats.get("defaulted"):
+            confidence *= 0.5
+    else:
+        money_lines = sum(1 for line in text.split("\n") if _MONEY.search(line))
+        confidence = 0.0 if money_lines >= _MIN_UNRECOGNIZED_MONEY_LINES else 1.0
+
+    return {
+        "rows": rows,
+        "confidence": round(confidence, 3),
+        "method": method,
+        "text": text,
+        "tables": tables,
+    }
+
+
+def parse_page(page) -> List[Dict]:
+    """Rows of one pdfplumber page"""
+    return analyze_page(page)["rows"]
+
+
+def iter_pages(pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yield (page index, analyze_page result) for pages [start, stop), one page
+    at a time. Each page's layout cache is released as soon as it has been
+    parsed, and a page that fails to parse is reported with confidence 0.
+    """
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        pages = pdf.pages
+        for index in range(start, len(pages) if stop is None else min(stop, len(pages))):
+            page = pages[index]
+            try:
+                result = analyze_page(page)
+            except Exception as e:
+                print(f"⚠️ Could not parse page {index + 1}: {e}")
+                result = {"rows": [], "confidence": 0.0, "method": "error", "text": "", "tables": []}
+            finally:
+                page.close()
+            yield index, result
+
+
+def _parse_page_range(pdf_bytes: bytes, start: int, stop: int) -> List[Tuple[int, Dict]]:
+    """Process-pool task: one contiguous page range"""
+    return list(iter_pages(pdf_bytes, start, stop))
+
+
+def count_pages(pdf_bytes: bytes) -> int:
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        return len(pdf.pages)
+
+
+# Shared page-range pool (created on first parallel parse). forkserver / spawn
+# workers never inherit the server's threads, locks or open sockets.
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+
+def _get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        with _parse_pool_lock:
+            if _parse_pool is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _parse_pool = ProcessPoolExecutor(
+                    max_workers=max(workers, PDF_PARSE_WORKERS),
+                    mp_context=multiprocessing.get_context(method),
+                )
+    return _parse_pool
+
+
+def _discard_parse_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next parse starts a fresh one"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def close_parse_pool() -> None:
+    """Stop the page-range worker processes (called on shutdown)"""
+    global _parse_pool
+    with _parse_pool_lock:
+        pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_parsed_pages(pdf_bytes: bytes, workers: int = PDF_PARSE_WORKERS) -> Iterator[Tuple[int, Dict]]:
+    """
+    (page index, analyze_page result) in page order.
+
+    workers <= 1 parses in this process, streaming page by page. Otherwise the
+    document is split into contiguous page ranges (at least
+    PDF_PARSE_MIN_PAGES_PER_WORKER pages each) parsed across the shared
+    process pool, and each range is yielded in page order once it (and all
+    before it) finished.
+    """
+    if workers > 1:
+        total = count_pages(pdf_bytes)
+        ranges = min(workers, total // max(1, PDF_PARSE_MIN_PAGES_PER_WORKER))
+        if ranges > 1:
+            step = -(-total // ranges)
+            bounds = [(start, min(start + step, total)) for start in range(0, total, step)]
+            pool = _get_parse_pool(workers)
+            futures = [pool.submit(_parse_page_range, pdf_bytes, start, stop) for start, stop in bounds]
+            try:
+                for future in futures:
+                    yield from future.result()
+            except BrokenProcessPool:
+                _discard_parse_pool(pool)
+                raise
+            finally:
+                for future in futures:
+                    future.cancel()
+            return
+
+    yield from iter_pages(pdf_bytes)
+
+
+def iter_parse_pdf(pdf_bytes: bytes, workers: int = PDF_PARSE_WORKERS) -> Iterator[Dict]:
+    """Parsed rows, streamed page by page in page order"""
+    for _, page in iter_parsed_pages(pdf_bytes, workers):
+        yield from page["rows"]
+
+
+def parse_pdf(pdf_bytes, workers: int = PDF_PARSE_WORKERS):
+    print("📄 Parsing PDF with pdfplumber...")
+    rows = []
+
+    try:
+        rows.extend(iter_parse_pdf(pdf_bytes, workers))
     except Exception as e:
         print(f"❌ PDF parse error: {e}")
         return []
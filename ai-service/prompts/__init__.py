@@ -3,21 +3,32 @@ Prompts package for Fintastic AI Service
 Contains all system prompts, chat prompts, and template generators
 """
 
-from .system_prompt import SYSTEM_PROMPT, classifier_prompt
+from .system_prompt import SYSTEM_PROMPT, classifier_prompt, batch_classifier_prompt
 from .insight_prompts import (
     generate_income_insight_prompt,
     generate_expense_insight_prompt,
 )
-from .chat_prompts import build_chat_system_prompt
+from .chat_prompts import build_chat_system_prompt, assemble_chat_system_prompt
+from .assembler import (
+    PromptSection, assemble_prompt, count_tokens, encode_json, encode_table, format_report,
+)
 from .report_prompts import build_report_prompt, build_daily_mentor_prompt
 from .gig_worker_prompts import build_gig_worker_context
 
 __all__ = [
     "SYSTEM_PROMPT",
     "classifier_prompt",
+    "batch_classifier_prompt",
     "generate_income_insight_prompt",
     "generate_expense_insight_prompt",
     "build_chat_system_prompt",
+    "assemble_chat_system_prompt",
+    "PromptSection",
+    "assemble_prompt",
+    "count_tokens",
+    "encode_json",
+    "encode_table",
+    "format_report",
     "build_report_prompt",
     "build_daily_mentor_prompt",
     "build_gig_worker_context",
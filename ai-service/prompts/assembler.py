@@ -0,0 +1,238 @@
+"""
+Token-budgeted prompt assembly
+Prompts are a fixed template plus data sections (stats, goals, transactions,
+memory, ...). Each section gets its own token budget, measured with a local
+tokenizer, and the whole prompt gets a total budget:
+
+1. a section longer than its budget is cut to fit, keeping whole lines from
+   the start ("head", e.g. newest transactions) or the end ("tail", e.g.
+   the latest chat turns);
+2. while the prompt is still over the total budget, whole sections are
+   dropped, lowest priority first (ties: the later-declared section goes
+   first), and marked as omitted. Required sections are never dropped.
+
+The result comes with a report: final tokens per section, template tokens,
+total, and what was truncated or dropped.
+
+Tokens are counted with tiktoken's cl100k_base encoding (PROMPT_TOKENIZER),
+which is close to the Llama 3 tokenizer. tiktoken is optional; without it, or
+when the encoding can't be loaded, a word / punctuation estimate is used.
+Data sections are encoded compactly: lists of records as one pipe-separated
+table (encode_table), objects as minified JSON (encode_json).
+"""
+
+import json
+import math
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional, estimated counts without it
+    tiktoken = None
+
+from config import PROMPT_TOKENIZER
+
+HEAD = "head"
+TAIL = "tail"
+# Stands in for a section dropped to fit the budget (so the model doesn't read it as "no data")
+OMITTED = "(omitted to fit the prompt size limit)"
+
+_PIECES = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}T")
+_OMITTED_NOTE_TOKENS = 10
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None and PROMPT_TOKENIZER:
+            try:
+                _encoding = tiktoken.get_encoding(PROMPT_TOKENIZER)
+            except Exception as e:
+                print(f"⚠️ Tokenizer '{PROMPT_TOKENIZER}' unavailable, estimating token counts: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in `text` (tokenizer when available, else ~4 characters per word piece)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _PIECES.findall(text))
+
+
+def _cell(value: Any, max_chars: int) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        value = int(value) if value.is_integer() else round(value, 2)
+    elif isinstance(value, (dict, list)):
+        value = encode_json(value)
+    text = " ".join(str(value).split()).replace("|", "/")
+    if _ISO_DATE.match(text):
+        text = text[:10]
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+def encode_table(
+    rows: Iterable[Dict[str, Any]],
+    columns: Optional[Sequence[str]] = None,
+    max_cell_chars: int = 60,
+) -> str:
+    """
+    Records as a header line plus one "a|b|c" line per record.
+    columns: the keys to keep, in order (only those present in some record);
+    default: every key, in first-seen order. ISO timestamps are cut to the date.
+    """
+    rows = [row for row in rows if isinstance(row, dict)]
+    if not rows:
+        return ""
+    if columns is None:
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+    else:
+        columns = [column for column in columns if any(row.get(column) is not None for row in rows)]
+    lines = ["|".join(columns)]
+    lines.extend("|".join(_cell(row.get(column), max_cell_chars) for column in columns) for row in rows)
+    return "\n".join(lines)
+
+
+def encode_json(value: Any) -> str:
+    """Minified JSON (no indentation or spaces)"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class PromptSection:
+    """
+    One data section of a prompt.
+    budget: max tokens for this section (None: only the total budget applies)
+    priority: higher is kept longer when the prompt is over its total budget
+    keep: HEAD / TAIL, which lines survive truncation
+    empty: text used when the section is empty (a dropped one shows OMITTED)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        text: str,
+        budget: Optional[int] = None,
+        priority: int = 0,
+        keep: str = HEAD,
+        required: bool = False,
+        empty: str = "",
+    ):
+        self.name = name
+        self.text = (text or "").strip("\n")
+        self.budget = budget
+        self.priority = priority
+        self.keep = keep
+        self.required = required
+        self.empty = empty
+
+
+def truncate_to_tokens(text: str, budget: int, keep: str = HEAD) -> str:
+    """Cut `text` to at most `budget` tokens, keeping whole lines where possible"""
+    if count_tokens(text) <= budget:
+        return text
+    lines = text.split("\n")
+    if keep == TAIL:
+        lines.reverse()
+    room = budget - _OMITTED_NOTE_TOKENS
+    kept: List[str] = []
+    for line in lines:
+        cost = count_tokens(line) + 1
+        if cost > room:
+            break
+        kept.append(line)
+        room -= cost
+
+    if not kept:
+        # The first line alone is over budget (e.g. minified JSON): cut characters
+        line = lines[0]
+        while line and count_tokens(line + "…") > budget:
+            line = line[:int(len(line) * 0.9)]
+        return line + "…" if line else ""
+
+    note = f"(+{len(lines) - len(kept)} more lines omitted)"
+    if keep == TAIL:
+        return "\n".join([note] + kept[::-1])
+    return "\n".join(kept + [note])
+
+
+def assemble_prompt(
+    render: Callable[[Dict[str, str]], str],
+    sections: Sequence[PromptSection],
+    budget: int,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Fit `sections` into `budget` tokens and render the prompt.
+
+    render: builds the prompt from {section name: section text}
+    Returns (prompt, report) where report holds totalTokens, budget,
+    templateTokens, sections {name: tokens}, truncated and dropped.
+    """
+    texts: Dict[str, str] = {}
+    costs: Dict[str, int] = {}
+    truncated: List[str] = []
+    for section in sections:
+        text = section.text
+        if section.budget is not None and text:
+            cut = truncate_to_tokens(text, section.budget, section.keep)
+            if cut != text:
+                truncated.append(section.name)
+                text = cut
+        texts[section.name] = text
+        costs[section.name] = count_tokens(text)
+
+    template_tokens = count_tokens(render({section.name: section.empty for section in sections}))
+    dropped: List[str] = []
+
+    def render_current() -> str:
+        return render({
+            section.name: texts[section.name] or (OMITTED if section.name in dropped else section.empty)
+            for section in sections
+        })
+
+    prompt = render_current()
+    total = count_tokens(prompt)
+    # Lowest priority first; among equals, the section declared last
+    candidates = sorted(
+        (item for item in enumerate(sections) if not item[1].required),
+        key=lambda item: (item[1].priority, -item[0]),
+    )
+    for _, section in candidates:
+        if total <= budget:
+            break
+        if not texts[section.name]:
+            continue
+        texts[section.name] = ""
+        costs[section.name] = 0
+        dropped.append(section.name)
+        prompt = render_current()
+        total = count_tokens(prompt)
+
+    report = {
+        "totalTokens": total,
+        "budget": budget,
+        "templateTokens": template_tokens,
+        "sections": costs,
+        "truncated": truncated,
+        "dropped": dropped,
+    }
+    return prompt, report
+
+
+def format_report(label: str, report: Dict[str, Any]) -> str:
+    """One log line for an assembled prompt"""
+    sections = ", ".join(f"{name} {tokens}" for name, tokens in report["sections"].items())
+    line = f"🧮 {label} prompt: {report['totalTokens']}/{report['budget']} tokens ({sections})"
+    if report["truncated"]:
+        line += f" truncated: {', '.join(report['truncated'])}"
+    if report["dropped"]:
+        line += f" dropped: {', '.join(report['dropped'])}"
+    return line
@@ -2,7 +2,30 @@
 Chat system prompts for AI conversation
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+
+from config import CHAT_PROMPT_TOKEN_BUDGET
+from .assembler import HEAD, TAIL, PromptSection, assemble_prompt
+
+# Per-section token budgets and drop priorities (lowest priority is dropped first)
+CHAT_SECTION_BUDGETS = {
+    "stats": 250,
+    "live_data": 700,
+    "goals": 250,
+    "market": 500,
+    "behavior": 250,
+    "history": 500,
+    "memory": 600,
+}
+CHAT_SECTION_PRIORITIES = {
+    "stats": 100,
+    "live_data": 90,
+    "goals": 80,
+    "market": 70,
+    "behavior": 60,
+    "history": 50,
+    "memory": 40,
+}
 
 
 def build_chat_system_prompt(
@@ -16,6 +39,44 @@ def build_chat_system_prompt(
 ) -> str:
     """Build the comprehensive chat system prompt"""
     
+    prompt, _ = assemble_chat_system_prompt(
+        live_data_context, market_context, stats_context, goals_context,
+        memory_context, behavior_context, history_text
+    )
+    return prompt
+
+
+def assemble_chat_system_prompt(
+    live_data_context: str = "",
+    market_context: str = "",
+    stats_context: str = "",
+    goals_context: str = "",
+    memory_context: str = "",
+    behavior_context: str = "",
+    history_text: str = "",
+    budget: int = CHAT_PROMPT_TOKEN_BUDGET
+) -> Tuple[str, Dict[str, Any]]:
+    """Chat system prompt fitted to the token budget, with its per-section token report"""
+    
+    def section(name: str, text: str, empty: str = "", keep: str = HEAD) -> PromptSection:
+        return PromptSection(
+            name, text, CHAT_SECTION_BUDGETS[name], CHAT_SECTION_PRIORITIES[name],
+            keep=keep, required=name == "stats", empty=empty
+        )
+    
+    sections = [
+        section("live_data", live_data_context),
+        section("market", market_context),
+        section("stats", stats_context, "data_insufficient"),
+        section("goals", goals_context, "No active goals right now."),
+        section("memory", memory_context, "No memory yet"),
+        section("behavior", behavior_context),
+        section("history", history_text, "No previous chat", keep=TAIL),
+    ]
+    return assemble_prompt(_render_chat_system_prompt, sections, budget)
+
+
+def _render_chat_system_prompt(s: Dict[str, str]) -> str:
     return f"""
 You are Fintastic AI – a REAL-TIME, MARKET-AWARE financial intelligence engine and personal financial guardian.
 
@@ -44,32 +105,32 @@ CRITICAL RULES:
   * Goal urgency
   * Spending discipline
 
-{live_data_context}
+{s["live_data"]}
 
-{market_context}
+{s["market"]}
 
 CURRENT FINANCIAL STATS
 --------------
-{stats_context or "data_insufficient"}
+{s["stats"]}
 
 GOALS SNAPSHOT
 --------------
-{goals_context or "No active goals right now."}
+{s["goals"]}
 
 MEMORY CONTEXT
 --------------
-{memory_context if memory_context else "No memory yet"}
+{s["memory"]}
 
-{behavior_context}
+{s["behavior"]}
 
 RECENT CHAT
 --------------
-{history_text if history_text else "No previous chat"}
+{s["history"]}
 
 CRITICAL: Always use the LIVE DATA (if present) or CURRENT FINANCIAL STATS above for accurate information. 
 If memory contains outdated stats, trust the LIVE DATA or CURRENT FINANCIAL STATS section instead.
 
-{"⚠️⚠️⚠️ MARKET DATA AVAILABLE ⚠️⚠️⚠️" + chr(10) + "The system has fetched LIVE MARKET DATA above. You MUST use this data when answering investment/market questions." + chr(10) + "- Use market trend and sentiment to inform recommendations" + chr(10) + "- Consider crash risk when advising investments" + chr(10) + "- Use investment signals to guide buy/hold/wait decisions" + chr(10) + "- Adapt SIP recommendations based on market conditions" if market_context else ""}
+{"⚠️⚠️⚠️ MARKET DATA AVAILABLE ⚠️⚠️⚠️" + chr(10) + "The system has fetched LIVE MARKET DATA above. You MUST use this data when answering investment/market questions." + chr(10) + "- Use market trend and sentiment to inform recommendations" + chr(10) + "- Consider crash risk when advising investments" + chr(10) + "- Use investment signals to guide buy/hold/wait decisions" + chr(10) + "- Adapt SIP recommendations based on market conditions" if s["market"] else ""}
 
 WHEN MENTIONING INVESTMENTS:
 - If "Total Invested Amount" shows ₹X (where X > 0), ALWAYS say "You have ₹X invested" or "Your current investments total ₹X"
@@ -20,17 +20,7 @@ NOTES:
 - Keep responses concise and helpful.
 """.strip()
 
-classifier_prompt = """
-You are a financial transaction classifier. Return ONLY valid JSON.
-
-Output schema:
-{
-  "type": "income | expense | saving | investment",
-  "subtype": "fixed | variable | one-time | debit | allocation | lumpsum",
-  "category": "string",
-  "note": "string"
-}
-
+CLASSIFIER_RULES = """
 Rules:
 - If the user is SPENDING money (e.g. bought, paid, spent, bill, rent, emi): type = "expense".
 - If the user is RECEIVING money (salary, bonus, freelance, side hustle, income): type = "income".
@@ -45,8 +35,46 @@ Subtype mapping:
 - Use "allocation" for planned, repeated allocations into savings or investments (e.g. monthly SIP, monthly savings).
 - Use "lumpsum" for one-off large allocations into saving/investment.
 
-Always:
+"""
+
+classifier_prompt = """
+You are a financial transaction classifier. Return ONLY valid JSON.
+
+Output schema:
+{
+  "type": "income | expense | saving | investment",
+  "subtype": "fixed | variable | one-time | debit | allocation | lumpsum",
+  "category": "string",
+  "note": "string"
+}
+
+""" + CLASSIFIER_RULES.lstrip("\n") + """Always:
 - Fill every field in the JSON.
 - Choose the closest valid enum value when unsure.
 - Do NOT include any extra keys.
 """
+
+batch_classifier_prompt = """
+You are a financial transaction classifier. You receive MANY transactions at once
+as JSON: {"items": [{"index": 0, "text": "..."}, ...]}. Classify each one
+independently. Return ONLY valid JSON.
+
+Output schema:
+{
+  "results": [
+    {
+      "index": 0,
+      "type": "income | expense | saving | investment",
+      "subtype": "fixed | variable | one-time | debit | allocation | lumpsum",
+      "category": "string",
+      "note": "string"
+    }
+  ]
+}
+
+""" + CLASSIFIER_RULES.lstrip("\n") + """Always:
+- Return exactly one result per input item, copying its "index".
+- Fill every field of every result.
+- Choose the closest valid enum value when unsure.
+- Do NOT include any extra keys.
+"""
@@ -2,24 +2,119 @@
 AI Chat route handler
 """
 
+import asyncio
 import json
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, Tuple
 
 from schemas import ChatRequest
 from tools import (
-    build_behavior_context, merge_and_clean_memories, store_memory_entry,
-    market_overview, sip_forecast, crash_risk_detector, investment_signal_engine
+    build_behavior_context, merge_and_clean_memories, astore_memory_entry,
+    market_overview, get_market_snapshot, sip_forecast, crash_risk_detector, investment_signal_engine
 )
 from utils import get_latest_financial_data
-from prompts import build_chat_system_prompt
-from node_client import get_user_stats_tool
-from config import GIG_CATEGORIES, LIVE_DATA_TRIGGER_KEYWORDS, MARKET_INVESTMENT_KEYWORDS
+from prompts import assemble_chat_system_prompt, encode_table, format_report
+from async_node_client import get_user_stats_tool
+from config import (
+    GIG_CATEGORIES, LIVE_DATA_TRIGGER_KEYWORDS, MARKET_INVESTMENT_KEYWORDS,
+    CHAT_CONTEXT_DEADLINE, CHAT_MARKET_DEADLINE
+)
 from datetime import datetime
+from services.llm_gateway import LANE_INTERACTIVE
+
+
+# Columns kept when goals / alerts are listed in the live data context
+GOAL_COLUMNS = ("name", "targetAmount", "currentAmount", "progress", "deadline", "priority", "status")
+ALERT_COLUMNS = ("level", "scope", "title", "reasons", "createdAt")
+
+# Streamed plans put the user-facing text first so it can be shown while the rest is generated
+STREAM_FIELD_ORDER = (
+    'Write the "response_to_user" key first in the JSON object, before "intent", "tool" and "params".'
+)
 
 
 async def handle_chat_request(data: ChatRequest, client, model: str) -> Dict[str, Any]:
     """Handle AI chat request"""
     
+    system_prompt, message = await _build_chat_prompt(data)
+    
+    try:
+        result = await client.chat.completions.create(
+            model=model,
+            lane=LANE_INTERACTIVE,
+            temperature=0.2,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": message}
+            ]
+        )
+        
+        raw = result.choices[0].message.content.strip()
+        plan_dict = json.loads(raw)
+        
+        if 'intent' not in plan_dict:
+            return {"success": False, "error": "Invalid AI response", "raw": raw}
+        
+        return {"success": True, "plan": plan_dict}
+        
+    except Exception as e:
+        print("ai_chat error:", e)
+        return {"success": False, "error": str(e)}
+
+
+async def handle_chat_stream(data: ChatRequest, client, model: str) -> AsyncIterator[str]:
+    """
+    Streaming variant of handle_chat_request, as server-sent events:
+        event: delta  {"text": ...}                  response_to_user, as it is generated
+        event: plan   {"success": true, "plan": ...}  the full plan (intent, tool, params) at the end
+        event: error  {"success": false, "error": ...}
+    """
+    try:
+        system_prompt, message = await _build_chat_prompt(data)
+        
+        # JSON mode is not available for streamed completions: the prompt already asks for JSON only
+        stream = await client.chat.completions.create(
+            model=model,
+            lane=LANE_INTERACTIVE,
+            temperature=0.2,
+            stream=True,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": STREAM_FIELD_ORDER},
+                {"role": "user", "content": message}
+            ]
+        )
+        
+        reply = _JsonStringField("response_to_user")
+        parts = []
+        async for chunk in stream:
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            if not content:
+                continue
+            parts.append(content)
+            text = reply.feed(content)
+            if text:
+                yield _sse("delta", {"text": text})
+        
+        raw = "".join(parts).strip()
+        plan_dict = _parse_plan(raw)
+        if plan_dict is None or 'intent' not in plan_dict:
+            yield _sse("error", {"success": False, "error": "Invalid AI response", "raw": raw})
+            return
+        
+        # The text may have come out in a shape the incremental parser did not follow
+        if not reply.text and plan_dict.get("response_to_user"):
+            yield _sse("delta", {"text": str(plan_dict["response_to_user"])})
+        yield _sse("plan", {"success": True, "plan": plan_dict})
+        
+    except Exception as e:
+        print("ai_chat stream error:", e)
+        yield _sse("error", {"success": False, "error": str(e)})
+
+
+async def _build_chat_prompt(data: ChatRequest) -> Tuple[str, str]:
+    """Gather the user's context and build (system prompt, user message)"""
+    
     user_id = data.userId
     message = data.message.strip()
     is_gig_worker = data.isGigWorker or False
@@ -31,25 +126,35 @@ async def handle_chat_request(data: ChatRequest, client, model: str) -> Dict[str
     
     live_data_context = ""
     market_context = ""
-    user_context_for_market = {}
     
-    # Fetch live data if needed
-    if needs_live_data:
+    # Stage 1: independent inputs fetched concurrently
+    #   live data  -> live context + market user context
+    #   stats      -> stats/goals context
+    #   snapshot   -> warms the shared market cache while Node responds
+    if needs_live_data or needs_market_data:
         print(f"🔄 Fetching live financial data for user: {user_id}")
-        live_data = await get_latest_financial_data(user_id)
-        live_data_context, user_context_for_market = _build_live_data_context(live_data, is_gig_worker)
+    live_data, fresh_stats, _ = await asyncio.gather(
+        _with_deadline(get_latest_financial_data(user_id), CHAT_CONTEXT_DEADLINE, {}, "live data")
+        if (needs_live_data or needs_market_data) else _resolved({}),
+        _with_deadline(get_user_stats_tool(user_id), CHAT_CONTEXT_DEADLINE, None, "stats"),
+        _with_deadline(get_market_snapshot(), CHAT_MARKET_DEADLINE, None, "market snapshot")
+        if needs_market_data else _resolved(None),
+    )
+    
+    live_context_text, user_context_for_market = _build_live_data_context(live_data or {}, is_gig_worker)
+    if needs_live_data:
+        live_data_context = live_context_text
     
-    # Fetch market data if needed
+    # Stage 2: market tools (depend on live data + snapshot)
     if needs_market_data:
-        if not user_context_for_market:
-            live_data = await get_latest_financial_data(user_id)
-            _, user_context_for_market = _build_live_data_context(live_data, is_gig_worker)
-            user_context_for_market["userId"] = user_id
-        
-        market_context = await _fetch_market_context(user_id, user_context_for_market, message)
+        user_context_for_market["userId"] = user_id
+        market_context = await _with_deadline(
+            _fetch_market_context(user_id, user_context_for_market, message),
+            CHAT_MARKET_DEADLINE,
+            "Market data temporarily unavailable.",
+            "market context",
+        )
     
-    # Fetch fresh stats
-    fresh_stats = get_user_stats_tool(user_id)
     stats_context, goals_context = _build_stats_context(fresh_stats)
     
     # Build contexts
@@ -57,8 +162,8 @@ async def handle_chat_request(data: ChatRequest, client, model: str) -> Dict[str
     memory_context = merge_and_clean_memories(data.relevantMemories[:8])
     history_text = "\n".join([f"{m.role}: {m.content}" for m in data.chatHistory[-6:]])
     
-    # Build system prompt
-    system_prompt = build_chat_system_prompt(
+    # Build system prompt (fitted to the chat token budget)
+    system_prompt, prompt_report = assemble_chat_system_prompt(
         live_data_context=live_data_context,
         market_context=market_context,
         stats_context=stats_context,
@@ -67,29 +172,162 @@ async def handle_chat_request(data: ChatRequest, client, model: str) -> Dict[str
         behavior_context=behavior_meta["text"],
         history_text=history_text
     )
+    print(format_report("Chat", prompt_report))
     
+    return system_prompt, message
+
+
+def _sse(event: str, payload: Dict[str, Any]) -> str:
+    """One server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+
+def _parse_plan(raw: str) -> Optional[Dict[str, Any]]:
+    """Plan JSON from a streamed reply (tolerates code fences / text around the object)"""
+    first = raw.find("{")
+    last = raw.rfind("}")
+    if first == -1 or last < first:
+        return None
     try:
-        result = await client.chat.completions.create(
-            model=model,
-            temperature=0.2,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": message}
-            ]
-        )
-        
-        raw = result.choices[0].message.content.strip()
-        plan_dict = json.loads(raw)
-        
-        if 'intent' not in plan_dict:
-            return {"success": False, "error": "Invalid AI response", "raw": raw}
-        
-        return {"success": True, "plan": plan_dict}
-        
+        plan = json.loads(raw[first:last + 1])
+    except json.JSONDecodeError:
+        return None
+    return plan if isinstance(plan, dict) else None
+
+
+class _JsonStringField:
+    """
+    Incrementally pulls one top-level string field out of a JSON object
+    arriving in pieces. feed() returns the newly decoded part of the field's
+    value (escapes resolved), so it can be forwarded before the object is
+    complete. Escape sequences split across pieces, including surrogate
+    pairs, are held back until they are whole.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode_left = 0
+        self._expect_key = False
+        self._token = []
+        self._key = None
+        self._streaming = False
+        self._done = False
+        self._raw = []
+        self._escape_start = None
+        self._hold_from = None
+
+    def feed(self, piece: str) -> str:
+        if self._done:
+            return ""
+        out = []
+        for ch in piece:
+            if self._in_string:
+                self._string_char(ch, out)
+                if self._done:
+                    break
+            elif ch == '"':
+                self._in_string = True
+                self._token = []
+                self._streaming = self._depth == 1 and not self._expect_key and self._key == self.field
+            elif ch in "{[":
+                self._depth += 1
+                self._expect_key = self._depth == 1 and ch == "{"
+            elif ch in "}]":
+                self._depth -= 1
+            elif self._depth == 1 and ch == ":":
+                self._expect_key = False
+            elif self._depth == 1 and ch == ",":
+                self._expect_key = True
+                self._key = None
+        if self._streaming:
+            cut = self._hold_from if self._hold_from is not None else (
+                self._escape_start if self._escape or self._unicode_left else len(self._raw)
+            )
+            out.append(self._decode(cut))
+        text = "".join(out)
+        self.text += text
+        return text
+
+    def _string_char(self, ch: str, out: list) -> None:
+        if not self._streaming:
+            # Keys / other values: only track where the string ends
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 1 and self._expect_key:
+                    self._key = "".join(self._token)
+            else:
+                self._token.append(ch)
+            return
+
+        if self._unicode_left:
+            self._raw.append(ch)
+            self._unicode_left -= 1
+            if not self._unicode_left:
+                code = int("".join(self._raw[-4:]), 16) if all(c in "0123456789abcdefABCDEF" for c in self._raw[-4:]) else 0
+                # A high surrogate waits for its low half
+                self._hold_from = self._escape_start if 0xD800 <= code <= 0xDBFF else None
+            return
+        if self._escape:
+            self._raw.append(ch)
+            self._escape = False
+            if ch == "u":
+                self._unicode_left = 4
+            else:
+                self._hold_from = None
+            return
+        if ch == "\\":
+            if self._hold_from is None:
+                self._escape_start = len(self._raw)
+            self._raw.append(ch)
+            self._escape = True
+            return
+        self._hold_from = None
+        if ch == '"':
+            self._in_string = False
+            self._streaming = False
+            self._done = True
+            out.append(self._decode(len(self._raw)))
+            return
+        self._raw.append(ch)
+
+    def _decode(self, cut: int) -> str:
+        """Decode and drop the first `cut` raw characters of the value"""
+        if cut <= 0:
+            return ""
+        raw = "".join(self._raw[:cut])
+        del self._raw[:cut]
+        if self._escape_start is not None:
+            self._escape_start = max(0, self._escape_start - cut)
+        if self._hold_from is not None:
+            self._hold_from = max(0, self._hold_from - cut)
+        try:
+            return json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            return raw
+
+
+async def _resolved(value: Any) -> Any:
+    """Already-resolved stage input (keeps the gather shape fixed)"""
+    return value
+
+
+async def _with_deadline(awaitable: Awaitable, timeout: float, default: Any, label: str) -> Any:
+    """Await a pipeline stage, returning `default` if it misses its deadline or fails"""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        print(f"⏱️ Chat stage '{label}' exceeded {timeout}s deadline")
     except Exception as e:
-        print("ai_chat error:", e)
-        return {"success": False, "error": str(e)}
+        print(f"⚠️ Chat stage '{label}' failed: {e}")
+    return default
 
 
 def _build_live_data_context(live_data: dict, is_gig_worker: bool) -> tuple:
@@ -139,8 +377,10 @@ EXPENSES: Total ₹{expenses.get('total', 0)}, Count: {expenses.get('count', 0)}
 SAVINGS: Total ₹{savings.get('total', 0)}
 INVESTMENTS: Total ₹{investments.get('total', 0)}
 
-GOALS: {json.dumps(goals, ensure_ascii=False, default=str)}
-ALERTS: {json.dumps(alerts[:5], ensure_ascii=False, default=str)}
+GOALS:
+{encode_table(goals, GOAL_COLUMNS) if goals else "None"}
+ALERTS:
+{encode_table(alerts[:5], ALERT_COLUMNS) if alerts else "None"}
 
 BEHAVIOR:
 - Discipline: {behavior.get('disciplineScore', 50)}/100
@@ -173,28 +413,32 @@ async def _fetch_market_context(user_id: str, user_context: dict, message: str)
     
     try:
         market_overview_data = await market_overview(user_context)
+        
+        # Crash risk, signal and SIP forecast only depend on the overview: run together
+        wants_sip = "sip" in message.lower()
+        crash_risk_data, investment_signal_data, sip_forecast_data = await asyncio.gather(
+            crash_risk_detector(user_context, market_overview_data),
+            investment_signal_engine(user_context, market_overview_data),
+            sip_forecast(user_context, market_overview_data) if wants_sip else _resolved(None),
+        )
+        
         market_context = f"""
 LIVE MARKET DATA
 --------------
 Market Trend: {market_overview_data.get('trend', 'unknown')}
 Global Sentiment: {market_overview_data.get('global_sentiment', 'unknown')}
 """
-        
-        crash_risk_data = await crash_risk_detector(user_context, market_overview_data)
         market_context += f"""
 CRASH RISK: {crash_risk_data.get('crash_probability_percent', 0)}% ({crash_risk_data.get('severity', 'low')})
 Action: {crash_risk_data.get('recommended_user_action', 'N/A')}
 """
-        
-        investment_signal_data = await investment_signal_engine(user_context, market_overview_data)
         market_context += f"""
 INVESTMENT SIGNAL: {investment_signal_data.get('signal', 'HOLD')}
 Asset Type: {investment_signal_data.get('asset_type', 'unknown')}
 Amount: ₹{investment_signal_data.get('recommended_amount', 0)}
 """
         
-        if "sip" in message.lower():
-            sip_forecast_data = await sip_forecast(user_context, market_overview_data)
+        if sip_forecast_data:
             market_context += f"""
 SIP FORECAST:
 - Amount: ₹{sip_forecast_data.get('recommended_sip_amount', 0)}
@@ -209,7 +453,7 @@ Crash Risk: {crash_risk_data.get('crash_probability_percent')}%
 Signal: {investment_signal_data.get('signal')}
 """
         
-        store_memory_entry(
+        await astore_memory_entry(
             user_id=user_id,
             content=intelligence_content,
             mem_type="market_intelligence",
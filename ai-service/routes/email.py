@@ -6,7 +6,8 @@ import json
 from datetime import datetime
 from typing import Any, Dict
 
-from tools import store_memory_entry
+from tools import astore_memory_entry
+from services.llm_gateway import LANE_STANDARD
 
 
 async def handle_send_email(data: dict, client, model: str) -> Dict[str, Any]:
@@ -22,6 +23,7 @@ async def handle_send_email(data: dict, client, model: str) -> Dict[str, Any]:
     try:
         result = await client.chat.completions.create(
             model=model,
+            lane=LANE_STANDARD,
             temperature=0.3,
             response_format={"type": "json_object"},
             messages=[
@@ -34,7 +36,7 @@ async def handle_send_email(data: dict, client, model: str) -> Dict[str, Any]:
         
         # Store email memory
         if user_id:
-            store_memory_entry(
+            await astore_memory_entry(
                 user_id,
                 f"Email generated: {email_type} - {email_content.get('subject', 'No subject')}",
                 "email_history",
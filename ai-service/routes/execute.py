@@ -6,12 +6,13 @@ import json
 from typing import Any, Dict
 
 from schemas import ExecuteRequest, AgentPlan
-from tools import tavily_search, get_stock_market_data, get_sip_ideas, get_insurance_ideas, store_memory_entry
-from node_client import (
+from tools import tavily_search, get_stock_market_data, get_sip_ideas, get_insurance_ideas, astore_memory_entry
+from async_node_client import (
     add_transaction_tool, update_transaction_tool, delete_transaction_tool,
     get_transactions_tool, create_goal_tool
 )
 from config import GROQ_MODEL
+from services.llm_gateway import LANE_INTERACTIVE
 
 
 async def handle_execute_request(data: ExecuteRequest, client, model: str) -> Dict[str, Any]:
@@ -32,7 +33,7 @@ async def handle_execute_request(data: ExecuteRequest, client, model: str) -> Di
     try:
         # Transaction operations
         if tool == "add_transaction":
-            result = add_transaction_tool(
+            result = await add_transaction_tool(
                 user_id=user_id,
                 tx_type=params.get("type", "expense"),
                 category=params.get("category", "Other"),
@@ -54,7 +55,7 @@ async def handle_execute_request(data: ExecuteRequest, client, model: str) -> Di
             if not transaction_id or transaction_id == "None":
                 return {"success": False, "error": "transactionId is required"}
             
-            result = update_transaction_tool(user_id, transaction_id, params.get("fields", {}))
+            result = await update_transaction_tool(user_id, transaction_id, params.get("fields", {}))
             reflection = f"Updated transaction {transaction_id}."
         
         elif tool == "delete_transaction":
@@ -62,11 +63,11 @@ async def handle_execute_request(data: ExecuteRequest, client, model: str) -> Di
             if not transaction_id or transaction_id == "None":
                 return {"success": False, "error": "transactionId is required"}
             
-            result = delete_transaction_tool(user_id, transaction_id)
+            result = await delete_transaction_tool(user_id, transaction_id)
             reflection = f"Deleted transaction {transaction_id}."
         
         elif tool == "get_transactions":
-            result = get_transactions_tool(user_id, params.get("filters", {}))
+            result = await get_transactions_tool(user_id, params.get("filters", {}))
             reflection = "Retrieved transaction overview."
         
         # Web search
@@ -91,7 +92,7 @@ async def handle_execute_request(data: ExecuteRequest, client, model: str) -> Di
                 result = await _analyze_stock(client, model, symbol, raw_info, params)
             
             reflection = f"Market data for {symbol}."
-            store_memory_entry(user_id, reflection, "decision_history", {"symbol": symbol, "kind": "stock"})
+            await astore_memory_entry(user_id, reflection, "decision_history", {"symbol": symbol, "kind": "stock"})
         
         # SIP recommendation
         elif tool == "sip_recommender":
@@ -102,7 +103,7 @@ async def handle_execute_request(data: ExecuteRequest, client, model: str) -> Di
             raw_info = get_sip_ideas(risk, monthly_amount, goal)
             result = await _generate_sip_recommendation(client, model, risk, monthly_amount, goal, raw_info)
             reflection = f"SIP suggestions for goal {goal}."
-            store_memory_entry(user_id, reflection, "decision_history", {"kind": "sip", "goal": goal})
+            await astore_memory_entry(user_id, reflection, "decision_history", {"kind": "sip", "goal": goal})
         
         # Insurance recommendation
         elif tool == "insurance_matcher":
@@ -113,7 +114,7 @@ async def handle_execute_request(data: ExecuteRequest, client, model: str) -> Di
             raw_info = get_insurance_ideas(age, dependents, income)
             result = await _generate_insurance_recommendation(client, model, age, dependents, income, raw_info)
             reflection = f"Insurance advice generated."
-            store_memory_entry(user_id, reflection, "decision_history", {"kind": "insurance"})
+            await astore_memory_entry(user_id, reflection, "decision_history", {"kind": "insurance"})
         
         # Goal creation
         elif tool == "create_goal":
@@ -136,7 +137,7 @@ async def handle_execute_request(data: ExecuteRequest, client, model: str) -> Di
             if priority not in ["must_have", "good_to_have"]:
                 priority = "good_to_have"
             
-            result = create_goal_tool(user_id, name, target_amount, deadline, priority)
+            result = await create_goal_tool(user_id, name, target_amount, deadline, priority)
             reflection = f"Created goal: {name} with target ₹{target_amount}."
         
         else:
@@ -144,7 +145,7 @@ async def handle_execute_request(data: ExecuteRequest, client, model: str) -> Di
         
         # Store behavior memory
         if reflection:
-            store_memory_entry(user_id, reflection, "chat_behavior", {"tool": tool, "source": "ai"})
+            await astore_memory_entry(user_id, reflection, "chat_behavior", {"tool": tool, "source": "ai"})
         
         return {"success": True, "tool": tool, "result": result}
         
@@ -175,6 +176,7 @@ Return JSON:
     try:
         result = await client.chat.completions.create(
             model=model,
+            lane=LANE_INTERACTIVE,
             temperature=0.1,
             response_format={"type": "json_object"},
             messages=[{"role": "system", "content": prompt}, {"role": "user", "content": "Extract now."}]
@@ -206,6 +208,7 @@ Return JSON:
     try:
         result = await client.chat.completions.create(
             model=model,
+            lane=LANE_INTERACTIVE,
             temperature=0.2,
             response_format={"type": "json_object"},
             messages=[{"role": "system", "content": prompt}, {"role": "user", "content": "Analyze now."}]
@@ -235,6 +238,7 @@ Return JSON:
     
     result = await client.chat.completions.create(
         model=model,
+        lane=LANE_INTERACTIVE,
         temperature=0.3,
         response_format={"type": "json_object"},
         messages=[{"role": "system", "content": prompt}, {"role": "user", "content": "Generate recommendations."}]
@@ -260,6 +264,7 @@ Return JSON:
     
     result = await client.chat.completions.create(
         model=model,
+        lane=LANE_INTERACTIVE,
         temperature=0.3,
         response_format={"type": "json_object"},
         messages=[{"role": "system", "content": prompt}, {"role": "user", "content": "Generate recommendations."}]
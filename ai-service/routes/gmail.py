@@ -4,18 +4,34 @@ Gmail integration route handlers
 
 import os
 import json
+import time
+import asyncio
 import secrets
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from pathlib import Path
 
-from tools import store_memory_entry
-from node_client import backend_api_request
-from config import BACKEND_BASE_URL
+from tools import astore_memory_entry
+from async_node_client import backend_bulk_write, STATUS_FAILED
+from config import (
+    GMAIL_CRON_USER_CONCURRENCY, GMAIL_MAILBOX_CONCURRENCY, GMAIL_USER_SYNC_TIMEOUT,
+    GMAIL_LLM_BODY_CHARS, GMAIL_SYNC_DIR as _GMAIL_SYNC_DIR
+)
+from gmail_sync import GmailSyncState, list_new_message_ids
+from gmail_fetch import build_gmail_service, fetch_two_phase
+from connect_mail import GmailTransactionClassifier
+from gmail_extract import TIERS, TIER_LLM, extract_deterministic
+from classifier import classify_batch
+from services.llm_gateway import LANE_BACKGROUND
 
 # Gmail credentials directory
 GMAIL_CREDS_DIR = Path(__file__).parent.parent / "gmail_credentials"
 
+# Cron run summaries (one JSON line per run)
+GMAIL_SYNC_DIR = Path(_GMAIL_SYNC_DIR)
+GMAIL_CRON_LOG = GMAIL_SYNC_DIR / "cron_runs.jsonl"
+last_gmail_cron_summary: Dict[str, Any] = {}
+
 
 def get_gmail_auth_url(user_id: str) -> Dict[str, Any]:
     """Generate Gmail OAuth authorization URL"""
@@ -142,80 +158,143 @@ def get_gmail_credentials(user_id: str):
         return None
 
 
-async def fetch_gmail_transactions(user_id: str, client, model: str) -> Dict[str, Any]:
-    """Fetch and parse financial emails from Gmail"""
+def _thread_http(credentials):
+    """Per-call authorized transport: httplib2 is not thread-safe, so never share one across threads"""
+    import httplib2
+    import google_auth_httplib2
+    return google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+
+
+async def fetch_gmail_transactions(
+    user_id: str,
+    client,
+    model: str,
+    credentials=None,
+    concurrency: int = GMAIL_MAILBOX_CONCURRENCY,
+) -> Dict[str, Any]:
+    """
+    Fetch and parse financial emails from Gmail.
+
+    Two-phase batched fetch (gmail_fetch.fetch_two_phase): headers + snippets
+    for the whole batch, then bodies only for messages passing the amount +
+    keyword prefilter. Templates / rules read subject and snippet (then the
+    body); the LLM, run concurrently, gets the body for what they cannot resolve.
+    """
     
     try:
-        from googleapiclient.discovery import build
-        
-        credentials = get_gmail_credentials(user_id)
+        if credentials is None:
+            credentials = await asyncio.to_thread(get_gmail_credentials, user_id)
         if not credentials:
             return {"success": False, "error": "Gmail not connected", "needsAuth": True}
         
-        service = build('gmail', 'v1', credentials=credentials)
+        service = build_gmail_service(credentials)
         
         # Search for financial emails
         query = "(from:alerts@hdfcbank.net OR from:alerts@icicibank.com OR from:noreply@paytm.com " \
                 "OR from:no-reply@phonepe.com OR from:noreply@gpay.com OR subject:transaction " \
                 "OR subject:payment OR subject:credited OR subject:debited) newer_than:7d"
         
-        results = service.users().messages().list(
-            userId='me',
-            q=query,
-            maxResults=50
-        ).execute()
-        
-        messages = results.get('messages', [])
+        # Incremental: only messages that arrived since the last checkpoint and
+        # were not processed before are considered
+        sync_state = GmailSyncState(user_id, "llm")
+        message_ids = await asyncio.to_thread(
+            list_new_message_ids, service, sync_state, query, 50, _thread_http(credentials)
+        )
+        messages = [{"id": message_id} for message_id in message_ids]
+        batch = messages[:20]
         
         if not messages:
-            return {"success": True, "transactions": [], "message": "No financial emails found"}
-        
-        transactions = []
-        
-        for msg in messages[:20]:
-            msg_data = service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='snippet'
-            ).execute()
-            
-            snippet = msg_data.get('snippet', '')
-            subject = ''
-            
-            for header in msg_data.get('payload', {}).get('headers', []):
-                if header['name'] == 'Subject':
-                    subject = header['value']
-                    break
+            sync_state.advance()
+            sync_state.save()
+            return {"success": True, "transactions": [], "processed": 0, "stored": 0,
+                    "message": "No new financial emails"}
+        
+        # Headers + snippets for the whole batch in one batched round-trip, then
+        # bodies (batched again) only for messages with an amount and payment keyword
+        batch_ids = [msg['id'] for msg in batch]
+        fetched = await asyncio.to_thread(
+            fetch_two_phase, service, batch_ids, GmailTransactionClassifier.prefilter, _thread_http(credentials)
+        )
+        fetch_errors = fetched['errors']
+        fetched_messages = {message['id']: message for message in fetched['messages']}
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        tiers = {tier: 0 for tier in TIERS}
+        
+        async def process(msg) -> Optional[dict]:
+            if msg['id'] in fetch_errors:
+                raise fetch_errors[msg['id']]
+            message = fetched_messages.get(msg['id'])
+            # Ruled out by the prefilter (no amount or payment keyword): not a transaction
+            if message is None:
+                return None
+            subject, sender, snippet = message['subject'], message['from'], message['snippet']
+            body = " ".join(message['body'].split())[:GMAIL_LLM_BODY_CHARS]
             
-            # Parse transaction from email
-            parsed = await _parse_email_transaction(client, model, subject, snippet)
+            # Bank templates / rules first; the LLM only sees what they cannot resolve
+            parsed = extract_deterministic(sender, subject, snippet)
+            if parsed is None and body:
+                parsed = extract_deterministic(sender, subject, body)
+            if parsed is None:
+                async with semaphore:
+                    parsed = await _parse_email_transaction(client, model, subject, body or snippet)
+                if parsed:
+                    parsed["tier"] = TIER_LLM
+                tiers[TIER_LLM] += 1
+            else:
+                tiers[parsed["tier"]] += 1
             if parsed and parsed.get("amount"):
                 parsed["emailId"] = msg['id']
                 parsed["userId"] = user_id
-                transactions.append(parsed)
+                return parsed
+            return None
+        
+        outcomes = await asyncio.gather(*(process(msg) for msg in batch), return_exceptions=True)
+        transactions = []
+        handled_ids = []
+        failures = 0
+        for msg, outcome in zip(batch, outcomes):
+            if isinstance(outcome, Exception):
+                failures += 1
+                print(f"⚠️ Error processing message {msg.get('id')}: {outcome}")
+            elif outcome:
+                transactions.append(outcome)
+            else:
+                handled_ids.append(msg['id'])  # not a transaction: never look at it again
         
-        # Store transactions via backend
+        categorization = await _categorize_deterministic(transactions, user_id)
+        
+        # Store transactions via backend: batched, keyed by Gmail message id, failed items retried
+        write = await backend_bulk_write(
+            user_id,
+            "email",
+            [(tx["emailId"], tx) for tx in transactions],
+            legacy_path="/transactions/from-email"
+        )
         stored_count = 0
-        for tx in transactions:
-            try:
-                result = backend_api_request(
-                    "POST",
-                    "/transactions/from-email",
-                    {"userId": user_id, "transaction": tx}
-                )
-                if result.get("success"):
-                    stored_count += 1
-            except Exception as e:
-                print(f"⚠️ Error storing email transaction: {e}")
+        for result in write["results"]:
+            if result["status"] == STATUS_FAILED:
+                failures += 1
+                print(f"⚠️ Error storing email transaction {result['dedupKey']}: {result.get('error')}")
+            else:
+                stored_count += 1
+                handled_ids.append(result["dedupKey"])
+        
+        # Checkpoint: skip handled ids next time; only advance historyId when
+        # nothing failed and nothing was left for the next tick
+        sync_state.mark_processed(handled_ids)
+        if failures == 0 and len(messages) <= len(batch):
+            sync_state.advance()
+        sync_state.save()
         
         # Store memory
-        store_memory_entry(
+        await astore_memory_entry(
             user_id,
             f"Processed {len(transactions)} email transactions, stored {stored_count}",
             "gmail_sync",
             {
                 "date": datetime.now().isoformat(),
-                "emailsProcessed": len(messages),
+                "emailsProcessed": len(batch),
                 "transactionsFound": len(transactions),
                 "transactionsStored": stored_count
             }
@@ -224,8 +303,12 @@ async def fetch_gmail_transactions(user_id: str, client, model: str) -> Dict[str
         return {
             "success": True,
             "transactions": transactions,
-            "processed": len(messages),
-            "stored": stored_count
+            "processed": len(batch),
+            "stored": stored_count,
+            "tiers": tiers,
+            "llmBypassRate": _bypass_rate(tiers),
+            "categorization": categorization,
+            "fetchStats": fetched['stats']
         }
         
     except Exception as e:
@@ -233,13 +316,38 @@ async def fetch_gmail_transactions(user_id: str, client, model: str) -> Dict[str
         return {"success": False, "error": str(e)}
 
 
-async def _parse_email_transaction(client, model: str, subject: str, snippet: str) -> Optional[dict]:
-    """Parse transaction details from email"""
+async def _categorize_deterministic(transactions: List[dict], user_id: str) -> Dict[str, Any]:
+    """
+    Template / rule matches only carry type and amount: look up their category
+    from the merchant (else the note) via classify_batch (user labels / cache /
+    kNN / batched LLM). LLM-parsed emails keep the category they came with.
+    """
+    deterministic = [tx for tx in transactions if tx.get("tier") != TIER_LLM]
+    if not deterministic:
+        return {}
+    batch = await classify_batch(
+        [tx.get("merchant") or tx.get("note") or "" for tx in deterministic],
+        user_id=user_id
+    )
+    for tx, classification in zip(deterministic, batch["results"]):
+        tx["category"] = classification.get("category", "Other")
+    return {k: v for k, v in batch.items() if k != "results"}
+
+
+def _bypass_rate(tiers: Dict[str, int]) -> float:
+    """Share of candidate emails resolved without an LLM call"""
+    total = sum(tiers.values())
+    return round(1 - tiers.get(TIER_LLM, 0) / total, 4) if total else 0.0
+
+
+async def _parse_email_transaction(client, model: str, subject: str, content: str) -> Optional[dict]:
+    """Parse transaction details from email.
+    LLM/API errors propagate so the message is not checkpointed and is retried next sync."""
     
     prompt = f"""Extract transaction from this email:
 
 Subject: {subject}
-Content: {snippet}
+Content: {content}
 
 Return JSON (null if not a transaction):
 {{
@@ -256,6 +364,7 @@ Return {{"skip": true}} if not a valid transaction."""
     try:
         result = await client.chat.completions.create(
             model=model,
+            lane=LANE_BACKGROUND,
             temperature=0.1,
             response_format={"type": "json_object"},
             messages=[
@@ -266,18 +375,64 @@ Return {{"skip": true}} if not a valid transaction."""
         
         parsed = json.loads(result.choices[0].message.content.strip())
         
-        if parsed.get("skip"):
-            return None
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Email parse error: {e}")
+        return None
+    
+    if parsed.get("skip"):
+        return None
+    
+    return parsed
+
+
+async def _sync_user(user_id: str, client, model: str) -> Dict[str, Any]:
+    """Sync one mailbox; never raises so one user cannot fail the whole run"""
+    started = time.monotonic()
+    try:
+        # Check if user has Gmail connected
+        credentials = await asyncio.to_thread(get_gmail_credentials, user_id)
+        if not credentials:
+            return {"userId": user_id, "status": "skipped", "reason": "Gmail not connected"}
         
-        return parsed
+        result = await asyncio.wait_for(
+            fetch_gmail_transactions(user_id, client, model, credentials=credentials),
+            GMAIL_USER_SYNC_TIMEOUT
+        )
         
+        if result.get("success"):
+            return {
+                "userId": user_id,
+                "status": "success",
+                "transactions": result.get("stored", 0),
+                "tiers": result.get("tiers", {}),
+                "durationMs": round((time.monotonic() - started) * 1000)
+            }
+        return {"userId": user_id, "status": "failed", "error": result.get("error")}
+    
+    except asyncio.TimeoutError:
+        return {"userId": user_id, "status": "error", "error": f"Timed out after {GMAIL_USER_SYNC_TIMEOUT}s"}
     except Exception as e:
-        print(f"⚠️ Email parse error: {e}")
-        return None
+        return {"userId": user_id, "status": "error", "error": str(e)}
 
 
-async def run_gmail_cron_job(user_ids: list, client, model: str) -> Dict[str, Any]:
-    """Run Gmail sync for multiple users (cron job)"""
+async def run_gmail_cron_job(
+    user_ids: list,
+    client,
+    model: str,
+    concurrency: int = GMAIL_CRON_USER_CONCURRENCY,
+) -> Dict[str, Any]:
+    """Run Gmail sync for multiple users (cron job) with a bounded worker pool"""
+    
+    global last_gmail_cron_summary
+    started_at = datetime.utcnow().isoformat() + "Z"
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def worker(user_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await _sync_user(user_id, client, model)
+    
+    user_results = await asyncio.gather(*(worker(user_id) for user_id in user_ids))
     
     results = {
         "success": True,
@@ -285,44 +440,51 @@ async def run_gmail_cron_job(user_ids: list, client, model: str) -> Dict[str, An
         "failed": 0,
         "skipped": 0,
         "totalTransactions": 0,
-        "users": []
+        "tiers": {tier: 0 for tier in TIERS},
+        "users": user_results
     }
-    
-    for user_id in user_ids:
-        try:
-            # Check if user has Gmail connected
-            credentials = get_gmail_credentials(user_id)
-            if not credentials:
-                results["skipped"] += 1
-                results["users"].append({"userId": user_id, "status": "skipped", "reason": "Gmail not connected"})
-                continue
-            
-            result = await fetch_gmail_transactions(user_id, client, model)
-            
-            if result.get("success"):
-                results["processed"] += 1
-                results["totalTransactions"] += result.get("stored", 0)
-                results["users"].append({
-                    "userId": user_id,
-                    "status": "success",
-                    "transactions": result.get("stored", 0)
-                })
-            else:
-                results["failed"] += 1
-                results["users"].append({
-                    "userId": user_id,
-                    "status": "failed",
-                    "error": result.get("error")
-                })
-                
-        except Exception as e:
+    for user_result in user_results:
+        status = user_result["status"]
+        if status == "success":
+            results["processed"] += 1
+            results["totalTransactions"] += user_result.get("transactions", 0)
+            for tier, count in user_result.get("tiers", {}).items():
+                results["tiers"][tier] = results["tiers"].get(tier, 0) + count
+        elif status == "skipped":
+            results["skipped"] += 1
+        else:
             results["failed"] += 1
-            results["users"].append({"userId": user_id, "status": "error", "error": str(e)})
     
+    results["llmBypassRate"] = _bypass_rate(results["tiers"])
+    results["startedAt"] = started_at
+    results["durationMs"] = round((time.monotonic() - started) * 1000)
     results["timestamp"] = datetime.utcnow().isoformat() + "Z"
+    
+    last_gmail_cron_summary = results
+    _record_cron_run(results)
+    print(f"📬 Gmail cron: {results['processed']} ok, {results['failed']} failed, "
+          f"{results['skipped']} skipped in {results['durationMs']}ms, "
+          f"LLM bypass {results['llmBypassRate']:.0%}")
     return results
 
 
+def _record_cron_run(results: Dict[str, Any]) -> None:
+    """Append a compact run summary to the cron log"""
+    try:
+        GMAIL_SYNC_DIR.mkdir(parents=True, exist_ok=True)
+        summary = {k: v for k, v in results.items() if k != "users"}
+        summary["errors"] = [u for u in results["users"] if u["status"] in ("failed", "error")]
+        with GMAIL_CRON_LOG.open("a") as f:
+            f.write(json.dumps(summary, default=str) + "\n")
+    except Exception as e:
+        print(f"⚠️ Could not record Gmail cron summary: {e}")
+
+
+def get_last_cron_summary() -> Dict[str, Any]:
+    """Summary of the most recent Gmail cron run in this process"""
+    return last_gmail_cron_summary or {"message": "Gmail cron has not run yet"}
+
+
 def check_gmail_connection(user_id: str) -> Dict[str, Any]:
     """Check if Gmail is connected for user"""
     
@@ -4,12 +4,21 @@ AI Insights route handler
 
 import json
 from datetime import datetime as dt_datetime
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
 from schemas import InsightRequest
 from tools import build_behavior_context, store_memory_entry
-from node_client import fetch_recent_transactions
-from config import GIG_CATEGORIES
+from async_node_client import fetch_recent_transactions
+from config import GIG_CATEGORIES, INSIGHT_PROMPT_TOKEN_BUDGET, INSIGHT_CACHE_ENABLED
+from prompts import PromptSection, assemble_prompt, encode_json, encode_table, format_report
+from services.insight_cache import canonicalize, fingerprint, get_insight_cache
+from services.llm_gateway import LANE_STANDARD
+
+# Prompt data sections: token budgets and drop priorities (lowest priority is dropped first)
+INSIGHT_SECTION_BUDGETS = {"stats": 350, "goal_metadata": 150, "goals": 200, "transactions": 700}
+INSIGHT_SECTION_PRIORITIES = {"stats": 100, "goal_metadata": 90, "goals": 80, "transactions": 70}
+GOAL_COLUMNS = ("name", "targetAmount", "currentAmount", "deadline")
+TRANSACTION_COLUMNS = ("date", "type", "amount", "category", "subtype", "note", "description", "merchant")
 
 
 async def handle_insights_request(data: InsightRequest, client, model: str) -> Dict[str, Any]:
@@ -30,7 +39,7 @@ async def handle_insights_request(data: InsightRequest, client, model: str) -> D
     recent_transactions = data.recentTransactions or []
     if not recent_transactions or len(recent_transactions) == 0:
         print(f"📊 [AI Insights] Fetching recent transactions for page: {page}")
-        recent_transactions = fetch_recent_transactions(user_id, page, limit=20)
+        recent_transactions = await fetch_recent_transactions(user_id, page, limit=20)
         print(f"📊 [AI Insights] Fetched {len(recent_transactions)} transactions")
     
     # Extract behavior flags
@@ -95,15 +104,69 @@ async def handle_insights_request(data: InsightRequest, client, model: str) -> D
             'priority': alert_metadata.get('priority')
         }
     
-    # Build system prompt
-    system_prompt = _build_insight_system_prompt(
+    inputs = (
         alert, stats, goals, recent_transactions,
         behavior_flags, is_gig_worker, gig_indicators, goal_metadata
     )
     
+    async def generate() -> Dict[str, Any]:
+        return await _generate_insights(client, model, user_id, page, *inputs)
+    
+    if not INSIGHT_CACHE_ENABLED:
+        return await generate()
+    
+    # Same alert and (quantized) financial state as a recent request: reuse its reports
+    cache_key = fingerprint(_insight_cache_inputs(page, *inputs))
+    result = await get_insight_cache().get_or_generate(user_id, cache_key, generate, _is_cacheable)
+    if result.get("cached"):
+        print(f"♻️ [AI Insights] Cached insights reused for user {user_id}")
+    return {**result, "userId": user_id, "alertId": alert.get("id"), "page": page}
+
+
+def _insight_cache_inputs(
+    page, alert, stats, goals, recent_transactions,
+    behavior_flags, is_gig_worker, gig_indicators, goal_metadata
+) -> Dict[str, Any]:
+    """What the insight prompt is built from (the alert's id and timestamps excluded)"""
+    return {
+        "page": page,
+        "alert": {key: alert.get(key) for key in ("level", "scope", "title", "reasons")},
+        "behaviorFlags": behavior_flags,
+        "stats": stats,
+        "goals": [{key: g.get(key) for key in GOAL_COLUMNS} for g in goals[:5]],
+        # Order-insensitive: the same transactions fetched in another order are the same state
+        "transactions": sorted(
+            (canonicalize({key: t.get(key) for key in TRANSACTION_COLUMNS}) for t in recent_transactions[:20]),
+            key=lambda row: json.dumps(row, sort_keys=True, ensure_ascii=False)
+        ),
+        "isGigWorker": is_gig_worker,
+        "gigIndicators": sorted(gig_indicators),
+        "goalMetadata": goal_metadata,
+    }
+
+
+def _is_cacheable(result: Dict[str, Any]) -> bool:
+    """Only real model output is cached, never fallbacks or errors"""
+    return bool(result.get("success")) and not result.get("fallback")
+
+
+async def _generate_insights(
+    client, model: str, user_id: str, page: str, alert, stats, goals, recent_transactions,
+    behavior_flags, is_gig_worker, gig_indicators, goal_metadata
+) -> Dict[str, Any]:
+    """One LLM generation of the five insight reports"""
+    
+    # Build system prompt (fitted to the insight token budget)
+    system_prompt, prompt_report = _build_insight_system_prompt(
+        alert, stats, goals, recent_transactions,
+        behavior_flags, is_gig_worker, gig_indicators, goal_metadata
+    )
+    print(format_report("Insight", prompt_report))
+    
     try:
         result = await client.chat.completions.create(
             model=model,
+            lane=LANE_STANDARD,
             temperature=0.2,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -178,9 +241,30 @@ async def handle_insights_request(data: InsightRequest, client, model: str) -> D
 def _build_insight_system_prompt(
     alert, stats, goals, recent_transactions,
     behavior_flags, is_gig_worker, gig_indicators, goal_metadata
-) -> str:
-    """Build the insight generation system prompt"""
+) -> Tuple[str, Dict[str, Any]]:
+    """Build the insight generation system prompt; returns (prompt, per-section token report)"""
     
+    def section(name: str, text: str, empty: str) -> PromptSection:
+        return PromptSection(
+            name, text, INSIGHT_SECTION_BUDGETS[name], INSIGHT_SECTION_PRIORITIES[name],
+            required=name == "stats", empty=empty
+        )
+    
+    sections = [
+        section("stats", encode_json(stats) if stats else "", "No stats available"),
+        section("goals", encode_table(goals[:5], GOAL_COLUMNS) if goals else "", "No goals set"),
+        section("transactions", encode_table(recent_transactions[:20], TRANSACTION_COLUMNS)
+                if recent_transactions else "", "No recent transactions"),
+        section("goal_metadata", encode_json(goal_metadata) if goal_metadata else "", "No goal metadata"),
+    ]
+    
+    def render(s: Dict[str, str]) -> str:
+        return _render_insight_system_prompt(alert, behavior_flags, is_gig_worker, gig_indicators, s)
+    
+    return assemble_prompt(render, sections, INSIGHT_PROMPT_TOKEN_BUDGET)
+
+
+def _render_insight_system_prompt(alert, behavior_flags, is_gig_worker, gig_indicators, s: Dict[str, str]) -> str:
     return f"""You are the AI Insights Engine for FINtastic.
 
 Your responsibilities:
@@ -227,16 +311,18 @@ Behavior Flags:
 - Risk Score: {behavior_flags['riskScore']}
 - Positivity Score: {behavior_flags['positivityScore']}
 
-STATS: {json.dumps(stats, indent=2) if stats else 'No stats available'}
+STATS: {s["stats"]}
 
-GOALS: {json.dumps([{{'name': g.get('name'), 'targetAmount': g.get('targetAmount'), 'currentAmount': g.get('currentAmount'), 'deadline': g.get('deadline')}} for g in goals[:5]], indent=2) if goals else 'No goals set'}
+GOALS:
+{s["goals"]}
 
-RECENT TRANSACTIONS: {json.dumps(recent_transactions[:20], indent=2) if recent_transactions else 'No recent transactions'}
+RECENT TRANSACTIONS:
+{s["transactions"]}
 
 Is Gig Worker: {is_gig_worker}
 Gig Indicators: {', '.join(gig_indicators) if gig_indicators else 'None'}
 
-Goal Metadata: {json.dumps(goal_metadata, indent=2) if goal_metadata else 'No goal metadata'}
+Goal Metadata: {s["goal_metadata"]}
 
 Return ONLY the JSON object, nothing else."""
 
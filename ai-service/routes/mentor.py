@@ -2,14 +2,16 @@
 Daily Mentor route handler
 """
 
+import asyncio
 import json
 from datetime import datetime
 from typing import Any, Dict
 
 from schemas import DailyMentorRequest
-from tools import store_memory_entry, build_behavior_context
+from tools import astore_memory_entry, build_behavior_context
 from prompts import build_daily_mentor_prompt
-from node_client import get_user_stats_tool, get_ai_alerts_tool
+from async_node_client import get_user_stats_tool, get_ai_alerts_tool
+from services.llm_gateway import LANE_BACKGROUND
 
 
 async def handle_daily_mentor(data: DailyMentorRequest, client, model: str) -> Dict[str, Any]:
@@ -18,8 +20,10 @@ async def handle_daily_mentor(data: DailyMentorRequest, client, model: str) -> D
     user_id = data.userId
     
     # Fetch user data
-    stats = get_user_stats_tool(user_id)
-    alerts = get_ai_alerts_tool(user_id, limit=5)
+    stats, alerts = await asyncio.gather(
+        get_user_stats_tool(user_id),
+        get_ai_alerts_tool(user_id, limit=5),
+    )
     
     behavior_meta = build_behavior_context(data.behaviorProfile)
     
@@ -41,6 +45,7 @@ async def handle_daily_mentor(data: DailyMentorRequest, client, model: str) -> D
     try:
         result = await client.chat.completions.create(
             model=model,
+            lane=LANE_BACKGROUND,
             temperature=0.4,
             response_format={"type": "json_object"},
             messages=[
@@ -53,7 +58,7 @@ async def handle_daily_mentor(data: DailyMentorRequest, client, model: str) -> D
         mentor_response["generatedAt"] = datetime.utcnow().isoformat() + "Z"
         
         # Store mentor memory
-        store_memory_entry(
+        await astore_memory_entry(
             user_id,
             f"Daily mentor: {mentor_response.get('title', 'Daily message')}",
             "mentor_history",
@@ -6,9 +6,10 @@ import json
 from datetime import datetime
 from typing import Any, Dict
 
-from tools import store_memory_entry, build_behavior_context
-from node_client import fetch_recent_transactions
+from tools import astore_memory_entry, build_behavior_context
+from async_node_client import fetch_recent_transactions
 from config import GIG_CATEGORIES
+from services.llm_gateway import LANE_BACKGROUND
 
 
 async def handle_daily_monitor(data: dict, client, model: str) -> Dict[str, Any]:
@@ -19,7 +20,7 @@ async def handle_daily_monitor(data: dict, client, model: str) -> Dict[str, Any]
         return {"success": False, "error": "userId is required"}
     
     # Fetch recent transactions
-    recent_transactions = fetch_recent_transactions(user_id, "daily", limit=50)
+    recent_transactions = await fetch_recent_transactions(user_id, "daily", limit=50)
     
     if not recent_transactions or len(recent_transactions) == 0:
         return {
@@ -40,6 +41,7 @@ async def handle_daily_monitor(data: dict, client, model: str) -> Dict[str, Any]
     try:
         result = await client.chat.completions.create(
             model=model,
+            lane=LANE_BACKGROUND,
             temperature=0.2,
             response_format={"type": "json_object"},
             messages=[
@@ -51,7 +53,7 @@ async def handle_daily_monitor(data: dict, client, model: str) -> Dict[str, Any]
         response = json.loads(result.choices[0].message.content.strip())
         
         # Store analysis memory
-        store_memory_entry(
+        await astore_memory_entry(
             user_id,
             f"Daily monitor: {len(recent_transactions)} transactions analyzed on {datetime.now().strftime('%Y-%m-%d')}",
             "monitor_history",
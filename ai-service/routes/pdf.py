@@ -2,15 +2,21 @@
 PDF Bank Statement parsing route handler
 """
 
+import asyncio
 import json
-import tempfile
-import os
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 
-from tools import store_memory_entry
-from node_client import backend_api_request
+from config import PDF_LLM_CHUNK_CHARS, PDF_LLM_CONCURRENCY, PDF_LLM_CHUNK_RETRIES, PDF_PAGE_MIN_CONFIDENCE
+from parser import hash_row, iter_parsed_pages
+from classifier import classify_batch
+from tools import astore_memory_entry
+from async_node_client import backend_bulk_write
+from services.llm_gateway import LANE_BACKGROUND
+
+TIER_DETERMINISTIC = "deterministic"
+TIER_LLM = "llm"
 
 
 async def handle_pdf_parse(
@@ -20,100 +26,110 @@ async def handle_pdf_parse(
     client,
     model: str
 ) -> Dict[str, Any]:
-    """Parse bank statement PDF and extract transactions"""
+    """
+    Parse bank statement PDF and extract transactions.
+
+    Every page goes through the deterministic parser first (parser.analyze_page);
+    only pages whose parse confidence is below PDF_PAGE_MIN_CONFIDENCE are sent
+    to the LLM. parseStats reports how many pages / rows each tier handled.
+    """
     
     try:
-        import pdfplumber
+        # Deterministic tier: one pass over the PDF, page by page (process pool if configured)
+        pages = await asyncio.to_thread(_analyze_pages, file_content)
         
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-            tmp.write(file_content)
-            tmp_path = tmp.name
+        if not any(p["text"].strip() for p in pages):
+            return {"success": False, "error": "Could not extract text from PDF"}
         
-        try:
-            # Extract text from PDF
-            text_content = ""
-            tables = []
-            
-            with pdfplumber.open(tmp_path) as pdf:
-                for page in pdf.pages:
-                    text_content += page.extract_text() or ""
-                    text_content += "\n"
-                    
-                    # Extract tables
-                    page_tables = page.extract_tables()
-                    if page_tables:
-                        tables.extend(page_tables)
-            
-            if not text_content.strip():
-                return {"success": False, "error": "Could not extract text from PDF"}
-            
-            # Detect bank type
-            bank_type = _detect_bank(text_content)
-            
-            # Parse transactions using AI
-            transactions = await _parse_bank_statement(
-                client, model, text_content, tables, bank_type
-            )
-            
-            if not transactions:
-                return {
-                    "success": True,
-                    "transactions": [],
-                    "message": "No transactions found in statement"
-                }
-            
-            # Store transactions
-            stored_count = 0
-            for tx in transactions:
-                try:
-                    tx["userId"] = user_id
-                    tx["source"] = "pdf_statement"
-                    tx["filename"] = filename
-                    
-                    result = backend_api_request(
-                        "POST",
-                        "/transactions/from-statement",
-                        {"userId": user_id, "transaction": tx}
-                    )
-                    if result.get("success"):
-                        stored_count += 1
-                except Exception as e:
-                    print(f"⚠️ Error storing PDF transaction: {e}")
-            
-            # Store memory
-            store_memory_entry(
-                user_id,
-                f"Parsed bank statement: {filename}, found {len(transactions)} transactions, stored {stored_count}",
-                "pdf_parse",
-                {
-                    "filename": filename,
-                    "bank": bank_type,
-                    "date": datetime.now().isoformat(),
-                    "transactionsFound": len(transactions),
-                    "transactionsStored": stored_count
-                }
+        # Detect bank type
+        bank_type = _detect_bank("\n".join(p["text"] for p in pages))
+        
+        confident = [p for p in pages if p["confidence"] >= PDF_PAGE_MIN_CONFIDENCE]
+        uncertain = [p for p in pages if p["confidence"] < PDF_PAGE_MIN_CONFIDENCE]
+        
+        deterministic, categorization = await _deterministic_transactions(confident, user_id)
+        
+        # LLM tier: low-confidence pages only, chunk by chunk
+        llm_transactions: List[dict] = []
+        parse_stats: Dict[str, Any] = {"chunks": 0, "failedChunks": 0, "llmCalls": 0, "duplicatesDropped": 0}
+        if uncertain:
+            llm_transactions, parse_stats = await _parse_bank_statement(
+                client, model, uncertain, bank_type
             )
-            
-            # Calculate summary
-            summary = _calculate_statement_summary(transactions)
-            
+            for tx in llm_transactions:
+                tx["tier"] = TIER_LLM
+        
+        transactions = _merge_chunk_results([deterministic, llm_transactions])
+        transactions.sort(key=lambda tx: str(tx.get("date") or ""))
+        parse_stats.update({
+            "pages": len(pages),
+            "tiers": {TIER_DETERMINISTIC: len(confident), TIER_LLM: len(uncertain)},
+            "rowsByTier": {
+                tier: sum(1 for tx in transactions if tx.get("tier") == tier)
+                for tier in (TIER_DETERMINISTIC, TIER_LLM)
+            },
+            "categorization": categorization,
+        })
+        print(f"📄 {filename}: {len(confident)} pages deterministic, {len(uncertain)} via LLM")
+        
+        if not transactions:
             return {
                 "success": True,
+                "transactions": [],
+                "message": "No transactions found in statement",
+                "parseStats": parse_stats
+            }
+        
+        # Store transactions: batched, deduplicated by row occurrence, failed items retried
+        for tx, key in zip(transactions, _dedup_keys(transactions)):
+            tx["userId"] = user_id
+            tx["source"] = "pdf_statement"
+            tx["filename"] = filename
+            tx["dedupKey"] = key
+        write = await backend_bulk_write(
+            user_id,
+            "pdf_statement",
+            [(tx["dedupKey"], tx) for tx in transactions],
+            legacy_path="/transactions/from-statement"
+        )
+        stored_count = write["created"]
+        duplicate_count = write["duplicates"]
+        if write["failed"]:
+            print(f"⚠️ {write['failed']} PDF transactions could not be stored")
+        
+        # Store memory
+        await astore_memory_entry(
+            user_id,
+            f"Parsed bank statement: {filename}, found {len(transactions)} transactions, stored {stored_count}",
+            "pdf_parse",
+            {
+                "filename": filename,
                 "bank": bank_type,
-                "transactions": transactions,
-                "transactionCount": len(transactions),
-                "storedCount": stored_count,
-                "summary": summary,
-                "filename": filename
+                "date": datetime.now().isoformat(),
+                "transactionsFound": len(transactions),
+                "transactionsStored": stored_count,
+                "pagesDeterministic": len(confident),
+                "pagesLlm": len(uncertain)
             }
-            
-        finally:
-            # Cleanup temp file
-            os.unlink(tmp_path)
+        )
+        
+        # Calculate summary
+        summary = _calculate_statement_summary(transactions)
+        
+        return {
+            "success": True,
+            "bank": bank_type,
+            "transactions": transactions,
+            "transactionCount": len(transactions),
+            "storedCount": stored_count,
+            "duplicateCount": duplicate_count,
+            "summary": summary,
+            "parseStats": parse_stats,
+            "storeStats": {k: v for k, v in write.items() if k != "results"},
+            "storeResults": write["results"],
+            "filename": filename
+        }
         
-    except ImportError:
-        return {"success": False, "error": "PDF parsing not available. Install pdfplumber."}
     except Exception as e:
         print(f"❌ PDF parse error: {e}")
         import traceback
@@ -121,6 +137,41 @@ async def handle_pdf_parse(
         return {"success": False, "error": str(e)}
 
 
+def _analyze_pages(file_content: bytes) -> List[Dict[str, Any]]:
+    """All pages' deterministic results, numbered from 1 (blocking)"""
+    return [{**page, "number": index + 1} for index, page in iter_parsed_pages(file_content)]
+
+
+async def _deterministic_transactions(
+    pages: List[Dict[str, Any]],
+    user_id: Optional[str] = None
+) -> Tuple[List[dict], Dict[str, Any]]:
+    """
+    Rows of confidently parsed pages in the LLM tier's transaction shape.
+    Type and amount come from the statement columns; only the category is
+    looked up (the user's labels / cache / kNN / batched LLM via classify_batch).
+    """
+    rows = [row for page in pages for row in page["rows"]]
+    if not rows:
+        return [], {}
+    batch = await classify_batch([row["text"] for row in rows], user_id=user_id)
+    transactions = [
+        {
+            "date": row["date"],
+            "type": row["type"],
+            "amount": row["amount"],
+            "category": classification.get("category", "Other"),
+            "description": row["text"],
+            "reference": None,
+            "balance": None,
+            "hash": row["hash"],
+            "tier": TIER_DETERMINISTIC,
+        }
+        for row, classification in zip(rows, batch["results"])
+    ]
+    return transactions, {k: v for k, v in batch.items() if k != "results"}
+
+
 def _detect_bank(text: str) -> str:
     """Detect bank from statement text"""
     
@@ -152,59 +203,120 @@ def _detect_bank(text: str) -> str:
     return "unknown"
 
 
-async def _parse_bank_statement(
-    client,
-    model: str,
-    text: str,
-    tables: List,
-    bank_type: str
-) -> List[dict]:
-    """Parse transactions from bank statement using AI"""
-    
-    # Truncate text if too long
-    max_text_len = 15000
-    if len(text) > max_text_len:
-        text = text[:max_text_len] + "\n... (truncated)"
-    
-    # Format tables
-    table_text = ""
-    if tables:
-        for i, table in enumerate(tables[:5]):
-            table_text += f"\nTable {i+1}:\n"
-            for row in table[:20]:
-                table_text += " | ".join([str(cell or "") for cell in row]) + "\n"
-    
-    prompt = f"""Parse this {bank_type.upper()} bank statement and extract ALL transactions.
-
-STATEMENT TEXT:
-{text}
-
-{f"TABLES:{table_text}" if table_text else ""}
-
-Return JSON array of transactions:
-[
-  {{
-    "date": "YYYY-MM-DD",
-    "type": "income | expense | transfer",
-    "amount": number (positive),
-    "category": "category name",
-    "description": "transaction description",
-    "reference": "reference number if available",
-    "balance": number or null
-  }}
-]
+def _page_units(page: Dict[str, Any], number: int) -> Tuple[Optional[str], List[Tuple[str, str]]]:
+    """
+    A page as (header, [(line id, line)]). Pages with tables are sent as table
+    rows (the header row is repeated in every chunk the table is split into);
+    other pages as their text lines. Line ids ("page.line") are positions in
+    the statement, so they are the same every time it is parsed.
+    """
+    rows = [row for table in page["tables"] for row in table if row]
+    if rows:
+        lines = [" | ".join(str(cell or "") for cell in row) for row in rows]
+        header, lines = lines[0], lines[1:]
+    else:
+        header, lines = None, [line for line in page["text"].split("\n") if line.strip()]
+    return header, [(f"{number}.{index}", line) for index, line in enumerate(lines, start=1)]
+
+
+def _statement_lines(pages: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Line id -> raw statement line, for every line sent to the LLM"""
+    return {
+        line_id: line
+        for number, page in enumerate(pages, start=1)
+        for line_id, line in _page_units(page, page.get("number", number))[1]
+    }
+
+
+def _build_chunks(pages: List[Dict[str, Any]], max_chars: int = PDF_LLM_CHUNK_CHARS) -> List[str]:
+    """
+    Pack pages into prompt-sized chunks without dropping anything.
+    Whole pages are packed together while they fit; a page larger than
+    max_chars is split at row / line boundaries.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+
+    def flush():
+        nonlocal current, size
+        if current:
+            chunks.append("\n".join(current))
+        current, size = [], 0
+
+    for number, page in enumerate(pages, start=1):
+        number = page.get("number", number)
+        header, units = _page_units(page, number)
+        lines = [f"[{line_id}] {line}" for line_id, line in units]
+        if not lines:
+            continue
+        title = f"--- Page {number} ---"
+        block = [title] + ([header] if header else []) + lines
+        block_size = sum(len(line) + 1 for line in block)
+
+        if size + block_size <= max_chars:
+            current.extend(block)
+            size += block_size
+            continue
+
+        flush()
+        if block_size <= max_chars:
+            current, size = block, block_size
+            continue
+
+        # Oversized page: split by lines, repeating the page title and table header
+        prefix = [title] + ([header] if header else [])
+        prefix_size = sum(len(line) + 1 for line in prefix)
+        current, size = list(prefix), prefix_size
+        for line in lines:
+            if size + len(line) + 1 > max_chars and len(current) > len(prefix):
+                flush()
+                current, size = list(prefix), prefix_size
+            current.append(line)
+            size += len(line) + 1
+    flush()
+    return chunks
+
+
+def _statement_prompt(bank_type: str, content: str, part: int, parts: int) -> str:
+    return f"""Parse this {bank_type.upper()} bank statement excerpt (part {part} of {parts}) and extract ALL transactions in it.
+
+STATEMENT EXCERPT:
+{content}
+
+Return a JSON object with the transactions in this excerpt:
+{{
+  "transactions": [
+    {{
+      "date": "YYYY-MM-DD",
+      "type": "income | expense | transfer",
+      "amount": number (positive),
+      "category": "category name",
+      "description": "transaction description",
+      "reference": "reference number if available",
+      "balance": number or null,
+      "line": "id of the statement line it comes from, e.g. 3.12"
+    }}
+  ]
+}}
 
 Rules:
-1. Extract ALL transactions found
+1. Extract ALL transactions found in this excerpt, and only those
 2. Credits/deposits = income, Debits/withdrawals = expense
 3. UPI, NEFT, IMPS are transfers unless merchant is clear
 4. Categorize based on description (Food, Shopping, Bills, Salary, etc.)
 5. Use Indian date format awareness (DD/MM/YYYY)
-6. Return empty array [] if no transactions found"""
+6. Skip opening/closing balance and totals lines
+7. Return {{"transactions": []}} if no transactions found
+8. Each statement line starts with its id in brackets (e.g. [3.12]): put that id in the "line" field"""
 
+
+async def _parse_chunk(client, model: str, prompt: str) -> Optional[List[dict]]:
+    """One chunk through the LLM; None if the call or the JSON failed"""
     try:
         result = await client.chat.completions.create(
             model=model,
+            lane=LANE_BACKGROUND,
             temperature=0.1,
             response_format={"type": "json_object"},
             messages=[
@@ -214,20 +326,120 @@ Rules:
         )
         
         response = json.loads(result.choices[0].message.content.strip())
-        
-        # Handle different response formats
-        if isinstance(response, list):
-            return response
-        elif isinstance(response, dict) and "transactions" in response:
-            return response["transactions"]
-        elif isinstance(response, dict) and len(response) == 0:
-            return []
-        else:
-            return []
-            
     except Exception as e:
         print(f"⚠️ AI parsing error: {e}")
-        return []
+        return None
+
+    # Handle different response formats
+    if isinstance(response, list):
+        transactions = response
+    elif isinstance(response, dict):
+        transactions = response.get("transactions", [])
+    else:
+        return None
+    return [tx for tx in transactions if isinstance(tx, dict)] if isinstance(transactions, list) else None
+
+
+def _transaction_hash(tx: dict) -> str:
+    return tx.get("hash") or hash_row(tx.get("date"), tx.get("description", ""), tx.get("amount"))
+
+
+def _anchor_to_lines(transactions: List[dict], lines: Dict[str, str]) -> List[dict]:
+    """
+    Hash LLM transactions by the statement line they cite (position + raw
+    text), not by the description the model wrote, so re-uploading a statement
+    yields the same hashes. A line cited twice in one chunk is one transaction;
+    rows without a valid line id keep the field-based hash.
+    """
+    anchored: List[dict] = []
+    cited = set()
+    for tx in transactions:
+        line_id = str(tx.get("line") or "").strip("[] ")
+        if line_id in lines:
+            if line_id in cited:
+                continue
+            cited.add(line_id)
+            tx = {**tx, "hash": hash_row(line_id, lines[line_id], "line")}
+        anchored.append(tx)
+    return anchored
+
+
+def _merge_chunk_results(results: List[List[dict]]) -> List[dict]:
+    """
+    Concatenate chunk results in statement order, dropping rows repeated
+    across chunks (same row hash). Repeats within one chunk are kept: two
+    identical payments on the same day are real transactions.
+    """
+    merged: List[dict] = []
+    kept: Dict[str, int] = {}
+    for transactions in results:
+        seen: Dict[str, int] = {}
+        for tx in transactions:
+            row_hash = _transaction_hash(tx)
+            seen[row_hash] = seen.get(row_hash, 0) + 1
+            if seen[row_hash] > kept.get(row_hash, 0):
+                kept[row_hash] = seen[row_hash]
+                merged.append({**tx, "hash": row_hash})
+    return merged
+
+
+def _dedup_keys(transactions: List[dict]) -> List[str]:
+    """
+    Backend dedup key per transaction: row hash plus its occurrence number in
+    the statement. Identical same-day rows get distinct keys (both are stored),
+    while re-uploading the same statement yields the same keys (nothing is
+    stored twice).
+    """
+    occurrences: Dict[str, int] = {}
+    keys = []
+    for tx in transactions:
+        occurrences[tx["hash"]] = occurrences.get(tx["hash"], 0) + 1
+        keys.append(f"{tx['hash']}:{occurrences[tx['hash']]}")
+    return keys
+
+
+async def _parse_bank_statement(
+    client,
+    model: str,
+    pages: List[Dict[str, Any]],
+    bank_type: str
+) -> Tuple[List[dict], Dict[str, Any]]:
+    """
+    Parse transactions from bank statement pages using AI.
+
+    The statement is split into chunks at page / row boundaries, chunks are
+    parsed concurrently (at most PDF_LLM_CONCURRENCY at a time, failed chunks
+    retried) and the results merged in page order, deduplicated by row hash.
+    """
+    chunks = _build_chunks(pages)
+    semaphore = asyncio.Semaphore(max(1, PDF_LLM_CONCURRENCY))
+    calls = 0
+
+    async def run(index: int, content: str) -> Optional[List[dict]]:
+        nonlocal calls
+        prompt = _statement_prompt(bank_type, content, index + 1, len(chunks))
+        for _ in range(PDF_LLM_CHUNK_RETRIES + 1):
+            async with semaphore:
+                calls += 1
+                transactions = await _parse_chunk(client, model, prompt)
+            if transactions is not None:
+                return transactions
+        return None
+
+    results = await asyncio.gather(*(run(i, content) for i, content in enumerate(chunks)))
+    failed = sum(result is None for result in results)
+    if failed:
+        print(f"⚠️ {failed}/{len(chunks)} statement chunks could not be parsed")
+
+    lines = _statement_lines(pages)
+    found = [_anchor_to_lines(result or [], lines) for result in results]
+    transactions = _merge_chunk_results(found)
+    return transactions, {
+        "chunks": len(chunks),
+        "failedChunks": failed,
+        "llmCalls": calls,
+        "duplicatesDropped": sum(map(len, found)) - len(transactions),
+    }
 
 
 def _calculate_statement_summary(transactions: List[dict]) -> dict:
@@ -7,9 +7,10 @@ from datetime import datetime
 from typing import Any, Dict
 
 from schemas import MarketDataRequest
-from tools import tavily_search, store_memory_entry
+from tools import tavily_search, astore_memory_entry
 from prompts import build_report_prompt
-from node_client import get_user_stats_tool
+from async_node_client import get_user_stats_tool
+from services.llm_gateway import LANE_STANDARD
 
 
 async def handle_report_request(data: MarketDataRequest, client, model: str) -> Dict[str, Any]:
@@ -19,7 +20,7 @@ async def handle_report_request(data: MarketDataRequest, client, model: str) ->
     timeframe = data.timeframe or "weekly"
     
     # Fetch user financial data
-    fresh_stats = get_user_stats_tool(user_id)
+    fresh_stats = await get_user_stats_tool(user_id)
     if not fresh_stats:
         return {"success": False, "error": "Could not fetch user financial data"}
     
@@ -53,6 +54,7 @@ async def handle_report_request(data: MarketDataRequest, client, model: str) ->
     try:
         result = await client.chat.completions.create(
             model=model,
+            lane=LANE_STANDARD,
             temperature=0.3,
             response_format={"type": "json_object"},
             messages=[
@@ -66,7 +68,7 @@ async def handle_report_request(data: MarketDataRequest, client, model: str) ->
         report["timeframe"] = timeframe
         
         # Store memory
-        store_memory_entry(
+        await astore_memory_entry(
             user_id,
             f"Generated {timeframe} financial report on {datetime.now().strftime('%Y-%m-%d')}",
             "report_history",
@@ -6,12 +6,15 @@ from .requests import (
     MemoryRequest,
     QueryRequest,
     Input,
+    BatchInput,
+    ClassificationFeedback,
     InsightRequest,
     ChatMessage,
     ChatRequest,
     AgentPlan,
     ExecuteRequest,
     MarketDataRequest,
+    MarketBatchRequest,
     DailyMentorRequest,
 )
 
@@ -19,11 +22,14 @@ __all__ = [
     "MemoryRequest",
     "QueryRequest",
     "Input",
+    "BatchInput",
+    "ClassificationFeedback",
     "InsightRequest",
     "ChatMessage",
     "ChatRequest",
     "AgentPlan",
     "ExecuteRequest",
     "MarketDataRequest",
+    "MarketBatchRequest",
     "DailyMentorRequest",
 ]
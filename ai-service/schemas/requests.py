@@ -26,6 +26,22 @@ class Input(BaseModel):
     """Request model for transaction classification"""
     amount: int
     description: str
+    userId: Optional[str] = None
+
+
+class BatchInput(BaseModel):
+    """Request model for batch transaction classification"""
+    items: List[Input]
+    userId: Optional[str] = None
+
+
+class ClassificationFeedback(BaseModel):
+    """Request model for a user-confirmed (or corrected) classification"""
+    userId: str
+    description: str
+    type: str
+    subtype: str
+    category: str
 
 
 class InsightRequest(BaseModel):
@@ -80,6 +96,11 @@ class MarketDataRequest(BaseModel):
     symbol: str
 
 
+class MarketBatchRequest(BaseModel):
+    """Request model for batch market data"""
+    symbols: List[str]
+
+
 class DailyMentorRequest(BaseModel):
     """Request model for daily mentor generation"""
     userId: str
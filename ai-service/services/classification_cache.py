@@ -0,0 +1,240 @@
+"""
+Persistent transaction classification cache
+SQLite table keyed by a normalized description fingerprint, fronted by an
+in-process LRU, so repeat merchants ("Swiggy order", "UPI/ZOMATO/...") skip
+the Groq round-trip and survive restarts.
+
+The fingerprint drops reference numbers, amounts and punctuation, so
+"UPI/ZOMATO/412345678901/Rs 250" and "UPI/ZOMATO/498765432109/Rs 1,200"
+share one entry. Only type / subtype / category are cached; the note always
+comes from the current description.
+
+Users' own labels (/classify/feedback) live in a second table keyed by
+(user, fingerprint) and are never evicted. The ids of users with labels are
+kept in memory, so a lookup for anyone else never touches SQLite.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config import (
+    CLASSIFICATION_CACHE_PATH, CLASSIFICATION_CACHE_MAX_ENTRIES, CLASSIFICATION_CACHE_MEMORY_SIZE
+)
+from utils.cache import TTLCache
+
+_SEPARATORS = re.compile(r"[/\\|_:;,.*#@=-]+")
+_NON_WORD = re.compile(r"[^a-z0-9&]+")
+# Currency markers and labels that only introduce the (already stripped) numbers
+_NOISE_WORDS = {"rs", "inr", "ref", "refno", "no", "id", "txn", "txnid", "utr", "rrn"}
+# Rails / connectives that say nothing about the merchant on their own
+_GENERIC_WORDS = {"upi", "pos", "neft", "imps", "rtgs", "atm", "ach", "nach", "ecs", "payment", "transfer",
+                  "to", "from", "by", "via", "at", "the", "of", "dr", "cr", "debit", "credit", "p2a", "p2m",
+                  "paid", "sent", "received"}
+_FINGERPRINT_MAX_CHARS = 200
+
+CACHED_FIELDS = ("type", "subtype", "category")
+
+
+def description_fingerprint(description: str) -> str:
+    """
+    Normalized cache key for a transaction description.
+    Returns '' (not cacheable) when nothing merchant-specific is left.
+    """
+    text = _NON_WORD.sub(" ", _SEPARATORS.sub(" ", (description or "").lower()))
+    words = [w for w in text.split() if w not in _NOISE_WORDS and not _is_number_like(w)]
+    if all(w in _GENERIC_WORDS for w in words):
+        return ""
+    return " ".join(words)[:_FINGERPRINT_MAX_CHARS]
+
+
+def _is_number_like(token: str) -> bool:
+    """Reference numbers, amounts, dates, masked card/account tails ('1mg', 'shop1' survive)"""
+    digits = sum(c.isdigit() for c in token)
+    return digits >= 4 or digits >= len(token) - digits
+
+
+class ClassificationCache:
+    """SQLite-backed LRU of fingerprint -> {type, subtype, category}"""
+
+    def __init__(
+        self,
+        path: str = CLASSIFICATION_CACHE_PATH,
+        max_entries: int = CLASSIFICATION_CACHE_MAX_ENTRIES,
+        memory_size: int = CLASSIFICATION_CACHE_MEMORY_SIZE,
+    ):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        # Hot entries never hit SQLite; the TTL only bounds how stale a deleted row can be
+        self._memory = TTLCache(maxsize=memory_size, ttl=3600, name="classification_memory")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " result TEXT NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_classifications_last_used ON classifications(last_used)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_labels ("
+            " user_id TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (user_id, fingerprint))"
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        self._labelled_users = {row[0] for row in self._conn.execute("SELECT DISTINCT user_id FROM user_labels")}
+        # Memory hits don't touch SQLite; their recency is written back before evicting
+        self._touched: Dict[str, float] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.user_label_hits = 0
+
+    def get(self, description: str) -> Optional[Dict[str, Any]]:
+        """Cached classification for a description, or None"""
+        fingerprint = description_fingerprint(description)
+        if not fingerprint:
+            return None
+
+        result = self._memory.get(fingerprint)
+        if result is None:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT result FROM classifications WHERE fingerprint = ?", (fingerprint,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE classifications SET hits = hits + 1, last_used = ? WHERE fingerprint = ?",
+                        (time.time(), fingerprint)
+                    )
+            if row is None:
+                self.misses += 1
+                return None
+            result = json.loads(row[0])
+            self._memory.set(fingerprint, result)
+            self.disk_hits += 1
+        else:
+            self._touched[fingerprint] = time.time()
+
+        self.hits += 1
+        return dict(result)
+
+    def set(self, description: str, classification: Dict[str, Any]) -> None:
+        """Store the cacheable fields of a successful classification"""
+        fingerprint = description_fingerprint(description)
+        if not fingerprint:
+            return
+        result = {field: classification.get(field) for field in CACHED_FIELDS}
+        now = time.time()
+        with self._lock:
+            existed = self._conn.execute(
+                "SELECT 1 FROM classifications WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone() is not None
+            self._conn.execute(
+                "INSERT INTO classifications (fingerprint, result, hits, created_at, last_used)"
+                " VALUES (?, ?, 0, ?, ?)"
+                " ON CONFLICT(fingerprint) DO UPDATE SET result = excluded.result, last_used = excluded.last_used",
+                (fingerprint, json.dumps(result), now, now)
+            )
+            if not existed:
+                self._size += 1
+                self._evict()
+        self._memory.set(fingerprint, result)
+
+    def get_user_label(self, user_id: Optional[str], description: str) -> Optional[Dict[str, Any]]:
+        """The user's own label for a description's fingerprint, or None"""
+        if not user_id or user_id not in self._labelled_users:
+            return None
+        fingerprint = description_fingerprint(description)
+        if not fingerprint:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM user_labels WHERE user_id = ? AND fingerprint = ?", (user_id, fingerprint)
+            ).fetchone()
+        if row is None:
+            return None
+        self.user_label_hits += 1
+        return json.loads(row[0])
+
+    def set_user_label(self, user_id: str, description: str, classification: Dict[str, Any]) -> bool:
+        """Store a user's confirmed / corrected label; False if the description has no fingerprint"""
+        fingerprint = description_fingerprint(description)
+        if not user_id or not fingerprint:
+            return False
+        result = {field: classification.get(field) for field in CACHED_FIELDS}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO user_labels (user_id, fingerprint, result, updated_at) VALUES (?, ?, ?, ?)",
+                (user_id, fingerprint, json.dumps(result), time.time())
+            )
+            self._labelled_users.add(user_id)
+        return True
+
+    def _evict(self) -> None:
+        """Drop least recently used rows once over capacity (10% at a time to amortize)"""
+        count = self._size
+        if count <= self.max_entries:
+            return
+        touched, self._touched = self._touched, {}
+        self._conn.executemany(
+            "UPDATE classifications SET hits = hits + 1, last_used = ? WHERE fingerprint = ?",
+            [(used, fingerprint) for fingerprint, used in touched.items()]
+        )
+        excess = count - self.max_entries + max(1, self.max_entries // 10)
+        cursor = self._conn.execute(
+            "DELETE FROM classifications WHERE fingerprint IN ("
+            " SELECT fingerprint FROM classifications ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self.evictions += cursor.rowcount
+        self._size -= cursor.rowcount
+        self._memory.clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the metrics endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            "name": "classification_cache",
+            "size": len(self),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "diskHits": self.disk_hits,
+            "memoryHits": self.hits - self.disk_hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "labelledUsers": len(self._labelled_users),
+            "userLabelHits": self.user_label_hits,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+classification_cache: Optional[ClassificationCache] = None
+
+
+def get_classification_cache() -> ClassificationCache:
+    """Get the shared classification cache"""
+    global classification_cache
+    if classification_cache is None:
+        classification_cache = ClassificationCache()
+    return classification_cache
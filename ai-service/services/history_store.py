@@ -0,0 +1,209 @@
+"""
+Persistent on-disk OHLC history store
+One .npy file of daily bars per symbol, served through memory-mapped arrays.
+
+Refreshing only downloads the days after the last stored bar, and a symbol
+is checked against the network at most once per refresh interval (the file
+mtime records the last check, so this survives restarts). When yfinance is
+unreachable the store keeps serving whatever is already on disk.
+
+Open maps are keyed by the file's inode / size / mtime, so a file rewritten
+by another worker process is reopened on the next read.
+"""
+
+import os
+import re
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import yfinance as yf
+
+from config import MARKET_HISTORY_DIR, MARKET_HISTORY_REFRESH_INTERVAL, MARKET_HISTORY_BOOTSTRAP_DAYS
+
+BAR_DTYPE = np.dtype([
+    ("date", "datetime64[D]"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "f8"),
+])
+
+_EMPTY = np.empty(0, dtype=BAR_DTYPE)
+
+
+class HistoryStore:
+    """Per-symbol daily bar files with append-only refresh"""
+
+    def __init__(
+        self,
+        root: str = MARKET_HISTORY_DIR,
+        refresh_interval: float = MARKET_HISTORY_REFRESH_INTERVAL,
+        bootstrap_days: int = MARKET_HISTORY_BOOTSTRAP_DAYS,
+    ):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self.bootstrap_days = bootstrap_days
+        self._lock = threading.Lock()
+        self._mmaps: Dict[str, Tuple[Tuple[int, int, int], np.ndarray]] = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    # =========================
+    # READS
+    # =========================
+
+    def _path(self, symbol: str) -> str:
+        safe = re.sub(r"[^A-Z0-9._^=-]", "_", symbol.upper())
+        return os.path.join(self.root, f"{safe}.npy")
+
+    def load(self, symbol: str) -> np.ndarray:
+        """Memory-mapped bars for a symbol (empty array if none stored)"""
+        symbol = symbol.upper()
+        path = self._path(symbol)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._mmaps.pop(symbol, None)
+            return _EMPTY
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = self._mmaps.get(symbol)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        bars = np.load(path, mmap_mode="r")
+        self._mmaps[symbol] = (signature, bars)
+        return bars
+
+    def chart_data(self, symbol: str, days: int = 30, refresh: bool = True) -> List[Dict[str, Any]]:
+        """
+        chartData points ({date, price}) for the last `days` calendar days.
+        Refreshes from the network only when the stored bars are stale.
+        """
+        if refresh and self.is_stale(symbol):
+            self.refresh([symbol])
+        bars = self.load(symbol)
+        if not len(bars):
+            return []
+        cutoff = np.datetime64(date.today() - timedelta(days=days), "D")
+        start = int(np.searchsorted(bars["date"], cutoff, side="left"))
+        window = bars[start:]
+        return [
+            {"date": str(d), "price": float(c)}
+            for d, c in zip(window["date"], window["close"])
+        ]
+
+    def is_stale(self, symbol: str) -> bool:
+        """True if the symbol has never been stored or was last checked over an interval ago"""
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return True
+        return time.time() - os.path.getmtime(path) > self.refresh_interval
+
+    # =========================
+    # WRITES
+    # =========================
+
+    def refresh(self, symbols: Iterable[str]) -> Dict[str, int]:
+        """
+        Append missing daily bars for the given symbols with one yf.download call.
+        Returns {symbol: bars appended}; on network failure nothing changes.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        if not symbols:
+            return {}
+
+        today = date.today()
+        starts: Dict[str, date] = {}
+        for symbol in symbols:
+            bars = self.load(symbol)
+            if len(bars):
+                starts[symbol] = bars["date"][-1].astype(object) + timedelta(days=1)
+            else:
+                starts[symbol] = today - timedelta(days=self.bootstrap_days)
+
+        appended: Dict[str, int] = {s: 0 for s in symbols}
+        to_fetch = [s for s in symbols if starts[s] <= today]
+        if to_fetch:
+            try:
+                frame = yf.download(
+                    to_fetch,
+                    start=min(starts[s] for s in to_fetch),
+                    end=today + timedelta(days=1),
+                    interval="1d",
+                    group_by="ticker",
+                    threads=True,
+                    progress=False,
+                )
+            except Exception as e:
+                # Offline: keep serving stored bars and retry after the refresh interval
+                print(f"⚠️ [history_store] Download failed, serving cached bars: {e}")
+                to_fetch, frame = [], None
+
+            for symbol in to_fetch:
+                new_bars = _frame_to_bars(frame, symbol, len(to_fetch))
+                new_bars = new_bars[new_bars["date"] >= np.datetime64(starts[symbol], "D")]
+                # Today's bar is still forming: keep it out of the permanent store
+                new_bars = new_bars[new_bars["date"] < np.datetime64(today, "D")]
+                appended[symbol] = self._append(symbol, new_bars)
+
+        for symbol in symbols:
+            self._touch(symbol)
+        return appended
+
+    def _append(self, symbol: str, new_bars: np.ndarray) -> int:
+        if not len(new_bars):
+            return 0
+        with self._lock:
+            current = np.array(self.load(symbol))
+            merged = np.concatenate([current, new_bars]) if len(current) else new_bars
+            path = self._path(symbol)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, merged)
+            os.replace(tmp_path, path)
+            self._mmaps.pop(symbol, None)
+        return len(new_bars)
+
+    def _touch(self, symbol: str) -> None:
+        path = self._path(symbol)
+        if os.path.exists(path):
+            os.utime(path, None)
+        else:
+            # Record the check even for symbols without data yet
+            with self._lock:
+                np.save(path, _EMPTY)
+
+
+def _frame_to_bars(frame, symbol: str, requested: int) -> np.ndarray:
+    """Convert one symbol's part of a yf.download frame into BAR_DTYPE rows"""
+    if frame is None or frame.empty:
+        return _EMPTY
+    columns = frame.columns
+    if getattr(columns, "nlevels", 1) > 1:
+        if symbol not in columns.get_level_values(0):
+            return _EMPTY
+        sub = frame[symbol]
+    elif requested == 1:
+        sub = frame
+    else:
+        return _EMPTY
+
+    sub = sub.dropna(subset=["Close"])
+    bars = np.empty(len(sub), dtype=BAR_DTYPE)
+    bars["date"] = np.array([ts.strftime("%Y-%m-%d") for ts in sub.index], dtype="datetime64[D]")
+    for field, column in (("open", "Open"), ("high", "High"), ("low", "Low"), ("close", "Close"), ("volume", "Volume")):
+        bars[field] = sub[column].to_numpy(dtype="f8") if column in sub.columns else np.nan
+    return bars
+
+
+history_store: Optional[HistoryStore] = None
+
+
+def get_history_store() -> HistoryStore:
+    """Get the shared history store"""
+    global history_store
+    if history_store is None:
+        history_store = HistoryStore()
+    return history_store
@@ -0,0 +1,233 @@
+"""
+Persistent AI insight cache
+SQLite table of generated /ai/insights reports keyed by (user, fingerprint),
+so an alert arriving while the user's financial state is effectively
+unchanged reuses the last reports instead of another 70B call.
+
+The fingerprint is a SHA-256 of a canonical form of the prompt inputs:
+dict keys sorted, ids / timestamps dropped, ISO datetimes cut to the date and
+numbers quantized to INSIGHT_CACHE_REL_TOLERANCE (relative) above an
+absolute floor of INSIGHT_CACHE_ABS_TOLERANCE. Entries expire after
+INSIGHT_CACHE_TTL seconds, and invalidate_user() drops a user's entries
+(e.g. after they edit transactions or goals).
+
+Concurrent identical requests share one generation (single-flight). An
+invalidation bumps the user's epoch, so a generation already in flight is
+neither stored nor joined by requests made after it.
+"""
+
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import (
+    INSIGHT_CACHE_ENABLED, INSIGHT_CACHE_PATH, INSIGHT_CACHE_TTL, INSIGHT_CACHE_MAX_ENTRIES,
+    INSIGHT_CACHE_REL_TOLERANCE, INSIGHT_CACHE_ABS_TOLERANCE,
+)
+from utils.cache import SingleFlight
+
+# Identifiers and bookkeeping that never change what the model is told
+_IGNORED_KEYS = {"_id", "id", "userId", "__v", "hash", "createdAt", "updatedAt", "timestamp"}
+_ISO_DATETIME = re.compile(r"^(\d{4}-\d{2}-\d{2})T[\d:.]+(Z|[+-]\d{2}:?\d{2})?$")
+_LOG_STEP = math.log1p(max(INSIGHT_CACHE_REL_TOLERANCE, 1e-9))
+
+
+def quantize(value: float) -> int:
+    """Bucket of a number: values within the relative tolerance (mostly) share one"""
+    if abs(value) < INSIGHT_CACHE_ABS_TOLERANCE:
+        return 0
+    bucket = round(math.log(abs(value) / INSIGHT_CACHE_ABS_TOLERANCE) / _LOG_STEP) + 1
+    return bucket if value > 0 else -bucket
+
+
+def canonicalize(value: Any) -> Any:
+    """JSON-serializable canonical form used for fingerprints"""
+    if isinstance(value, dict):
+        return {
+            str(key): canonicalize(item)
+            for key, item in sorted(value.items(), key=lambda kv: str(kv[0]))
+            if key not in _IGNORED_KEYS and item is not None
+        }
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(item) for item in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return ["#", quantize(float(value))] if math.isfinite(value) else str(value)
+    text = " ".join(str(value).split())
+    match = _ISO_DATETIME.match(text)
+    return match.group(1) if match else text
+
+
+def fingerprint(inputs: Dict[str, Any]) -> str:
+    """Stable hash of the canonical inputs"""
+    canonical = json.dumps(canonicalize(inputs), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class InsightCache:
+    """SQLite-backed TTL cache of (user, fingerprint) -> fullInsights"""
+
+    def __init__(
+        self,
+        path: str = INSIGHT_CACHE_PATH,
+        ttl: float = INSIGHT_CACHE_TTL,
+        max_entries: int = INSIGHT_CACHE_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS insights ("
+            " user_id TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (user_id, fingerprint))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_insights_expires_at ON insights(expires_at)")
+        self._size = self._conn.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+        self._epochs: Dict[str, int] = {}
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Cached insights for (user, fingerprint), or None if missing / expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM insights WHERE user_id = ? AND fingerprint = ? AND expires_at > ?",
+                (user_id, key, now)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE insights SET hits = hits + 1 WHERE user_id = ? AND fingerprint = ?", (user_id, key)
+                )
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, user_id: str, key: str, insights: Dict[str, Any], epoch: Optional[int] = None) -> bool:
+        """Store insights; skipped (False) if the user was invalidated since `epoch`"""
+        now = time.time()
+        with self._lock:
+            if epoch is not None and self._epochs.get(user_id, 0) != epoch:
+                return False
+            existed = self._conn.execute(
+                "SELECT 1 FROM insights WHERE user_id = ? AND fingerprint = ?", (user_id, key)
+            ).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO insights (user_id, fingerprint, result, hits, created_at, expires_at)"
+                " VALUES (?, ?, ?, 0, ?, ?)",
+                (user_id, key, json.dumps(insights, ensure_ascii=False, default=str), now, now + self.ttl)
+            )
+            self.stores += 1
+            if not existed:
+                self._size += 1
+                self._evict(now)
+        return True
+
+    def _evict(self, now: float) -> None:
+        """Drop expired rows, then the oldest ones, once over capacity (10% at a time to amortize)"""
+        if self._size <= self.max_entries:
+            return
+        removed = self._conn.execute("DELETE FROM insights WHERE expires_at <= ?", (now,)).rowcount
+        excess = self._size - removed - self.max_entries
+        if excess > 0:
+            excess += max(1, self.max_entries // 10)
+            removed += self._conn.execute(
+                "DELETE FROM insights WHERE rowid IN ("
+                " SELECT rowid FROM insights ORDER BY created_at ASC LIMIT ?)",
+                (excess,)
+            ).rowcount
+        self.evictions += removed
+        self._size = self._conn.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop every cached insight of a user; returns how many entries were removed"""
+        with self._lock:
+            self._epochs[user_id] = self._epochs.get(user_id, 0) + 1
+            removed = self._conn.execute("DELETE FROM insights WHERE user_id = ?", (user_id,)).rowcount
+            self._size -= removed
+            self.invalidations += 1
+        return removed
+
+    async def get_or_generate(
+        self,
+        user_id: str,
+        key: str,
+        generate: Callable[[], Awaitable[Dict[str, Any]]],
+        cacheable: Callable[[Dict[str, Any]], bool],
+    ) -> Dict[str, Any]:
+        """
+        Cached result {"fullInsights": ..., "cached": True}, or the result of
+        generate(). Concurrent callers with the same key share one generate();
+        its fullInsights are stored when cacheable(result).
+        """
+        cached = self.get(user_id, key)
+        if cached is not None:
+            return {"success": True, "fullInsights": cached, "updatedAt": cached.get("updatedAt"), "cached": True}
+
+        with self._lock:
+            epoch = self._epochs.get(user_id, 0)
+
+        async def run() -> Dict[str, Any]:
+            result = await generate()
+            if cacheable(result):
+                self.set(user_id, key, result["fullInsights"], epoch)
+            return result
+
+        return await self._flights.do((user_id, key, epoch), run)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the metrics endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            "name": "insight_cache",
+            "enabled": INSIGHT_CACHE_ENABLED,
+            "size": len(self),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "singleFlight": self._flights.stats(),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+insight_cache: Optional[InsightCache] = None
+
+
+def get_insight_cache() -> InsightCache:
+    """Get the shared insight cache"""
+    global insight_cache
+    if insight_cache is None:
+        insight_cache = InsightCache()
+    return insight_cache
@@ -0,0 +1,169 @@
+"""
+Local kNN transaction categorizer
+Embeds transaction descriptions with the service's MiniLM model and votes
+over the nearest previously classified descriptions, so confident matches
+never reach Groq.
+
+The index is a cosine-space Chroma collection next to the memory store.
+Entries are either global (learned from LLM classifications) or per user
+(explicit confirmations / corrections via /classify/feedback); user entries
+carry more weight in the vote. Entry ids come from the description
+fingerprint, so re-learning a merchant updates it instead of growing the index.
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from config import (
+    KNN_CATEGORIZER_ENABLED, KNN_NEIGHBORS, KNN_MIN_SIMILARITY, KNN_MIN_AGREEMENT, KNN_USER_WEIGHT
+)
+from services.classification_cache import description_fingerprint
+from tools.memory import chroma_client, model, run_in_embedding_executor
+
+GLOBAL_SCOPE = "__global__"
+LABEL_FIELDS = ("type", "subtype", "category")
+
+label_collection = chroma_client.get_or_create_collection(
+    name="transaction_labels",
+    metadata={"hnsw:space": "cosine"},
+)
+
+knn_stats = {"served": 0, "deferred": 0, "learned": 0}
+# Strong references to in-flight background learns (the loop only keeps weak ones)
+_background_learns: Set[asyncio.Task] = set()
+
+
+def _entry_id(scope: str, fingerprint: str) -> str:
+    return f"{scope}_{hashlib.sha1(fingerprint.encode()).hexdigest()[:16]}"
+
+
+def _vote(neighbors: List[Tuple[float, Dict[str, Any]]], user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Similarity-weighted vote; None unless the nearest match and the agreement are both strong"""
+    if not neighbors or max(similarity for similarity, _ in neighbors) < KNN_MIN_SIMILARITY:
+        return None
+
+    scores: Dict[Tuple, float] = {}
+    total = 0.0
+    for similarity, meta in neighbors:
+        if similarity <= 0:
+            continue
+        weight = similarity * (KNN_USER_WEIGHT if user_id and meta.get("userId") == user_id else 1.0)
+        label = tuple(meta.get(field) for field in LABEL_FIELDS)
+        scores[label] = scores.get(label, 0.0) + weight
+        total += weight
+    if not total:
+        return None
+
+    label, score = max(scores.items(), key=lambda item: item[1])
+    confidence = score / total
+    if confidence < KNN_MIN_AGREEMENT:
+        return None
+    return {**dict(zip(LABEL_FIELDS, label)), "confidence": round(confidence, 3)}
+
+
+def _categorize_sync(texts: Sequence[str], user_id: Optional[str]) -> List[Optional[Dict[str, Any]]]:
+    results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    if not label_collection.count():
+        return results
+
+    fingerprints = [description_fingerprint(t) for t in texts]
+    positions = [i for i, fp in enumerate(fingerprints) if fp]
+    if not positions:
+        return results
+
+    embeddings = model.encode([fingerprints[i] for i in positions], normalize_embeddings=True).tolist()
+    scopes = [GLOBAL_SCOPE, user_id] if user_id else [GLOBAL_SCOPE]
+    response = label_collection.query(
+        query_embeddings=embeddings,
+        n_results=min(KNN_NEIGHBORS, label_collection.count()),
+        where={"userId": {"$in": scopes}},
+        include=["metadatas", "distances"],
+    )
+    for row, position in enumerate(positions):
+        neighbors = [
+            (1.0 - distance, meta)
+            for distance, meta in zip(response["distances"][row], response["metadatas"][row])
+        ]
+        results[position] = _vote(neighbors, user_id)
+    return results
+
+
+async def categorize_locally(
+    texts: Sequence[str],
+    user_id: Optional[str] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    kNN classification for each text: {type, subtype, category, confidence}
+    when confident, None to defer to the LLM. Never raises.
+    """
+    if not KNN_CATEGORIZER_ENABLED or not texts:
+        return [None] * len(texts)
+    try:
+        results = await run_in_embedding_executor(_categorize_sync, list(texts), user_id)
+    except Exception as e:
+        print(f"⚠️ kNN categorizer unavailable, deferring to LLM: {e}")
+        return [None] * len(texts)
+    served = sum(r is not None for r in results)
+    knn_stats["served"] += served
+    knn_stats["deferred"] += len(results) - served
+    return results
+
+
+def _learn_sync(items: Sequence[Tuple[str, Dict[str, Any]]], scope: str, source: str) -> int:
+    by_id: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    for text, classification in items:
+        fingerprint = description_fingerprint(text)
+        if fingerprint and all(classification.get(field) for field in LABEL_FIELDS):
+            by_id[_entry_id(scope, fingerprint)] = (fingerprint, classification)
+    if not by_id:
+        return 0
+
+    ids = list(by_id)
+    documents = [by_id[i][0] for i in ids]
+    label_collection.upsert(
+        ids=ids,
+        documents=documents,
+        embeddings=model.encode(documents, normalize_embeddings=True).tolist(),
+        metadatas=[
+            {"userId": scope, "source": source, **{f: str(by_id[i][1][f]) for f in LABEL_FIELDS}}
+            for i in ids
+        ],
+    )
+    return len(ids)
+
+
+async def learn_classifications(
+    items: Sequence[Tuple[str, Dict[str, Any]]],
+    user_id: Optional[str] = None,
+    source: str = "llm",
+) -> int:
+    """Add (description, classification) pairs to the index (global unless user_id is given)"""
+    if not KNN_CATEGORIZER_ENABLED or not items:
+        return 0
+    try:
+        learned = await run_in_embedding_executor(_learn_sync, list(items), user_id or GLOBAL_SCOPE, source)
+    except Exception as e:
+        print(f"⚠️ Could not update kNN index: {e}")
+        return 0
+    knn_stats["learned"] += learned
+    return learned
+
+
+def learn_in_background(items: Sequence[Tuple[str, Dict[str, Any]]], user_id: Optional[str] = None) -> None:
+    """Fire-and-forget learn from an async request path"""
+    if KNN_CATEGORIZER_ENABLED and items:
+        task = asyncio.ensure_future(learn_classifications(items, user_id))
+        _background_learns.add(task)
+        task.add_done_callback(_background_learns.discard)
+
+
+def get_knn_stats() -> Dict[str, Any]:
+    """Counters for the metrics endpoint"""
+    decided = knn_stats["served"] + knn_stats["deferred"]
+    return {
+        **knn_stats,
+        "serveRate": round(knn_stats["served"] / decided, 4) if decided else 0.0,
+        "indexSize": label_collection.count(),
+        "enabled": KNN_CATEGORIZER_ENABLED,
+    }
@@ -0,0 +1,366 @@
+"""
+Central LLM gateway
+Every Groq chat completion in the service goes through one gateway, which owns:
+
+- a token-bucket limiter for the account quota (LLM_RPM requests and
+  LLM_TPM tokens per minute). A call reserves its estimated tokens up front,
+  and the estimate is reconciled with the reported usage afterwards (a
+  failed attempt gives its reservation back);
+- priority lanes. Interactive calls (chat, quick actions, single
+  classification) go first, then standard work (insights, reports), then
+  background jobs (Gmail cron, mentor / monitor batches, PDF backfills). A
+  lane waits while a higher lane is waiting, and calls within a lane are
+  served first come, first served. Lower lanes also leave part of
+  each bucket untouched (LLM_LANE_RESERVE), so a user request arriving
+  during a backfill finds capacity;
+- retries on 429 / 5xx / connection errors with jittered exponential
+  backoff. A server Retry-After pauses every lane until it has passed;
+- per-route accounting of each call (services/llm_telemetry.py).
+
+The gateway is a drop-in for the AsyncGroq client handlers already take:
+`client.chat.completions.create(..., lane=LANE_BACKGROUND)`. The limiter is
+shared across event loops (FastAPI plus the cron's asyncio.run threads). The
+underlying AsyncGroq client is kept per loop, like async_node_client's pools.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from groq import AsyncGroq
+
+from config import (
+    GROQ_API_KEY, LLM_RPM, LLM_TPM, LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX,
+    LLM_DEFAULT_COMPLETION_TOKENS, LLM_LANE_RESERVE,
+)
+from services.llm_telemetry import current_llm_route, get_llm_telemetry
+
+LANE_INTERACTIVE = "interactive"
+LANE_STANDARD = "standard"
+LANE_BACKGROUND = "background"
+LANES = (LANE_INTERACTIVE, LANE_STANDARD, LANE_BACKGROUND)  # highest priority first
+
+_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_POLL_SECONDS = 0.05
+
+
+class TokenBucket:
+    """Capacity `per_minute`, refilled continuously; thread-safe via the gateway lock"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = max(1.0, float(per_minute))
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, floor: float) -> float:
+        """Seconds until `amount` can be taken while keeping `floor` in the bucket"""
+        missing = amount + floor - self.level
+        return max(0.0, missing / self.rate)
+
+
+def _estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    """Rough prompt size (~4 chars per token) plus the completion allowance"""
+    chars = sum(len(str(m.get("content") or "")) for m in kwargs.get("messages") or [])
+    completion = kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or LLM_DEFAULT_COMPLETION_TOKENS
+    return chars // 4 + int(completion)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_json(result: Any) -> bool:
+    """Whether a completion's content parses as JSON (markdown fences tolerated)"""
+    try:
+        return _is_json_text(result.choices[0].message.content)
+    except Exception:
+        return False
+
+
+def _is_json_text(content: str) -> bool:
+    try:
+        content = content.strip()
+        if content.startswith("```"):
+            content = content.split("\n", 1)[1] if "\n" in content else ""
+            content = content.rsplit("```", 1)[0]
+        json.loads(content)
+        return True
+    except Exception:
+        return False
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in _RETRY_STATUS
+    # APIConnectionError / APITimeoutError carry no status
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _chunk_usage(chunk: Any) -> Any:
+    """Token usage carried by a stream chunk (Groq sends it on the last one, under x_groq)"""
+    return getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+
+
+class _GatewayStream:
+    """
+    Async iterator over a streamed completion handed out by the gateway.
+
+    The first chunk was already received inside the retry loop; iterating
+    replays it and then the rest of the SDK stream. When the stream ends (or
+    the consumer stops early) the token reservation is settled and the call
+    is recorded, with its time to first byte, in the telemetry.
+    """
+
+    def __init__(self, gateway: "LLMGateway", stream: Any, first: Any, chunks: Any, reserved: float, call: Tuple):
+        self._gateway = gateway
+        self._stream = stream
+        self._first = first
+        self._chunks = chunks
+        self._reserved = reserved
+        self._call = call
+        self._recorded = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        parts = []
+        usage = None
+        error = None
+        try:
+            chunk = self._first
+            while True:
+                usage = _chunk_usage(chunk) or usage
+                if chunk.choices:
+                    parts.append(chunk.choices[0].delta.content or "")
+                yield chunk
+                try:
+                    chunk = await self._chunks.__anext__()
+                except StopAsyncIteration:
+                    return
+        except GeneratorExit:
+            error = "StreamClosed"
+            raise
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            await self._finish(usage, "".join(parts), error)
+
+    async def close(self) -> None:
+        await self._finish(None, None, "StreamClosed")
+
+    async def _finish(self, usage: Any, content: Optional[str], error: Optional[str]) -> None:
+        if self._recorded:
+            return
+        self._recorded = True
+        if error:
+            try:
+                await self._stream.close()
+            except Exception:
+                pass
+        if usage is not None:
+            self._gateway._settle(self._reserved, SimpleNamespace(usage=usage))
+        route, model, lane, started, ttfb, wait_ms, retries, expect_json = self._call
+        get_llm_telemetry().record(
+            route, model, lane, (time.monotonic() - started) * 1000, ttfb, wait_ms, retries,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            json_ok=_is_json_text(content) if expect_json and content is not None and not error else None,
+            error=error, stream=True,
+        )
+
+
+class LLMGateway:
+    """Rate-limited, prioritized, retrying front for all chat completions"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = GROQ_API_KEY,
+        rpm: float = LLM_RPM,
+        tpm: float = LLM_TPM,
+        max_retries: int = LLM_MAX_RETRIES,
+    ):
+        self.api_key = api_key
+        self.max_retries = max(0, max_retries)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[int]] = {lane: deque() for lane in LANES}
+        self._tickets = itertools.count()
+        self._paused_until = 0.0
+        self._clients: Dict[asyncio.AbstractEventLoop, AsyncGroq] = {}
+        self._stats = {lane: {"calls": 0, "retries": 0, "rateLimited": 0, "errors": 0, "waitSeconds": 0.0}
+                       for lane in LANES}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _client(self) -> AsyncGroq:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            # Cron runs end their loops; drop clients bound to those
+            for closed in [l for l in self._clients if l.is_closed()]:
+                del self._clients[closed]
+            # Retries are the gateway's job: the SDK's own would bypass the limiter
+            client = AsyncGroq(api_key=self.api_key, max_retries=0)
+            self._clients[loop] = client
+        return client
+
+    async def _acquire(self, lane: str, tokens: int) -> Tuple[float, float]:
+        """Wait for a request slot and `tokens` in this lane's turn; returns (seconds waited, tokens taken)"""
+        rank = LANES.index(lane)
+        reserve = LLM_LANE_RESERVE * rank
+        tokens = min(tokens, self.tokens.capacity * (1 - reserve))
+        started = time.monotonic()
+        ticket = next(self._tickets)
+        queue = self._queues[lane]
+        with self._lock:
+            queue.append(ticket)
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    blocked = queue[0] != ticket or any(self._queues[higher] for higher in LANES[:rank])
+                    wait = max(
+                        self._paused_until - now,
+                        self.requests.wait_time(1, self.requests.capacity * reserve),
+                        self.tokens.wait_time(tokens, self.tokens.capacity * reserve),
+                    )
+                    if not blocked and wait <= 0:
+                        self.requests.level -= 1
+                        self.tokens.level -= tokens
+                        return time.monotonic() - started, tokens
+                await asyncio.sleep(_POLL_SECONDS if blocked else min(max(wait, 0.001), 1.0))
+        finally:
+            with self._lock:
+                queue.remove(ticket)
+
+    def _settle(self, reserved: int, result: Any) -> None:
+        """Charge the bucket for the real token usage instead of the estimate"""
+        usage = getattr(result, "usage", None)
+        used = getattr(usage, "total_tokens", None)
+        if used is not None:
+            with self._lock:
+                self.tokens.level = min(self.tokens.capacity, self.tokens.level + reserved - used)
+
+    def _refund(self, reserved: float) -> None:
+        """Return the reservation of an attempt that failed (it used no tokens)"""
+        with self._lock:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + reserved)
+
+    async def create(self, *, lane: str = LANE_STANDARD, expect_json: bool = True, **kwargs) -> Any:
+        """
+        chat.completions.create through the limiter; same arguments and result as AsyncGroq.
+        expect_json: count the call as a JSON parse failure if the reply is not JSON.
+
+        With stream=True, failures are retried only until the first chunk
+        arrives; the returned iterator then yields every chunk, first included.
+        """
+        if lane not in LANES:
+            lane = LANE_STANDARD
+        stats = self._stats[lane]
+        estimate = _estimate_tokens(kwargs)
+        route = current_llm_route()
+        started = time.monotonic()
+        total_wait = 0.0
+
+        for attempt in range(self.max_retries + 1):
+            waited, reserved = await self._acquire(lane, estimate)
+            total_wait += waited
+            stats["waitSeconds"] += waited
+            stats["calls"] += 1
+            try:
+                result = await self._client().chat.completions.create(**kwargs)
+                if kwargs.get("stream"):
+                    # Retrying is only safe until the first chunk has been handed out
+                    chunks = result.__aiter__()
+                    first = await chunks.__anext__()
+            except Exception as e:
+                self._refund(reserved)
+                status = getattr(e, "status_code", None)
+                if status == 429:
+                    stats["rateLimited"] += 1
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    stats["errors"] += 1
+                    elapsed = (time.monotonic() - started) * 1000
+                    get_llm_telemetry().record(
+                        route, kwargs.get("model"), lane, elapsed, None, total_wait * 1000, attempt,
+                        error=type(e).__name__, stream=bool(kwargs.get("stream")),
+                    )
+                    raise
+                delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)) * (0.5 + random.random())
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                    # The quota is shared: everyone waits, not just this call
+                    with self._lock:
+                        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                stats["retries"] += 1
+                print(f"⚠️ [llm_gateway] {type(e).__name__} ({lane}), retry {attempt + 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if kwargs.get("stream"):
+                ttfb = (time.monotonic() - started) * 1000
+                return _GatewayStream(
+                    self, result, first, chunks, reserved,
+                    (route, kwargs.get("model"), lane, started, ttfb, total_wait * 1000, attempt, expect_json),
+                )
+
+            self._settle(reserved, result)
+            # Non-streamed replies arrive in one piece: first byte == whole response
+            elapsed = (time.monotonic() - started) * 1000
+            usage = getattr(result, "usage", None)
+            get_llm_telemetry().record(
+                route, kwargs.get("model"), lane, elapsed, elapsed, total_wait * 1000, attempt,
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                json_ok=_is_json(result) if expect_json else None,
+            )
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the metrics endpoint"""
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                "rpm": self.requests.capacity,
+                "tpm": self.tokens.capacity,
+                "requestsAvailable": round(self.requests.level, 2),
+                "tokensAvailable": round(self.tokens.level),
+                "waiting": {lane: len(queue) for lane, queue in self._queues.items()},
+                "lanes": {lane: {**s, "waitSeconds": round(s["waitSeconds"], 3)} for lane, s in self._stats.items()},
+            }
+
+
+llm_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Get the shared LLM gateway"""
+    global llm_gateway
+    if llm_gateway is None:
+        llm_gateway = LLMGateway()
+    return llm_gateway
@@ -0,0 +1,178 @@
+"""
+LLM call telemetry
+Per-route accounting for every chat completion that goes through the LLM
+gateway. It records prompt / completion tokens, estimated cost, time to
+first byte, total latency, limiter wait, retries, errors and JSON parse
+failures.
+
+Routes are labeled with a context variable. Entry points (FastAPI
+endpoints, cron jobs) call set_llm_route("/ai/chat") once. Every completion
+made further down, including ones from tasks started with gather, is
+attributed to that route. Nothing needs to be threaded through the handlers.
+
+Aggregates live in memory (stats() for /metrics). Each call is also
+appended as one JSON line to a size-rotated log (LLM_TELEMETRY_LOG_PATH)
+for offline analysis.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Any, Deque, Dict, Optional
+
+from config import (
+    LLM_TELEMETRY_LOG_PATH, LLM_TELEMETRY_LOG_MAX_BYTES, LLM_TELEMETRY_LOG_BACKUPS,
+    LLM_PRICE_INPUT_PER_M, LLM_PRICE_OUTPUT_PER_M,
+)
+
+UNLABELED_ROUTE = "unlabeled"
+_LATENCY_SAMPLES = 500
+
+_current_route: ContextVar[str] = ContextVar("llm_route", default=UNLABELED_ROUTE)
+
+
+def set_llm_route(route: str) -> None:
+    """Label the LLM calls made from here on in the current request / job"""
+    _current_route.set(route)
+
+
+def current_llm_route() -> str:
+    return _current_route.get()
+
+
+def _percentile(samples, fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+
+
+class _RouteStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.json_failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.wait_ms = 0.0
+        self.latency_ms: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self.ttfb_ms: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "jsonParseFailures": self.json_failures,
+            "promptTokens": self.prompt_tokens,
+            "completionTokens": self.completion_tokens,
+            "costUsd": round(self.cost, 6),
+            "avgWaitMs": round(self.wait_ms / self.calls, 1) if self.calls else 0.0,
+            "latencyMs": {"p50": _percentile(self.latency_ms, 0.5), "p95": _percentile(self.latency_ms, 0.95)},
+            "ttfbMs": {"p50": _percentile(self.ttfb_ms, 0.5), "p95": _percentile(self.ttfb_ms, 0.95)},
+        }
+
+
+class LLMTelemetry:
+    """In-memory per-route aggregates plus a rolling JSONL call log"""
+
+    def __init__(self, log_path: Optional[str] = LLM_TELEMETRY_LOG_PATH):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, _RouteStats] = {}
+        self._log: Optional[logging.Logger] = None
+        if log_path:
+            try:
+                handler = RotatingFileHandler(
+                    log_path, maxBytes=LLM_TELEMETRY_LOG_MAX_BYTES, backupCount=LLM_TELEMETRY_LOG_BACKUPS,
+                    encoding="utf-8", delay=True,
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger = logging.getLogger("fintastic.llm_calls")
+                logger.handlers[:] = [handler]
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                self._log = logger
+            except Exception as e:
+                print(f"⚠️ LLM call log disabled: {e}")
+
+    def record(
+        self,
+        route: str,
+        model: Optional[str],
+        lane: str,
+        latency_ms: float,
+        ttfb_ms: Optional[float],
+        wait_ms: float,
+        retries: int,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        json_ok: Optional[bool] = None,
+        error: Optional[str] = None,
+        stream: bool = False,
+    ) -> None:
+        """Account one completion (after its retries)"""
+        cost = (prompt_tokens * LLM_PRICE_INPUT_PER_M + completion_tokens * LLM_PRICE_OUTPUT_PER_M) / 1_000_000
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = _RouteStats()
+            stats.calls += 1
+            stats.retries += retries
+            stats.wait_ms += wait_ms
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cost += cost
+            if error:
+                stats.errors += 1
+            else:
+                stats.latency_ms.append(latency_ms)
+                if ttfb_ms is not None:
+                    stats.ttfb_ms.append(ttfb_ms)
+            if json_ok is False:
+                stats.json_failures += 1
+
+        if self._log is not None:
+            self._log.info(json.dumps({
+                "ts": round(time.time(), 3),
+                "route": route,
+                "model": model,
+                "lane": lane,
+                "stream": stream,
+                "latencyMs": round(latency_ms, 1),
+                "ttfbMs": round(ttfb_ms, 1) if ttfb_ms is not None else None,
+                "waitMs": round(wait_ms, 1),
+                "retries": retries,
+                "promptTokens": prompt_tokens,
+                "completionTokens": completion_tokens,
+                "costUsd": round(cost, 6),
+                "jsonOk": json_ok,
+                "error": error,
+            }))
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-route aggregates and totals for the metrics endpoint"""
+        with self._lock:
+            routes = {route: stats.snapshot() for route, stats in sorted(self._routes.items())}
+        totals = {
+            key: sum(r[key] for r in routes.values())
+            for key in ("calls", "errors", "retries", "jsonParseFailures", "promptTokens", "completionTokens")
+        }
+        totals["costUsd"] = round(sum(r["costUsd"] for r in routes.values()), 6)
+        return {"totals": totals, "routes": routes}
+
+
+llm_telemetry: Optional[LLMTelemetry] = None
+
+
+def get_llm_telemetry() -> LLMTelemetry:
+    """Get the shared telemetry recorder"""
+    global llm_telemetry
+    if llm_telemetry is None:
+        llm_telemetry = LLMTelemetry()
+    return llm_telemetry
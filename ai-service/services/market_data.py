@@ -1,81 +1,192 @@
 import yfinance as yf
-from datetime import datetime, timedelta
-import json
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+from config import MARKET_QUOTE_TTL, MARKET_HISTORY_TTL, MARKET_INFO_TTL, MARKET_CACHE_MAX_SYMBOLS
+from utils.cache import TTLCache
+from services.history_store import get_history_store
+
+HISTORY_DAYS = 30
+PRICE_SOURCE_LIVE = "live"
+PRICE_SOURCE_CLOSE = "close"
+
+# Separate caches: intraday quotes go stale in seconds, daily bars once a day,
+# company info (name/sector/market cap) practically never.
+quote_cache = TTLCache(maxsize=MARKET_CACHE_MAX_SYMBOLS, ttl=MARKET_QUOTE_TTL, name="market_quotes")
+history_cache = TTLCache(maxsize=MARKET_CACHE_MAX_SYMBOLS, ttl=MARKET_HISTORY_TTL, name="market_history")
+info_cache = TTLCache(maxsize=MARKET_CACHE_MAX_SYMBOLS, ttl=MARKET_INFO_TTL, name="market_info")
+
+
+def _get_info(ticker, symbol: str) -> Dict[str, Any]:
+    """Static company info + last known price fields (long TTL)"""
+    info = info_cache.get(symbol)
+    if info is None:
+        raw = ticker.info or {}
+        info = {
+            'name': raw.get('longName') or raw.get('shortName') or symbol,
+            'sector': raw.get('sector'),
+            'marketCap': raw.get('marketCap'),
+            'price': raw.get('currentPrice') or raw.get('regularMarketPrice') or 0,
+        }
+        info_cache.set(symbol, info)
+    return info
+
+
+def _get_quote(ticker, symbol: str) -> float:
+    """Current price (short TTL); fast_info avoids the heavy .info scrape"""
+    price = quote_cache.get(symbol)
+    if price is None:
+        try:
+            price = float(ticker.fast_info['last_price'] or 0)
+        except Exception:
+            price = 0
+        if not price:
+            price = _get_info(ticker, symbol)['price']
+        quote_cache.set(symbol, price)
+    return price
+
+
+def _get_history(symbol: str) -> List[Dict[str, Any]]:
+    """Last HISTORY_DAYS of daily closes as chartData (medium TTL, backed by the on-disk store)"""
+    chart_data = history_cache.get(symbol)
+    if chart_data is None:
+        chart_data = get_history_store().chart_data(symbol, HISTORY_DAYS)
+        history_cache.set(symbol, chart_data)
+    return chart_data
+
+
+def _build_response(
+    symbol: str,
+    current_price: float,
+    chart_data: List[Dict[str, Any]],
+    info: Dict[str, Any],
+    price_source: str = PRICE_SOURCE_LIVE,
+) -> Dict[str, Any]:
+    """
+    price_source: PRICE_SOURCE_LIVE for a live quote, compared with the last
+    close before today (and appended as today's point); PRICE_SOURCE_CLOSE
+    when the price is the latest stored close, compared with the close before it.
+    """
+    chart_data = list(chart_data)
+    today = date.today().isoformat()
+
+    # The store never holds today's (still forming) bar, so the last point is normally the previous close
+    if price_source == PRICE_SOURCE_LIVE and chart_data and chart_data[-1]['date'] < today:
+        previous_close = chart_data[-1]['price']
+        chart_data.append({'date': today, 'price': current_price})
+    elif len(chart_data) > 1:
+        previous_close = chart_data[-2]['price']
+    else:
+        previous_close = 0
+
+    if previous_close > 0:
+        change = current_price - previous_close
+        change_percent = (change / previous_close) * 100
+    else:
+        change = 0
+        change_percent = 0
+
+    # If no chart data, add current price
+    if not chart_data:
+        chart_data = [{
+            'date': today,
+            'price': current_price
+        }]
+
+    return {
+        'symbol': symbol,
+        'price': round(current_price, 2),
+        'change': round(change, 2),
+        'changePercent': round(change_percent, 2),
+        'priceSource': price_source,
+        'chartData': chart_data,
+        'info': {
+            'name': info.get('name') or symbol,
+            'sector': info.get('sector'),
+            'marketCap': info.get('marketCap'),
+        }
+    }
+
+
+def _default_response(symbol: str) -> Dict[str, Any]:
+    return {
+        'symbol': symbol.upper(),
+        'price': 0,
+        'change': 0,
+        'changePercent': 0,
+        'chartData': [{
+            'date': datetime.now().strftime('%Y-%m-%d'),
+            'price': 0
+        }],
+        'info': {
+            'name': symbol,
+            'sector': None,
+            'marketCap': None,
+        }
+    }
+
 
 def get_market_data(symbol: str):
     """
     Fetch market data for a stock symbol using yfinance
-    
+
     Args:
         symbol: Stock ticker symbol (e.g., 'AAPL', 'MSFT')
-    
+
     Returns:
         dict: Market data including price, change, chart data, and company info
     """
     try:
-        ticker = yf.Ticker(symbol.upper())
-        
-        # Get current price and info
-        info = ticker.info
-        current_price = info.get('currentPrice') or info.get('regularMarketPrice') or 0
-        
-        # Get historical data for chart (last 30 days)
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
-        hist = ticker.history(start=start_date, end=end_date, interval='1d')
-        
-        # Calculate change
-        if len(hist) > 1:
-            previous_close = hist['Close'].iloc[-2]
-            change = current_price - previous_close
-            change_percent = (change / previous_close) * 100 if previous_close > 0 else 0
-        else:
-            change = 0
-            change_percent = 0
-        
-        # Prepare chart data
-        chart_data = []
-        for date, row in hist.iterrows():
-            chart_data.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'price': float(row['Close'])
-            })
-        
-        # If no chart data, add current price
-        if not chart_data:
-            chart_data.append({
-                'date': datetime.now().strftime('%Y-%m-%d'),
-                'price': current_price
-            })
-        
-        return {
-            'symbol': symbol.upper(),
-            'price': round(current_price, 2),
-            'change': round(change, 2),
-            'changePercent': round(change_percent, 2),
-            'chartData': chart_data,
-            'info': {
-                'name': info.get('longName') or info.get('shortName') or symbol,
-                'sector': info.get('sector'),
-                'marketCap': info.get('marketCap'),
-            }
-        }
+        symbol = symbol.upper()
+        ticker = yf.Ticker(symbol)
+
+        chart_data = list(_get_history(symbol))
+        current_price = _get_quote(ticker, symbol)
+        info = _get_info(ticker, symbol)
+
+        return _build_response(symbol, current_price, chart_data, info)
     except Exception as e:
         print(f"❌ Error fetching market data for {symbol}: {str(e)}")
         # Return default data on error
-        return {
-            'symbol': symbol.upper(),
-            'price': 0,
-            'change': 0,
-            'changePercent': 0,
-            'chartData': [{
-                'date': datetime.now().strftime('%Y-%m-%d'),
-                'price': 0
-            }],
-            'info': {
-                'name': symbol,
-                'sector': None,
-                'marketCap': None,
-            }
-        }
+        return _default_response(symbol)
+
+
+def get_market_data_batch(symbols: List[str]) -> Dict[str, Any]:
+    """
+    Fetch market data for many symbols.
+
+    Symbols whose daily history is stale in the on-disk store are refreshed in
+    ONE vectorized yf.download call (missing days only). Prices come from the
+    quote cache, falling back to the latest stored close (priceSource
+    "close", change against the close before it); info is served from
+    cache only (name defaults to the symbol) so the batch never triggers
+    per-symbol .info scrapes.
+    """
+    unique_symbols = list(dict.fromkeys(s.upper() for s in symbols if s and s.strip()))
+    missing = [s for s in unique_symbols if history_cache.get(s) is None]
+
+    if missing:
+        store = get_history_store()
+        stale = [s for s in missing if store.is_stale(s)]
+        if stale:
+            store.refresh(stale)
+        for symbol in missing:
+            history_cache.set(symbol, store.chart_data(symbol, HISTORY_DAYS, refresh=False))
+
+    results: Dict[str, Any] = {}
+    for symbol in unique_symbols:
+        chart_data = list(history_cache.get(symbol) or [])
+        price = quote_cache.get(symbol)
+        price_source = PRICE_SOURCE_LIVE
+        if price is None:
+            if not chart_data:
+                results[symbol] = _default_response(symbol)
+                continue
+            # Not a live quote: report it as a close and never cache it as one
+            price = chart_data[-1]['price']
+            price_source = PRICE_SOURCE_CLOSE
+        info = info_cache.get(symbol) or {}
+        results[symbol] = _build_response(symbol, price, chart_data, info, price_source)
+
+    return {'count': len(results), 'data': results}
 
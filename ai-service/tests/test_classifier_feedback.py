@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("groq")
+
+import classifier
+from services import knn_categorizer
+from services.classification_cache import ClassificationCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ClassificationCache(path=str(tmp_path / "classifications.db"))
+    monkeypatch.setattr(classifier, "get_classification_cache", lambda: cache)
+    monkeypatch.setattr(knn_categorizer, "KNN_CATEGORIZER_ENABLED", False)
+    yield cache
+    cache.close()
+
+
+def test_feedback_overrides_cached_classification(cache):
+    text = "UPI/ZOMATO/412345678901"
+    cache.set(text, {"type": "expense", "subtype": "variable", "category": "Food"})
+
+    async def scenario():
+        before = await classifier.classify_text(text, "user-1")
+        correction = {"type": "expense", "subtype": "variable", "category": "Office"}
+        await classifier.record_feedback(text, correction, "user-1")
+        after = await classifier.classify_text(text, "user-1")
+        other_user = await classifier.classify_text(text, "user-2")
+        batch = await classifier.classify_batch([text, "UPI/ZOMATO/498765432109"], user_id="user-1")
+        return before, after, other_user, batch
+
+    before, after, other_user, batch = asyncio.run(scenario())
+
+    assert (before["category"], before["source"]) == ("Food", "cache")
+    assert (after["category"], after["source"]) == ("Office", "feedback")
+    assert after["note"] == text
+    assert (other_user["category"], other_user["source"]) == ("Food", "cache")
+    assert [r["category"] for r in batch["results"]] == ["Office", "Office"]
+    assert batch["feedback"] == 2 and batch["cached"] == 0 and batch["llmCalls"] == 0
+
+
+def test_users_without_feedback_never_query_user_labels(cache, monkeypatch):
+    text = "POS SWIGGY BANGALORE"
+    cache.set(text, {"type": "expense", "subtype": "variable", "category": "Food"})
+    cache.set_user_label("user-1", "UPI/ZOMATO/1", {"type": "expense", "subtype": "variable", "category": "Office"})
+
+    def query(*args):
+        raise AssertionError("user label table queried")
+
+    monkeypatch.setattr(cache, "_conn", _Guard(cache._conn, query))
+    for user_id in (None, "user-2"):
+        result = asyncio.run(classifier.classify_text(text, user_id))
+        assert (result["category"], result["source"]) == ("Food", "cache")
+
+
+class _Guard:
+    """Connection wrapper failing on any user_labels query"""
+
+    def __init__(self, conn, fail):
+        self._conn = conn
+        self._fail = fail
+
+    def execute(self, sql, *args):
+        if "user_labels" in sql:
+            self._fail()
+        return self._conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
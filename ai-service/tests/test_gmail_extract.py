@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("google_auth_oauthlib")
+pytest.importorskip("googleapiclient")
+
+from gmail_extract import TIER_RULE, extract_deterministic, match_rules, match_template
+
+
+@pytest.mark.parametrize("subject, snippet", [
+    ("Payment failed", "Your payment of ₹499 to Netflix failed. Any amount debited will be reversed"),
+    ("Transaction declined", "Transaction of Rs 2,000 at Amazon was declined. No amount has been debited"),
+    ("OTP for transaction", "OTP for transaction of INR 5,000 is 482913. This amount will be debited from your card"),
+    ("Refund pending", "Refund of Rs 350 is pending and will be credited in 5-7 days"),
+    ("Amount reversed", "Rs 1,200 debited earlier has been reversed"),
+    ("Bill due", "Rs 899 debited? Your card bill of Rs 899 is due on 05-03-2024"),
+    ("Payment request", "Ravi has requested ₹750. Pay now to get money sent"),
+])
+def test_rules_skip_money_that_did_not_move(subject, snippet):
+    assert match_rules(subject, snippet) is None
+    assert extract_deterministic("alerts@somebank.com", subject, snippet) is None
+
+
+def test_rules_accept_completed_debit():
+    parsed = match_rules("Debit alert", "Rs 1,250.00 debited from your account at Swiggy")
+    assert parsed["tier"] == TIER_RULE
+    assert parsed["type"] == "expense" and parsed["amount"] == 1250.0
+
+
+def test_gpay_template_ignores_other_google_senders():
+    snippet = "You paid Ravi Kumar ₹500"
+    assert match_template("Google Pay <googlepay-noreply@google.com>", "Payment", snippet)["template"] == "gpay"
+    assert match_template("Google Play <googleplay-noreply@google.com>", "Your receipt", snippet) is None
+    assert match_template("Google Workspace <workspace-noreply@google.com>", "Invoice", snippet) is None
@@ -0,0 +1,146 @@
+import base64
+import json
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+httplib2 = pytest.importorskip("httplib2")
+
+import gmail_fetch
+from gmail_fetch import build_gmail_service, fetch_two_phase
+
+BOUNDARY = "batch_stand_in"
+
+
+def _message(message_id, subject, snippet, body=None):
+    message = {
+        "id": message_id,
+        "snippet": snippet,
+        "payload": {"headers": [{"name": "Subject", "value": subject}, {"name": "From", "value": "alerts@bank.com"}]},
+    }
+    if body is not None:
+        message["payload"]["body"] = {"data": base64.urlsafe_b64encode(body.encode()).decode()}
+    return message
+
+
+class StandInGmail:
+    """
+    Local Gmail batch endpoint. failures[(id, format)] is a list of statuses
+    returned (and consumed) before the message is served.
+    """
+
+    def __init__(self, mailbox, failures):
+        self.mailbox = mailbox
+        self.failures = {key: list(statuses) for key, statuses in failures.items()}
+        self.requests = []
+        self.batches = 0
+        gmail = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                gmail.batches += 1
+                raw = self.rfile.read(int(self.headers["Content-Length"]))
+                envelope = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw
+                )
+                parts = [gmail.respond(part) for part in envelope.iter_parts()]
+                body = "".join(f"--{BOUNDARY}\r\n{part}\r\n" for part in parts) + f"--{BOUNDARY}--\r\n"
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/mixed; boundary={BOUNDARY}")
+                self.send_header("Content-Length", str(len(body.encode())))
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def respond(self, part) -> str:
+        request_line = part.get_payload().split("\r\n", 1)[0].split("\n", 1)[0]
+        url = urlparse(request_line.split(" ")[1])
+        message_id = url.path.rstrip("/").rsplit("/", 1)[-1]
+        fmt = parse_qs(url.query).get("format", ["full"])[0]
+        self.requests.append((message_id, fmt))
+
+        pending = self.failures.get((message_id, fmt))
+        if pending:
+            status, payload = pending.pop(0), {"error": {"code": 0, "message": "stand-in failure"}}
+            payload["error"]["code"] = status
+        elif message_id in self.mailbox:
+            status, payload = 200, dict(self.mailbox[message_id])
+            if fmt == "metadata":
+                payload["payload"] = {"headers": payload["payload"]["headers"]}
+        else:
+            status, payload = 404, {"error": {"code": 404, "message": "Not Found"}}
+
+        content = json.dumps(payload)
+        return (
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <response-{part['Content-ID'].strip('<>')}>\r\n\r\n"
+            f"HTTP/1.1 {status} Stand-in\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(content)}\r\n\r\n{content}"
+        )
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(gmail_fetch.time, "sleep", calls.append)
+    return calls
+
+
+def test_two_phase_fetch_retries_only_retryable_failures(sleeps):
+    mailbox = {
+        "m1": _message("m1", "Debit alert", "Rs 250.00 debited via UPI", body="Rs 250.00 debited to SWIGGY"),
+        "m2": _message("m2", "Weekly newsletter", "Top stories this week", body="Long newsletter body"),
+        "m3": _message("m3", "Payment received", "Rs 1,000.00 credited via UPI", body="Rs 1,000.00 credited"),
+        "m5": _message("m5", "Card payment", "Rs 99.00 paid at AMAZON via card", body="Rs 99.00 paid at AMAZON"),
+    }
+    gmail = StandInGmail(mailbox, {("m3", "metadata"): [503], ("m5", "full"): [429, 500]})
+    try:
+        service = build_gmail_service(http=httplib2.Http(), api_endpoint=gmail.url)
+        prefilter = lambda subject, snippet: "rs" in snippet.lower()
+        result = fetch_two_phase(service, ["m1", "m2", "m3", "m4", "m5"], prefilter, http=httplib2.Http())
+    finally:
+        gmail.close()
+
+    assert [m["id"] for m in result["messages"]] == ["m1", "m3", "m5"]
+    assert result["messages"][0]["body"] == "Rs 250.00 debited to SWIGGY"
+    assert result["rejected"] == ["m2"]
+    # 404 is final: reported, never re-requested
+    assert list(result["errors"]) == ["m4"] and result["errors"]["m4"].resp.status == 404
+    assert gmail.requests.count(("m4", "metadata")) == 1
+    # Retryable failures are re-requested (only they), and then succeed
+    assert gmail.requests.count(("m3", "metadata")) == 2
+    assert gmail.requests.count(("m5", "full")) == 3
+    assert gmail.requests.count(("m1", "metadata")) == 1
+    # Bodies only for messages that passed the prefilter
+    assert ("m2", "full") not in gmail.requests
+    assert result["stats"]["bodiesFetched"] == 3
+    assert result["stats"]["roundTrips"] == gmail.batches == 5
+    assert len(sleeps) == 3
+
+
+def test_retries_give_up_after_max_retries(sleeps):
+    gmail = StandInGmail({"m1": _message("m1", "Debit", "Rs 10.00 debited")}, {("m1", "metadata"): [503] * 5})
+    try:
+        service = build_gmail_service(http=httplib2.Http(), api_endpoint=gmail.url)
+        messages, errors, round_trips = gmail_fetch.batch_get_messages(
+            service, ["m1"], http=httplib2.Http(), max_retries=2
+        )
+    finally:
+        gmail.close()
+
+    assert messages == {} and errors["m1"].resp.status == 503
+    assert round_trips == 3 and gmail.requests.count(("m1", "metadata")) == 3
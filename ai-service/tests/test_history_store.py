@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+pytest.importorskip("yfinance")
+
+from services.history_store import BAR_DTYPE, HistoryStore
+
+
+def _bars(start, closes):
+    bars = np.zeros(len(closes), dtype=BAR_DTYPE)
+    bars["date"] = [np.datetime64(start + timedelta(days=i), "D") for i in range(len(closes))]
+    bars["close"] = closes
+    return bars
+
+
+def test_reads_follow_a_file_rewritten_by_another_process(tmp_path):
+    reader = HistoryStore(root=str(tmp_path))
+    writer = HistoryStore(root=str(tmp_path))  # stands in for another worker
+    start = date.today() - timedelta(days=5)
+    writer._append("TEST", _bars(start, [100.0, 101.0]))
+
+    assert list(reader.load("TEST")["close"]) == [100.0, 101.0]
+
+    writer._append("TEST", _bars(start + timedelta(days=2), [102.0]))
+
+    assert list(reader.load("TEST")["close"]) == [100.0, 101.0, 102.0]
+    assert [p["price"] for p in reader.chart_data("TEST", refresh=False)] == [100.0, 101.0, 102.0]
@@ -0,0 +1,49 @@
+import asyncio
+import types
+
+import pytest
+
+pytest.importorskip("groq")
+
+from services import llm_gateway
+from services.llm_gateway import LLMGateway
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class FlakyCompletions:
+    """Fails `failures` times with a 429, then answers using `used` tokens"""
+
+    def __init__(self, failures, used):
+        self.failures = failures
+        self.used = used
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RateLimited("rate limited")
+        message = types.SimpleNamespace(content="{}")
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=message)],
+            usage=types.SimpleNamespace(total_tokens=self.used, prompt_tokens=self.used, completion_tokens=0),
+        )
+
+
+def test_failed_attempts_return_their_token_reservation(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_BACKOFF_BASE", 0)
+    gateway = LLMGateway(api_key="test", rpm=1000, tpm=60000, max_retries=3)
+    completions = FlakyCompletions(failures=3, used=100)
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    monkeypatch.setattr(gateway, "_client", lambda: client)
+    monkeypatch.setattr(gateway.tokens, "rate", 1e-6)  # ~no refill: the level shows what was charged
+
+    asyncio.run(gateway.create(
+        model="test", lane=llm_gateway.LANE_INTERACTIVE, max_tokens=1000, messages=[{"role": "user", "content": "hi"}]
+    ))
+
+    assert completions.calls == 4
+    # Only the successful attempt is charged, at its real usage
+    assert gateway.tokens.level == pytest.approx(60000 - 100, abs=1)
@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip("yfinance")
+
+from services import market_data
+
+
+def _closes(*prices):
+    """Daily closes ending yesterday, as the history store serves them"""
+    start = date.today() - timedelta(days=len(prices))
+    return [{"date": (start + timedelta(days=i)).isoformat(), "price": p} for i, p in enumerate(prices)]
+
+
+def test_change_is_live_price_minus_yesterdays_close(monkeypatch):
+    monkeypatch.setattr(market_data, "_get_history", lambda symbol: _closes(100.0, 110.0))
+    monkeypatch.setattr(market_data, "_get_quote", lambda ticker, symbol: 115.5)
+    monkeypatch.setattr(market_data, "_get_info", lambda ticker, symbol: {"name": symbol})
+    monkeypatch.setattr(market_data.yf, "Ticker", lambda symbol: None)
+
+    result = market_data.get_market_data("test")
+
+    assert result["change"] == round(115.5 - 110.0, 2)
+    assert result["changePercent"] == round(5.5 / 110.0 * 100, 2)
+    assert result["priceSource"] == market_data.PRICE_SOURCE_LIVE
+    assert result["chartData"][-1] == {"date": date.today().isoformat(), "price": 115.5}
+    assert result["chartData"][-2]["price"] == 110.0
+
+
+def test_batch_without_quote_reports_the_stored_close(monkeypatch):
+    symbol = "BATCHTEST"
+    market_data.history_cache.set(symbol, _closes(100.0, 104.0))
+    market_data.quote_cache.invalidate(symbol)
+
+    result = market_data.get_market_data_batch([symbol])["data"][symbol]
+
+    assert result["price"] == 104.0
+    assert result["priceSource"] == market_data.PRICE_SOURCE_CLOSE
+    assert result["change"] == 4.0
+    assert result["chartData"][-1]["date"] < date.today().isoformat()
+    # A stored close must never be served later as the live quote
+    assert market_data.quote_cache.get(symbol) is None
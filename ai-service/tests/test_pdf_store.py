@@ -0,0 +1,107 @@
+import asyncio
+import io
+import json
+import types
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("groq")
+canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+
+import async_node_client
+from async_node_client import STATUS_CREATED, STATUS_DUPLICATE
+from routes import pdf
+
+
+def _statement(*lines):
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer)
+    for offset, line in enumerate(lines):
+        page.drawString(50, 800 - 20 * offset, line)
+    page.save()
+    return buffer.getvalue()
+
+
+class FakeBackend:
+    """Bulk endpoint that, like the real one, stores each dedupKey once"""
+
+    def __init__(self):
+        self.stored = {}
+
+    async def send_bulk(self, user_id, source, batch, timeout):
+        outcome = {}
+        for key, tx in batch:
+            outcome[key] = (STATUS_DUPLICATE if key in self.stored else STATUS_CREATED, None)
+            self.stored.setdefault(key, tx)
+        return outcome
+
+
+classified_for = []
+
+
+async def _classify(texts, user_id=None):
+    classified_for.append(user_id)
+    return {"results": [{"category": "Food"} for _ in texts], "cached": 0, "knn": 0, "llmCalls": 0}
+
+
+async def _remember(*args, **kwargs):
+    return None
+
+
+def test_identical_same_day_rows_are_both_stored(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(async_node_client, "_send_bulk", backend.send_bulk)
+    monkeypatch.setattr(pdf, "classify_batch", _classify)
+    monkeypatch.setattr(pdf, "astore_memory_entry", _remember)
+    statement = _statement(
+        "01/02/2024 UPI paid to SWIGGY 250.00",
+        "01/02/2024 UPI paid to SWIGGY 250.00",
+        "02/02/2024 UPI paid to ZOMATO 180.00",
+    )
+
+    first = asyncio.run(pdf.handle_pdf_parse(statement, "statement.pdf", "user-1", None, "model"))
+    again = asyncio.run(pdf.handle_pdf_parse(statement, "statement.pdf", "user-1", None, "model"))
+
+    assert first["transactionCount"] == 3
+    assert first["storedCount"] == 3 and first["duplicateCount"] == 0
+    assert len(backend.stored) == 3
+    assert [tx["amount"] for tx in backend.stored.values()].count(250.0) == 2
+    # Re-uploading the same statement stores nothing new
+    assert again["storedCount"] == 0 and again["duplicateCount"] == 3
+    assert len(backend.stored) == 3
+
+
+class FakeStatementClient:
+    """LLM stand-in that cites the right lines but words descriptions differently each call"""
+
+    def __init__(self, descriptions):
+        self.descriptions = iter(descriptions)
+        self.chat = self
+        self.completions = self
+
+    async def create(self, **kwargs):
+        description = next(self.descriptions)
+        content = json.dumps({"transactions": [
+            {"date": "2024-02-01", "type": "expense", "amount": 250, "description": description, "line": "1.1"},
+            {"date": "2024-02-01", "type": "expense", "amount": 250, "description": description, "line": "1.2"},
+        ]})
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def test_llm_rows_hash_the_statement_line_not_the_description():
+    pages = [{"number": 1, "tables": [], "text": "01 Feb UPI SWIGGY 250 Dr\n01 Feb UPI SWIGGY 250 Dr"}]
+
+    async def parse(description):
+        client = FakeStatementClient([description])
+        transactions, _ = await pdf._parse_bank_statement(client, "model", pages, "hdfc")
+        return transactions
+
+    first = asyncio.run(parse("Swiggy food order"))
+    again = asyncio.run(parse("UPI payment to Swiggy"))
+
+    assert len(first) == 2
+    assert len({tx["hash"] for tx in first}) == 2
+    assert [tx["hash"] for tx in first] == [tx["hash"] for tx in again]
@@ -4,14 +4,19 @@ Contains search tools, market tools, and memory operations
 """
 
 from .search import tavily_search, get_stock_market_data, get_sip_ideas, get_insurance_ideas
-from .market import market_overview, sip_forecast, crash_risk_detector, investment_signal_engine
+from .market import market_overview, get_market_snapshot, sip_forecast, crash_risk_detector, investment_signal_engine
 from .memory import (
     get_importance,
     store_memory_entry,
+    astore_memory_entry,
     query_user_memories,
+    aquery_user_memories,
+    run_in_embedding_executor,
     merge_and_clean_memories,
     get_latest_alert_context,
     build_behavior_context,
+    memory_flushed,
+    close_memory_writer,
 )
 
 __all__ = [
@@ -22,14 +27,20 @@ __all__ = [
     "get_insurance_ideas",
     # Market tools
     "market_overview",
+    "get_market_snapshot",
     "sip_forecast",
     "crash_risk_detector",
     "investment_signal_engine",
     # Memory tools
     "get_importance",
     "store_memory_entry",
+    "astore_memory_entry",
     "query_user_memories",
+    "aquery_user_memories",
+    "run_in_embedding_executor",
     "merge_and_clean_memories",
     "get_latest_alert_context",
     "build_behavior_context",
+    "memory_flushed",
+    "close_memory_writer",
 ]
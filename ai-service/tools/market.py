@@ -2,80 +2,124 @@
 Market-aware tools for investment analysis and crash detection
 """
 
+import asyncio
 from typing import Any, Dict
 from datetime import datetime
 from .search import tavily_search
+from config import MARKET_OVERVIEW_CACHE_TTL, MARKET_OVERVIEW_ERROR_TTL
+from utils.cache import TTLCache, SingleFlight
+
+
+MARKET_OVERVIEW_QUERY = "Latest Indian stock market update, Nifty Sensex today, VIX index, crash risk, recession signals, market sentiment India"
+
+# Raw market snapshot is identical for every user: cache it process-wide
+# and coalesce concurrent Tavily lookups into a single call.
+market_overview_cache = TTLCache(maxsize=8, ttl=MARKET_OVERVIEW_CACHE_TTL, name="market_overview")
+_market_overview_flight = SingleFlight()
+
+_TAVILY_FAILURE_PREFIXES = ("Web search", "No relevant web information")
+
+
+async def get_market_snapshot() -> Dict[str, Any]:
+    """Return the shared (user-independent) market snapshot, from cache when fresh"""
+    snapshot = market_overview_cache.get(MARKET_OVERVIEW_QUERY)
+    if snapshot is not None:
+        return snapshot
+
+    async def fetch():
+        loop = asyncio.get_running_loop()
+        market_data = await loop.run_in_executor(None, tavily_search, MARKET_OVERVIEW_QUERY)
+        fresh = _analyze_market_data(market_data)
+        # Cache failures only briefly so an outage does not pin stale "unavailable" text
+        failed = market_data.startswith(_TAVILY_FAILURE_PREFIXES)
+        market_overview_cache.set(
+            MARKET_OVERVIEW_QUERY,
+            fresh,
+            ttl=MARKET_OVERVIEW_ERROR_TTL if failed else None,
+        )
+        return fresh
+
+    return await _market_overview_flight.do(MARKET_OVERVIEW_QUERY, fetch)
+
+
+def _analyze_market_data(market_data: str) -> Dict[str, Any]:
+    """Derive trend, sentiment and headlines from raw Tavily text (no user context)"""
+    # Parse market data to extract key metrics
+    nifty = "N/A"
+    sensex = "N/A"
+    vix = "N/A"
+    
+    # Analyze sentiment from market data
+    market_lower = market_data.lower()
+    bullish_indicators = ["bullish", "rally", "gains", "up", "positive", "growth"]
+    bearish_indicators = ["bearish", "crash", "fall", "down", "negative", "decline", "recession"]
+    volatile_indicators = ["volatile", "uncertain", "mixed", "fluctuat"]
+    
+    bullish_count = sum(1 for word in bullish_indicators if word in market_lower)
+    bearish_count = sum(1 for word in bearish_indicators if word in market_lower)
+    volatile_count = sum(1 for word in volatile_indicators if word in market_lower)
+    
+    if bearish_count > bullish_count and bearish_count > volatile_count:
+        trend = "bearish"
+        global_sentiment = "negative"
+    elif bullish_count > bearish_count and bullish_count > volatile_count:
+        trend = "bullish"
+        global_sentiment = "positive"
+    else:
+        trend = "volatile"
+        global_sentiment = "unstable"
+    
+    # Extract top news
+    top_news = market_data.split("\n\n")[:3] if market_data else []
+    
+    # Sector trends
+    sector_trends = {
+        "IT": "stable",
+        "Banking": "stable",
+        "Pharma": "stable",
+        "FMCG": "stable"
+    }
+    
+    return {
+        "nifty": nifty,
+        "sensex": sensex,
+        "vix": vix,
+        "trend": trend,
+        "global_sentiment": global_sentiment,
+        "top_news": top_news,
+        "sector_trends": sector_trends,
+        "raw_market_data": market_data[:500]
+    }
 
 
 async def market_overview(user_context: Dict[str, Any]) -> Dict[str, Any]:
     """
     Get comprehensive market overview including Nifty, Sensex, VIX, trends, and news.
     Must consider user's risk index and income stability.
+    The raw market snapshot is shared across users; only the adjustments below are per user.
     """
     try:
         risk_index = user_context.get("riskIndex", 50)
         income_stability = user_context.get("incomeStability", "moderate")
         is_gig_worker = user_context.get("isGigWorker", False)
         
-        # Fetch market data using Tavily
-        query = "Latest Indian stock market update, Nifty Sensex today, VIX index, crash risk, recession signals, market sentiment India"
-        market_data = tavily_search(query)
-        
-        # Parse market data to extract key metrics
-        nifty = "N/A"
-        sensex = "N/A"
-        vix = "N/A"
-        
-        # Analyze sentiment from market data
-        market_lower = market_data.lower()
-        bullish_indicators = ["bullish", "rally", "gains", "up", "positive", "growth"]
-        bearish_indicators = ["bearish", "crash", "fall", "down", "negative", "decline", "recession"]
-        volatile_indicators = ["volatile", "uncertain", "mixed", "fluctuat"]
-        
-        bullish_count = sum(1 for word in bullish_indicators if word in market_lower)
-        bearish_count = sum(1 for word in bearish_indicators if word in market_lower)
-        volatile_count = sum(1 for word in volatile_indicators if word in market_lower)
-        
-        if bearish_count > bullish_count and bearish_count > volatile_count:
-            trend = "bearish"
-            global_sentiment = "negative"
-        elif bullish_count > bearish_count and bullish_count > volatile_count:
-            trend = "bullish"
-            global_sentiment = "positive"
-        else:
-            trend = "volatile"
-            global_sentiment = "unstable"
-        
-        # Extract top news
-        top_news = market_data.split("\n\n")[:3] if market_data else []
-        
-        # Sector trends
-        sector_trends = {
-            "IT": "stable",
-            "Banking": "stable",
-            "Pharma": "stable",
-            "FMCG": "stable"
+        snapshot = await get_market_snapshot()
+        overview = {
+            **snapshot,
+            "top_news": list(snapshot["top_news"]),
+            "sector_trends": dict(snapshot["sector_trends"]),
         }
         
         # Adjust interpretation based on user context
         if risk_index < 30:  # Low risk user
-            if trend == "bearish":
-                trend = "volatile"  # Soften for low-risk users
+            if overview["trend"] == "bearish":
+                overview["trend"] = "volatile"  # Soften for low-risk users
         if is_gig_worker:
             # Gig workers need more conservative interpretation
-            if trend == "bullish":
-                global_sentiment = "positive"  # But still cautious
+            if overview["trend"] == "bullish":
+                overview["global_sentiment"] = "positive"  # But still cautious
         
-        return {
-            "nifty": nifty,
-            "sensex": sensex,
-            "vix": vix,
-            "trend": trend,
-            "global_sentiment": global_sentiment,
-            "top_news": top_news,
-            "sector_trends": sector_trends,
-            "raw_market_data": market_data[:500]
-        }
+        return overview
     except Exception as e:
         print(f"Market overview error: {e}")
         return {
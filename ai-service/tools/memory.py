@@ -2,13 +2,24 @@
 Memory management tools for ChromaDB operations
 """
 
+import asyncio
+import atexit
+import functools
+import re
+import threading
 import uuid
-from typing import Any, Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 import chromadb
 from sentence_transformers import SentenceTransformer
 
-from config import CHROMA_PATH, TYPE_MAPPING
+from config import (
+    CHROMA_PATH, TYPE_MAPPING, MEMORY_WRITE_BATCH_SIZE, MEMORY_WRITE_FLUSH_INTERVAL,
+    EMBEDDING_EXECUTOR_WORKERS, QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL,
+)
+from utils.cache import TTLCache
+from .memory_writer import MemoryWriter
 
 # Initialize ChromaDB
 print(f"\n✅ Chroma DB will be stored at:\n{CHROMA_PATH}\n")
@@ -18,6 +29,73 @@ collection = chroma_client.get_or_create_collection(name="fintastic_memory")
 # Embedding model
 model = SentenceTransformer("all-MiniLM-L6-v2")
 
+# Query embedding cache (keyed by normalized query text)
+query_embedding_cache = TTLCache(
+    maxsize=QUERY_EMBEDDING_CACHE_SIZE,
+    ttl=QUERY_EMBEDDING_CACHE_TTL,
+    name="query_embeddings",
+)
+
+
+def normalize_query(text: str) -> str:
+    """Normalize a query for cache lookups: lowercase, collapse whitespace, trim punctuation"""
+    return re.sub(r"\s+", " ", text or "").strip().strip("?!.,;: ").lower()
+
+
+def embed_query(text: str) -> List[float]:
+    """Embed a search query, reusing cached vectors for repeated queries"""
+    key = normalize_query(text)
+    return query_embedding_cache.get_or_set(key, lambda: model.encode(key).tolist())
+
+
+# Dedicated pool for CPU-bound embedding / Chroma calls made from async code
+_embedding_executor = ThreadPoolExecutor(
+    max_workers=EMBEDDING_EXECUTOR_WORKERS,
+    thread_name_prefix="embedding",
+)
+
+
+async def run_in_embedding_executor(fn, *args, **kwargs):
+    """Run a blocking embedding/Chroma call on the embedding pool without blocking the loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_embedding_executor, functools.partial(fn, *args, **kwargs))
+
+
+# Batched writer (created on first write)
+_memory_writer: Optional[MemoryWriter] = None
+_memory_writer_lock = threading.Lock()
+
+
+def get_memory_writer() -> MemoryWriter:
+    """Get the shared batched memory writer"""
+    global _memory_writer
+    if _memory_writer is None:
+        with _memory_writer_lock:
+            if _memory_writer is None:
+                _memory_writer = MemoryWriter(
+                    collection,
+                    model,
+                    batch_size=MEMORY_WRITE_BATCH_SIZE,
+                    flush_interval=MEMORY_WRITE_FLUSH_INTERVAL,
+                )
+    return _memory_writer
+
+
+def close_memory_writer() -> None:
+    """Flush pending memory writes and stop the writer (called on shutdown)"""
+    if _memory_writer is not None:
+        _memory_writer.close()
+    _embedding_executor.shutdown(wait=False)
+
+
+async def memory_flushed() -> None:
+    """Wait until every memory queued so far has been written to Chroma"""
+    if _memory_writer is not None:
+        await _memory_writer.flushed()
+
+
+atexit.register(close_memory_writer)
+
 
 def get_importance(mem_type: str, metadata: Optional[Dict[str, Any]] = None) -> str:
     """Determine importance level based on type and metadata"""
@@ -45,18 +123,15 @@ def get_importance(mem_type: str, metadata: Optional[Dict[str, Any]] = None) ->
     return "low"
 
 
-def store_memory_entry(
+def _queue_memory_entry(
     user_id: str,
     content: str,
-    mem_type: str = "onboarding_profile",
-    metadata: Optional[Dict[str, Any]] = None
-):
-    """
-    Store a single memory in Chroma with standardized format.
-    Enforces 5 strict memory types and adds standardized metadata.
-    """
+    mem_type: str,
+    metadata: Optional[Dict[str, Any]],
+) -> Tuple[Dict[str, Any], Optional[Future]]:
+    """Build the standardized entry and queue it; returns (result, flushed handle)"""
     if not content or len(content.strip()) < 10:
-        return {"status": "skipped", "reason": "content too small"}
+        return {"status": "skipped", "reason": "content too small"}, None
 
     # Map to standardized type
     standardized_type = TYPE_MAPPING.get(mem_type, "onboarding_profile")
@@ -68,7 +143,6 @@ def store_memory_entry(
     source = metadata.get("source", "ai") if metadata else "ai"
     date = datetime.now().strftime("%Y-%m-%d")
 
-    vector = model.encode(content).tolist()
     doc_id = f"{user_id}_{standardized_type}_{uuid.uuid4().hex[:8]}"
 
     # Build standardized metadata
@@ -86,19 +160,49 @@ def store_memory_entry(
             if key not in ["source", "date", "importance", "type"]:
                 full_meta[key] = value
 
-    collection.upsert(
-        ids=[doc_id],
-        embeddings=[vector],
-        metadatas=[full_meta],
-        documents=[content],
-    )
+    flushed = get_memory_writer().submit(doc_id, content, full_meta)
+    return {"status": "queued", "id": doc_id, "type": standardized_type, "importance": importance}, flushed
 
-    return {"status": "stored", "id": doc_id, "type": standardized_type, "importance": importance}
+
+def store_memory_entry(
+    user_id: str,
+    content: str,
+    mem_type: str = "onboarding_profile",
+    metadata: Optional[Dict[str, Any]] = None,
+    wait: bool = False
+):
+    """
+    Store a single memory in Chroma with standardized format.
+    Enforces 5 strict memory types and adds standardized metadata.
+
+    The write is queued on the batched memory writer; pass wait=True to block
+    until it has been embedded and upserted (read-after-write).
+    """
+    result, flushed = _queue_memory_entry(user_id, content, mem_type, metadata)
+    if wait and flushed is not None:
+        flushed.result()
+        result["status"] = "stored"
+    return result
+
+
+async def astore_memory_entry(
+    user_id: str,
+    content: str,
+    mem_type: str = "onboarding_profile",
+    metadata: Optional[Dict[str, Any]] = None,
+    wait: bool = False
+):
+    """Async facade over store_memory_entry; wait=True awaits the batched write"""
+    result, flushed = _queue_memory_entry(user_id, content, mem_type, metadata)
+    if wait and flushed is not None:
+        await asyncio.wrap_future(flushed)
+        result["status"] = "stored"
+    return result
 
 
 def query_user_memories(user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
     """Semantic memory search helper."""
-    query_vector = model.encode(query).tolist()
+    query_vector = embed_query(query)
     results = collection.query(
         query_embeddings=[query_vector],
         n_results=top_k,
@@ -118,6 +222,11 @@ def query_user_memories(user_id: str, query: str, top_k: int = 5) -> List[Dict[s
     return matches
 
 
+async def aquery_user_memories(user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    """Async facade over query_user_memories, run on the embedding pool."""
+    return await run_in_embedding_executor(query_user_memories, user_id, query, top_k)
+
+
 def merge_and_clean_memories(records: List[Any]) -> str:
     """Merge pre-fetched memory snippets into a readable block."""
     snippets: List[str] = []
@@ -0,0 +1,138 @@
+"""
+Buffered, batched memory writer for ChromaDB
+Collects pending memory entries, embeds them in batches and upserts them in bulk.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+
+class _FlushRequest:
+    """Queue marker asking the writer to flush everything received before it"""
+
+    def __init__(self):
+        self.future: Future = Future()
+
+
+class MemoryWriter:
+    """
+    Background writer that batches memory writes.
+
+    Entries are flushed when `batch_size` entries are pending or when the oldest
+    pending entry has waited `flush_interval` seconds, whichever comes first.
+    Every submitted entry gets a concurrent Future that resolves once the entry
+    is in Chroma, so callers that need read-after-write can wait on it.
+    """
+
+    def __init__(self, collection, model, batch_size: int = 32, flush_interval: float = 0.5):
+        self.collection = collection
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.01, flush_interval)
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, doc_id: str, content: str, metadata: Dict[str, Any]) -> Future:
+        """Queue one entry for writing and return its flushed handle"""
+        future: Future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("Memory writer is closed"))
+            return future
+        self._queue.put((doc_id, content, metadata, future))
+        return future
+
+    def flush(self) -> Future:
+        """Force a write of everything queued so far; the Future resolves when done"""
+        request = _FlushRequest()
+        if self._closed:
+            request.future.set_result(None)
+            return request.future
+        self._queue.put(request)
+        return request.future
+
+    async def flushed(self) -> None:
+        """Awaitable variant of flush() for async callers"""
+        await asyncio.wrap_future(self.flush())
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Flush pending entries and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def pending(self) -> int:
+        """Approximate number of queued items"""
+        return self._queue.qsize()
+
+    # =========================
+    # WRITER THREAD
+    # =========================
+
+    def _run(self) -> None:
+        batch: List[tuple] = []
+        deadline: Optional[float] = None
+
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _FlushRequest()  # interval elapsed: flush, nobody waits on this marker
+
+            if item is None:
+                self._write(batch)
+                return
+
+            if isinstance(item, _FlushRequest):
+                self._write(batch)
+                batch, deadline = [], None
+                item.future.set_result(None)
+                continue
+
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch, deadline = [], None
+
+    def _write(self, batch: List[tuple]) -> None:
+        if not batch:
+            return
+
+        # Collapse duplicate ids inside a batch (last write wins, like upsert)
+        latest: Dict[str, tuple] = {}
+        for entry in batch:
+            latest[entry[0]] = entry
+        entries = list(latest.values())
+
+        try:
+            vectors = self.model.encode(
+                [content for _, content, _, _ in entries],
+                batch_size=self.batch_size,
+            )
+            self.collection.upsert(
+                ids=[doc_id for doc_id, _, _, _ in entries],
+                embeddings=[vector.tolist() for vector in vectors],
+                metadatas=[metadata for _, _, metadata, _ in entries],
+                documents=[content for _, content, _, _ in entries],
+            )
+        except Exception as e:
+            print(f"❌ [memory_writer] Failed to write batch of {len(entries)}: {e}")
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for doc_id, _, _, future in batch:
+            if not future.done():
+                future.set_result(doc_id)
+        print(f"🧠 [memory_writer] Stored {len(entries)} memories")
@@ -1,4 +1,4 @@
-from classifier import classify_text
+from classifier import classify_text, classify_batch
 
 # Use same expected structure as before (since Transaction & schema are gone)
 transaction_template = {
@@ -8,8 +8,8 @@ transaction_template = {
     "note": None,
 }
 
-async def create_transaction(amount: int, description: str):
-    ai_result = await classify_text(description)
+async def create_transaction(amount: int, description: str, user_id=None):
+    ai_result = await classify_text(description, user_id)
 
     transaction = transaction_template.copy()
     transaction.update({
@@ -22,3 +22,22 @@ async def create_transaction(amount: int, description: str):
     })
 
     return transaction
+
+
+async def create_transactions_batch(items, user_id=None):
+    """Classify many (amount, description) items with batched LLM calls"""
+    batch = await classify_batch([item.description for item in items], user_id=user_id)
+
+    transactions = []
+    for item, ai_result in zip(items, batch["results"]):
+        transaction = transaction_template.copy()
+        transaction.update({
+            "type": ai_result.get("type"),
+            "subtype": ai_result.get("subtype"),
+            "category": ai_result.get("category"),
+            "note": ai_result.get("note", item.description),
+        })
+        transactions.append(transaction)
+
+    stats = {k: v for k, v in batch.items() if k != "results"}
+    return transactions, stats
@@ -2,40 +2,14 @@
 Helper utility functions
 """
 
-import os
-import httpx
 from typing import Dict, Any, List, Tuple
-from config import NODE_BACKEND_URL, AI_SECRET, SERVICE_JWT, GIG_CATEGORIES
+from config import SERVICE_JWT, GIG_CATEGORIES
+from async_node_client import get_latest_data
 
 
 async def get_latest_financial_data(user_id: str) -> Dict[str, Any]:
     """Fetch latest comprehensive financial data from consolidated endpoint."""
-    headers = {
-        "Content-Type": "application/json",
-        "x-internal-access": "true"
-    }
-    if AI_SECRET:
-        headers["x-ai-secret"] = AI_SECRET
-    
-    params = {"userId": user_id}
-    
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{NODE_BACKEND_URL}/api/latest-data/latest",
-                headers=headers,
-                params=params
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("data", {})
-            else:
-                print(f"⚠️ Latest data endpoint returned {response.status_code}")
-                return {}
-    except Exception as e:
-        print(f"⚠️ Error fetching latest financial data: {e}")
-        return {}
+    return await get_latest_data(user_id)
 
 
 def service_headers() -> Dict[str, str]:
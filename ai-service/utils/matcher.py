@@ -0,0 +1,144 @@
+"""
+Single-pass text matcher
+Finds an amount and every keyword hit for several keyword groups with one
+scan over the text, instead of one re.search per amount pattern plus one
+substring scan per keyword.
+
+Semantics match the naive approach they replace:
+- the amount comes from the highest-priority pattern that matches anywhere
+  (leftmost occurrence of that pattern), skipping patterns whose match is
+  not a positive number;
+- a keyword "hits" if it occurs anywhere as a substring (case-insensitive).
+
+How: an Aho-Corasick automaton (pyahocorasick) holds all keywords plus the
+literal prefix of each amount pattern ("₹", "rs", "paid", ...). One pass over
+the lowercased text reports every occurrence, overlapping ones included. Each
+amount pattern is then only tried, anchored, at the offsets where its prefix
+occurred; patterns without a literal prefix fall back to a normal search, and
+only when no higher-priority pattern produced an amount.
+
+pyahocorasick is optional: without it the matcher runs the naive scans.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Sequence, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # optional accelerator
+    ahocorasick = None
+
+_META = set(".^$*+?{}[]()|\\")
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    Literal text every match of `pattern` starts with ('' if none).
+    Handles plain characters and escaped punctuation; stops at the first
+    metacharacter, dropping a character that a quantifier makes optional.
+    """
+    prefix: List[str] = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        width = 1
+        if char == "\\":
+            escaped = pattern[index + 1:index + 2]
+            if not escaped or escaped.isalnum():
+                break  # \d, \s, \b ... are classes/assertions, not literals
+            char, width = escaped, 2
+        elif char in _META:
+            break
+        if pattern[index + width:index + width + 1] in ("?", "*", "{"):
+            break
+        prefix.append(char)
+        index += width
+    return "".join(prefix).lower()
+
+
+class TextMatcher:
+    """
+    Compiled amount + keyword matcher.
+
+    Args:
+        amount_patterns: regexes in priority order (matched case-insensitively); group 1 is the number
+        keyword_groups: {group name: keywords}
+    """
+
+    def __init__(self, amount_patterns: Sequence[str], keyword_groups: Dict[str, Iterable[str]]):
+        self.keyword_groups = {name: tuple(k.lower() for k in words) for name, words in keyword_groups.items()}
+        self.keywords = sorted({k for words in self.keyword_groups.values() for k in words})
+        self.amount_patterns: List[Pattern] = [re.compile(p, re.IGNORECASE) for p in amount_patterns]
+        self.amount_prefixes = [literal_prefix(p) for p in amount_patterns]
+
+        self._automaton = None
+        if ahocorasick is not None:
+            # value: (keyword or None, indices of amount patterns anchored on this string)
+            entries: Dict[str, Tuple[Optional[str], List[int]]] = {k: (k, []) for k in self.keywords}
+            for index, prefix in enumerate(self.amount_prefixes):
+                if prefix:
+                    word, anchored = entries.setdefault(prefix, (None, []))
+                    anchored.append(index)
+            automaton = ahocorasick.Automaton()
+            for key, (word, anchored) in entries.items():
+                automaton.add_word(key, (len(key), word, tuple(anchored)))
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    @property
+    def accelerated(self) -> bool:
+        return self._automaton is not None
+
+    def scan(self, text: str) -> Tuple[Optional[float], FrozenSet[str]]:
+        """One pass over text: (amount or None, keywords found)"""
+        if self._automaton is None:
+            return self._scan_naive(text)
+
+        lowered = text.lower()
+        found = set()
+        anchors: Dict[int, List[int]] = {}
+        for end, (length, word, anchored) in self._automaton.iter(lowered):
+            if word is not None:
+                found.add(word)
+            for index in anchored:
+                anchors.setdefault(index, []).append(end - length + 1)
+
+        for index, pattern in enumerate(self.amount_patterns):
+            if self.amount_prefixes[index]:
+                starts = anchors.get(index)
+                if not starts:
+                    continue
+                match = None
+                for start in starts:  # automaton reports in text order: first hit is leftmost
+                    match = pattern.match(lowered, start)
+                    if match:
+                        break
+            else:
+                match = pattern.search(lowered)
+            amount = _to_amount(match)
+            if amount is not None:
+                return amount, frozenset(found)
+        return None, frozenset(found)
+
+    def _scan_naive(self, text: str) -> Tuple[Optional[float], FrozenSet[str]]:
+        amount = None
+        for pattern in self.amount_patterns:
+            amount = _to_amount(pattern.search(text))
+            if amount is not None:
+                break
+        lowered = text.lower()
+        return amount, frozenset(k for k in self.keywords if k in lowered)
+
+    def hits(self, found: FrozenSet[str], group: str) -> List[str]:
+        """Keywords of a group that were found, in the group's declared order"""
+        return [k for k in self.keyword_groups[group] if k in found]
+
+
+def _to_amount(match) -> Optional[float]:
+    if not match:
+        return None
+    try:
+        amount = float(match.group(1).replace(',', ''))
+    except ValueError:
+        return None
+    return amount if amount > 0 else None